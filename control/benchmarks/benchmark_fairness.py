@@ -0,0 +1,165 @@
+"""Benchmark MERCURY ASIC emulator latency for a priority client under an adversarial load.
+
+This script measures the latency of register transactions sent one at a time by a priority
+client to an emulator server, running in a separate process, while a number of flooding clients
+in another process each keep a window of transactions outstanding, sending a new transaction as
+soon as each response, including any busy response, is received. The measurement is repeated for
+servers with different client queue high-water marks and scheduling weights of the priority
+client, and without the flooding clients as a baseline.
+
+Run with: python benchmarks/benchmark_fairness.py [--number N] [--flood-clients N]
+          [--window N] [--high-water-marks N ...] [--weights N ...]
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+from unittest.mock import Mock
+
+from mercury.asic.registers import RegisterMap
+from mercury.asic_emulator import protocol
+from mercury.asic_emulator.client import MercuryAsicClient
+from mercury.asic_emulator.client_stats import LatencyHistogram
+from mercury.asic_emulator.multi_register_model import MercuryMultiAsicRegisterModel
+from mercury.asic_emulator.server import EmulatorServer
+
+PRIORITY_CLIENT = "priority"
+
+
+def run_server(endpoint, high_water_mark, priority_weight):
+    """Run an emulator server until the process is interrupted.
+
+    :param endpoint: endpoint to run the server on
+    :param high_water_mark: client queue high-water mark of the server
+    :param priority_weight: scheduling weight of the priority client
+    """
+    async def serve():
+        model = MercuryMultiAsicRegisterModel(Mock(), False)
+        server = EmulatorServer(
+            endpoint, asyncio.get_running_loop(), model, high_water_mark=high_water_mark,
+            client_weights={PRIORITY_CLIENT: priority_weight},
+        )
+        await server.server_task
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def run_flood(endpoint, num_clients, window, ready):
+    """Run flooding clients until the process is interrupted.
+
+    :param endpoint: endpoint of the server
+    :param num_clients: number of flooding clients
+    :param window: number of transactions each client keeps outstanding
+    :param ready: event set once the clients have been created
+    """
+    async def flood(client):
+        message = protocol.pack_transaction(MercuryAsicClient.read_transaction(0, 16))
+        for _ in range(window):
+            await client.socket.send(message)
+        while True:
+            await client.socket.recv()
+            await client.socket.send(message)
+
+            # Receiving a response that is already available does not yield to other tasks
+            await asyncio.sleep(0)
+
+    async def run():
+        clients = [MercuryAsicClient(endpoint) for _ in range(num_clients)]
+        ready.set()
+        await asyncio.gather(*(flood(client) for client in clients))
+
+    # Run the flooding clients at low priority so that, on machines with few cores, they do not
+    # compete with the server and priority client for CPU time
+    os.nice(19)
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+async def measure_latency(endpoint, number):
+    """Measure the latency of transactions sent one at a time by the priority client.
+
+    Transactions rejected by the server as busy are retried immediately, with the latency
+    measured from the first attempt.
+
+    :param endpoint: endpoint of the server
+    :param number: number of transactions to send
+    :return: tuple of the latency histogram and the number of busy responses
+    """
+    client = MercuryAsicClient(endpoint, identity=PRIORITY_CLIENT)
+    histogram = LatencyHistogram()
+    num_busy = 0
+    for _ in range(number):
+        start = time.perf_counter_ns()
+        while True:
+            try:
+                await client.transfer(bytearray([RegisterMap.GLOB1 | 0x80, 0]))
+                break
+            except protocol.ServerBusyError:
+                num_busy += 1
+        histogram.record(time.perf_counter_ns() - start)
+
+    client.close()
+    return (histogram, num_busy)
+
+
+def main():
+    """Run the fairness benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="Priority client transactions")
+    parser.add_argument("--flood-clients", type=int, default=4, help="Number of flooding clients")
+    parser.add_argument("--window", type=int, default=256, help="Flooding client window size")
+    parser.add_argument("--high-water-marks", type=int, nargs="+", default=[1024, 16])
+    parser.add_argument("--weights", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--endpoint", default="tcp://127.0.0.1:5597")
+    args = parser.parse_args()
+
+    configs = [(None, max(args.high_water_marks), 1)] + [
+        (args.flood_clients, high_water_mark, weight)
+        for high_water_mark in args.high_water_marks
+        for weight in args.weights
+    ]
+
+    print(
+        f"{'flood':>5} {'hwm':>5} {'weight':>6} {'p50 (us)':>10} {'p99 (us)':>10} "
+        f"{'max (us)':>10} {'busy':>6}"
+    )
+    for (flood_clients, high_water_mark, weight) in configs:
+        server = multiprocessing.Process(
+            target=run_server, args=(args.endpoint, high_water_mark, weight)
+        )
+        server.start()
+
+        flood = None
+        if flood_clients:
+            ready = multiprocessing.Event()
+            flood = multiprocessing.Process(
+                target=run_flood, args=(args.endpoint, flood_clients, args.window, ready)
+            )
+            flood.start()
+            ready.wait()
+            time.sleep(0.5)
+
+        (histogram, num_busy) = asyncio.run(measure_latency(args.endpoint, args.number))
+
+        for proc in filter(None, (flood, server)):
+            os.kill(proc.pid, signal.SIGINT)
+            proc.join()
+
+        print(
+            f"{flood_clients or 0:5d} {high_water_mark:5d} {weight:6d} "
+            f"{histogram.percentile(50) / 1000:10.1f} {histogram.percentile(99) / 1000:10.1f} "
+            f"{histogram.max / 1000:10.1f} {num_busy:6d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
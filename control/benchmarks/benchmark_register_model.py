@@ -0,0 +1,95 @@
+"""Benchmark burst transaction processing in the MERCURY ASIC register model.
+
+This script measures the time taken by MercuryAsicRegisterModel to process burst read and write
+transactions of various lengths, comparing the span-based burst engine with a reference model
+that processes transactions one byte at a time, as the register model originally did.
+
+Run with: python benchmarks/benchmark_register_model.py [--number N]
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import argparse
+import logging
+import timeit
+from unittest.mock import Mock
+
+from mercury.asic.registers import RegisterMap
+from mercury.asic_emulator.register_model import MercuryAsicRegisterModel
+
+
+class BytewiseRegisterModel(MercuryAsicRegisterModel):
+    """Reference register model processing transactions one byte at a time."""
+
+    def process_transaction(self, transaction):
+        """Process a register transaction with a loop over each byte in the payload."""
+        try:
+            register_addr = int(transaction[0]) & self.REGISTER_ADDR_MASK
+            transaction_len = len(transaction[1:])
+            is_write = self.is_write_transaction(transaction)
+            logging.debug(
+                f"{'Write' if is_write else 'Read'} transaction {register_addr} {transaction_len}"
+            )
+            for idx in range(transaction_len):
+                addr = self.calc_register_addr(register_addr + idx)
+                if addr in self._shift_registers:
+                    self.process_sr_transaction(transaction, idx, addr)
+                    break
+                if is_write:
+                    self._registers[addr] = transaction[1 + idx]
+                    if addr in self._callbacks:
+                        self._callbacks[addr]()
+                    if self.log_register_writes:
+                        self.log_register_write(addr)
+                else:
+                    transaction[1 + idx] = self._registers[addr]
+        except Exception as err:
+            logging.error(f"Error processing transaction: {type(err)} {err}")
+
+        return transaction
+
+
+def build_transactions(length):
+    """Build write and read burst transactions of the specified length.
+
+    Bursts of up to 100 registers start at SEG_CONTROL1_SER, covering the segment, ramp and
+    serialiser control blocks. Longer bursts start at GLOB1 and run into the calibration
+    shift register.
+
+    :param length: length of the burst payload
+    :return: tuple of write and read transactions
+    """
+    start = RegisterMap.SEG_CONTROL1_SER if length <= 100 else RegisterMap.GLOB1
+    payload = [idx & 0xFF for idx in range(length)]
+    write = bytearray([start] + payload)
+    read = bytearray([start | MercuryAsicRegisterModel.REGISTER_READ_TRANSACTION] + payload)
+    return (write, read)
+
+
+def main():
+    """Run the register model burst benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    models = {
+        "bytewise": BytewiseRegisterModel(Mock(), False),
+        "burst": MercuryAsicRegisterModel(Mock(), False),
+    }
+
+    print(f"{'length':>6} {'op':>5} {'bytewise (us)':>14} {'burst (us)':>11} {'speedup':>8}")
+    for length in (1, 16, 128):
+        for (op, transaction) in zip(("write", "read"), build_transactions(length)):
+            times = {
+                name: timeit.timeit(
+                    lambda: model.process_transaction(transaction), number=args.number
+                ) * 1e6 / args.number
+                for (name, model) in models.items()
+            }
+            print(
+                f"{length:6d} {op:>5} {times['bytewise']:14.2f} {times['burst']:11.2f} "
+                f"{times['bytewise'] / times['burst']:7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Benchmark MERCURY ASIC emulator server throughput with concurrent clients.
+
+This script measures the total rate at which an emulator server, running in a separate process,
+processes register transactions sent by a number of concurrent clients, each of which sends
+transactions one at a time, awaiting each response before sending the next. The clients are
+spread over a number of processes so that the server is the bottleneck. The measurement is
+repeated for servers with different maximum receive batch sizes, where a batch size of one
+processes and responds to each message before receiving the next, and optionally for emulator
+farms with different numbers of worker processes, where zero workers runs a single server. When
+emulating multiple ASICs, the clients address the ASICs in turn. Clients can optionally pipeline
+transactions, keeping a number of transactions in flight at once.
+
+Run with: python benchmarks/benchmark_server_throughput.py [--number N] [--clients N ...]
+          [--batch-sizes N ...] [--workers N ...] [--num-asics N] [--pipeline N]
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+from unittest.mock import Mock
+
+from mercury.asic.registers import RegisterMap
+from mercury.asic_emulator.client import MercuryAsicClient
+from mercury.asic_emulator.farm import EmulatorFarm
+from mercury.asic_emulator.multi_register_model import MercuryMultiAsicRegisterModel
+from mercury.asic_emulator.server import EmulatorServer
+
+
+def run_server(endpoint, max_batch_size, num_workers, num_asics):
+    """Run an emulator server or farm until the process is terminated.
+
+    :param endpoint: endpoint to run the server on
+    :param max_batch_size: maximum receive batch size of the server
+    :param num_workers: number of farm worker processes, or zero to run a single server
+    :param num_asics: number of ASICs to emulate
+    """
+    async def serve():
+        loop = asyncio.get_running_loop()
+        if num_workers:
+            server = EmulatorFarm(
+                endpoint, loop, num_workers, num_asics, max_batch_size=max_batch_size
+            )
+        else:
+            model = MercuryMultiAsicRegisterModel(Mock(), False, num_asics)
+            server = EmulatorServer(endpoint, loop, model, None, max_batch_size)
+        try:
+            await server.server_task
+        finally:
+            if num_workers:
+                server.shutdown()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+async def run_clients(endpoint, asics, number, wire_format, pipeline, barrier):
+    """Run concurrent clients each sending a number of transactions to the server.
+
+    :param endpoint: endpoint of the server
+    :param asics: list of the ASIC addressed by each client, which is None for the default ASIC
+    :param number: number of transactions sent by each client
+    :param wire_format: wire format used by the clients
+    :param pipeline: number of transactions each client keeps in flight
+    :param barrier: barrier synchronising the start of clients in all processes
+    :return: tuple of start and end times of the transfers
+    """
+    clients = [MercuryAsicClient(endpoint, wire_format, window=pipeline) for _ in asics]
+
+    async def client_loop(client, asic):
+        transaction = bytearray([RegisterMap.GLOB1, 1, 2, 3, 4])
+
+        async def sender(count):
+            for _ in range(count):
+                await client.transfer(transaction, asic)
+
+        await asyncio.gather(
+            *(sender(len(range(idx, number, pipeline))) for idx in range(pipeline))
+        )
+
+    # Warm up the clients, negotiating the wire format, before timing the transfers
+    await asyncio.gather(
+        *(
+            client.transfer(bytearray([RegisterMap.GLOB1, 0]), asic)
+            for (client, asic) in zip(clients, asics)
+        )
+    )
+
+    barrier.wait()
+    start = time.time()
+    await asyncio.gather(*(client_loop(client, asic) for (client, asic) in zip(clients, asics)))
+    end = time.time()
+
+    for client in clients:
+        client.close()
+
+    return (start, end)
+
+
+def run_client_process(endpoint, asics, number, wire_format, pipeline, barrier, results):
+    """Run concurrent clients in a client process, putting the transfer times on a queue."""
+    results.put(asyncio.run(run_clients(endpoint, asics, number, wire_format, pipeline, barrier)))
+
+
+def measure_rate(args, num_clients):
+    """Measure the total transaction rate of clients spread over a number of processes.
+
+    :param args: parsed command line arguments
+    :param num_clients: total number of clients
+    :return: total transaction rate in transactions per second
+    """
+    num_procs = min(args.client_processes, num_clients)
+    asics = [
+        (client % args.num_asics) if args.num_asics > 1 else None for client in range(num_clients)
+    ]
+    barrier = multiprocessing.Barrier(num_procs)
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(
+            target=run_client_process,
+            args=(
+                args.endpoint,
+                asics[proc::num_procs],
+                args.number,
+                args.wire_format,
+                args.pipeline,
+                barrier,
+                results,
+            ),
+        )
+        for proc in range(num_procs)
+    ]
+    for proc in procs:
+        proc.start()
+    times = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    elapsed = max(end for (_, end) in times) - min(start for (start, _) in times)
+    return num_clients * args.number / elapsed
+
+
+def main():
+    """Run the server throughput benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="Transactions per client")
+    parser.add_argument(
+        "--clients", type=int, nargs="+", default=[1, 4, 16, 32], help="Numbers of clients"
+    )
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64])
+    parser.add_argument("--workers", type=int, nargs="+", default=[0], help="Farm worker counts")
+    parser.add_argument("--num-asics", type=int, default=1, help="Number of ASICs to emulate")
+    parser.add_argument("--client-processes", type=int, default=4)
+    parser.add_argument("--wire-format", default="raw", choices=["msgpack", "raw"])
+    parser.add_argument(
+        "--pipeline", type=int, default=1, help="Transactions in flight per client"
+    )
+    parser.add_argument("--endpoint", default="tcp://127.0.0.1:5598")
+    args = parser.parse_args()
+
+    configs = [
+        (batch_size, num_workers)
+        for num_workers in args.workers
+        for batch_size in args.batch_sizes
+    ]
+    columns = " ".join(
+        f"{f'b{batch_size}/w{num_workers} (tx/s)':>16}" for (batch_size, num_workers) in configs
+    )
+    print(f"{'clients':>7} {columns}")
+    rates = {}
+    for (batch_size, num_workers) in configs:
+        server = multiprocessing.Process(
+            target=run_server, args=(args.endpoint, batch_size, num_workers, args.num_asics)
+        )
+        server.start()
+        for num_clients in args.clients:
+            rates[(num_clients, batch_size, num_workers)] = measure_rate(args, num_clients)
+        os.kill(server.pid, signal.SIGINT)
+        server.join()
+
+    for num_clients in args.clients:
+        print(
+            f"{num_clients:7d} "
+            + " ".join(f"{rates[(num_clients, *config)]:16.0f}" for config in configs)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark the MERCURY ASIC emulator wire formats.
+
+This script compares register transactions encoded with msgpack with those sent in the negotiated
+raw wire format, for write and read transactions of various payload sizes. Two measurements are
+made for each: the cost of encoding, processing and decoding a transaction in the server without
+the socket, and the round trip time between a client and server running in the same process.
+The latter is typically dominated by the ZeroMQ and asyncio overhead of the round trip.
+
+Run with: python benchmarks/benchmark_wire_format.py [--number N] [--repeat N] [--endpoint URI]
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import argparse
+import asyncio
+import time
+import timeit
+from unittest.mock import Mock
+
+from mercury.asic.registers import RegisterMap
+from mercury.asic_emulator import protocol
+from mercury.asic_emulator.client import MercuryAsicClient
+from mercury.asic_emulator.client_stats import ClientStats
+from mercury.asic_emulator.register_model import MercuryAsicRegisterModel
+from mercury.asic_emulator.server import EmulatorServer
+
+
+async def time_transfers(client, transaction, number):
+    """Time a number of transfers of a transaction.
+
+    :param client: MercuryAsicClient instance to transfer with
+    :param transaction: transaction to transfer
+    :param number: number of transfers
+    :return: mean round trip time in microseconds
+    """
+    start = time.perf_counter()
+    for _ in range(number):
+        await client.transfer(transaction)
+    return (time.perf_counter() - start) * 1e6 / number
+
+
+def time_codec(server, transaction, number):
+    """Time the encoding, processing and decoding of a transaction in each wire format.
+
+    :param server: EmulatorServer instance to process the transaction
+    :param transaction: transaction to process
+    :param number: number of iterations
+    :return: dict of mean times in microseconds keyed by wire format
+    """
+    client_id = b"benchmark"
+    client_stats = ClientStats()
+    raw_header = protocol.pack_raw_header()
+
+    def msgpack_codec():
+        data = protocol.pack_transaction(transaction)
+        resp_data = server._process_message(client_id, client_stats, data)
+        return protocol.unpack_transaction(resp_data)
+
+    def raw_codec():
+        data = raw_header + bytes(transaction)
+        resp_data = server._process_raw_message(client_id, client_stats, data)
+        return resp_data[len(raw_header):]
+
+    return {
+        wire_format: timeit.timeit(codec, number=number) * 1e6 / number
+        for (wire_format, codec) in (
+            (protocol.FORMAT_MSGPACK, msgpack_codec),
+            (protocol.FORMAT_RAW, raw_codec),
+        )
+    }
+
+
+async def run(args):
+    """Run the wire format benchmark.
+
+    :param args: parsed command line arguments
+    """
+    model = MercuryAsicRegisterModel(Mock(), False)
+    server = EmulatorServer(args.endpoint, asyncio.get_running_loop(), model)
+    clients = {
+        wire_format: MercuryAsicClient(args.endpoint, wire_format)
+        for wire_format in (protocol.FORMAT_MSGPACK, protocol.FORMAT_RAW)
+    }
+
+    # Bursts start at GLOB1 and cover all registers up to the shift registers, into which longer
+    # bursts run
+    print(
+        f"{'':12} {'codec':>30}  {'round trip':>30}\n"
+        f"{'length':>6} {'op':>5} {'msgpack (us)':>13} {'raw (us)':>9} {'speedup':>6}  "
+        f"{'msgpack (us)':>13} {'raw (us)':>9} {'speedup':>6}"
+    )
+    for length in (1, 16, 128, 1024):
+        payload = [idx & 0xFF for idx in range(length)]
+        for (op, addr) in (
+            ("write", RegisterMap.GLOB1),
+            ("read", RegisterMap.GLOB1 | MercuryAsicRegisterModel.REGISTER_READ_TRANSACTION),
+        ):
+            transaction = bytearray([addr] + payload)
+            codec = time_codec(server, transaction, args.number * args.repeat)
+            # Round trip times are noisy, so take the best of several interleaved repeats
+            trip = {wire_format: float("inf") for wire_format in clients}
+            for _ in range(args.repeat):
+                for (wire_format, client) in clients.items():
+                    trip[wire_format] = min(
+                        trip[wire_format], await time_transfers(client, transaction, args.number)
+                    )
+            print(
+                f"{length:6d} {op:>5} {codec['msgpack']:13.2f} {codec['raw']:9.2f} "
+                f"{codec['msgpack'] / codec['raw']:5.1f}x  "
+                f"{trip['msgpack']:13.2f} {trip['raw']:9.2f} {trip['msgpack'] / trip['raw']:5.1f}x"
+            )
+
+    server.server_task.cancel()
+    server.monitor_task.cancel()
+
+
+def main():
+    """Parse arguments and run the wire format benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="Round trips per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeats of each measurement")
+    parser.add_argument(
+        "--endpoint", default="tcp://127.0.0.1:5599", help="Endpoint to run the emulator on"
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
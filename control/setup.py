@@ -6,7 +6,8 @@ install_requires = [
     'odin @ git+https://github.com/odin-detector/odin-control@1.0.0#egg=odin',
     'odin_sequencer @ git+https://github.com/stfc-aeg/odin-sequencer@0.1.0#egg=odin_sequencer',
     'pyzmq>=22.0',
-    'msgpack>=1.0'
+    'msgpack>=1.0',
+    'numpy'
 ]
 
 extras_require = {
@@ -34,6 +35,9 @@ setup(
     install_requires=install_requires,
     extras_require=extras_require,
     entry_points={
-        'console_scripts': ['emulator_shell = mercury.asic_emulator.shell:main'],
+        'console_scripts': [
+            'emulator_shell = mercury.asic_emulator.shell:main',
+            'emulator_trace = mercury.asic_emulator.trace_cli:main',
+        ],
     }
 )
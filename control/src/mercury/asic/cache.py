@@ -0,0 +1,142 @@
+"""MERCURY ASIC register cache.
+
+This module implements a write-through shadow cache of the SPI register values of the MERCURY
+ASIC, allowing the device control layer to return the values of configuration registers without
+an SPI transaction. Registers are cached by their true address, i.e. with the page select in
+CONFIG1 applied, so the cache tracks the page select as CONFIG1 is written or read. The shift
+registers and the read-only flag registers, the values of which change independently of the
+register writes, are never cached.
+
+The cache assumes that the device is not written to by any other controller. If that may not be
+the case, or the device may have been reset, the cache must be invalidated.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+from .fields import REGISTER_FIELDS
+from .registers import REGISTER_METADATA, RegisterMap
+
+
+class RegisterCache:
+    """
+    MERCURY ASIC register cache class.
+
+    This class holds the cached register values and the page select state, resolving the raw
+    register addresses of read and write bursts to true addresses. The values of registers are
+    cached when written or read and the numbers of cache hits and misses are counted.
+    """
+
+    # Size of a register page and the number of registers at the start of the page common to all
+    # pages, i.e. CONFIG1, GLOB1 and GLOB2, which are not affected by the page select
+    PAGE_SIZE = REGISTER_METADATA.PAGE_SIZE
+    NUM_COMMON_REGISTERS = REGISTER_METADATA.NUM_COMMON_REGISTERS
+
+    # Registers which are never cached: the shift registers, the contents of which are shifted
+    # out when read and depend on the sector select, and the read-only flag registers
+    UNCACHEABLE = REGISTER_METADATA.SHIFT_REGISTERS + REGISTER_METADATA.READ_ONLY_REGISTERS
+
+    PAGE_SELECT_FIELD = REGISTER_FIELDS["PAGE_SELECT"]
+
+    def __init__(self):
+        """Initialise the register cache."""
+        # Use the tables of the true address of each raw address in each page and build a table of
+        # the cacheable true addresses
+        self._page_addrs = REGISTER_METADATA.page_addrs
+        self._cacheable = bytes(
+            is_register and addr not in self.UNCACHEABLE
+            for (addr, is_register) in enumerate(REGISTER_METADATA.is_register)
+        )
+
+        self._values = bytearray(2 * self.PAGE_SIZE)
+        self._valid = bytearray(2 * self.PAGE_SIZE)
+        self.page_select = None
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def invalidate(self):
+        """Invalidate the cache, discarding all cached values and the page select state."""
+        self._valid[:] = bytes(len(self._valid))
+        self.page_select = None
+        self.invalidations += 1
+
+    def read(self, addr, length):
+        """Read register values from the cache.
+
+        The read is a hit only if the values of all the registers read are cached.
+
+        :param addr: raw start address of the read
+        :param length: number of registers to read
+        :return: bytes of the register values, or None if the read missed the cache
+        """
+        addrs = [self._true_addr(raw_addr) for raw_addr in range(addr, addr + length)]
+        if length and all(addr is not None and self._valid[addr] for addr in addrs):
+            self.hits += 1
+            return bytes(self._values[addr] for addr in addrs)
+
+        self.misses += 1
+        return None
+
+    def update_read(self, addr, values):
+        """Update the cache with the register values returned by a read.
+
+        :param addr: raw start address of the read
+        :param values: register values read
+        """
+        # CONFIG1 is common to all pages, so reading it reveals the page select
+        if addr == RegisterMap.CONFIG1 and values:
+            self.page_select = self.PAGE_SELECT_FIELD.decode(values[0])
+
+        for (raw_addr, value) in enumerate(values, addr):
+            self._store(raw_addr, value)
+
+    def update_write(self, addr, values):
+        """Update the cache with the register values written.
+
+        Writes to CONFIG1 update the page select, which applies to the remainder of the burst.
+
+        :param addr: raw start address of the write
+        :param values: register values written
+        """
+        for (raw_addr, value) in enumerate(values, addr):
+            self._store(raw_addr, value)
+            if raw_addr == RegisterMap.CONFIG1:
+                self.page_select = self.PAGE_SELECT_FIELD.decode(value)
+
+    def values(self):
+        """Return a dict of the cached register values keyed by true address."""
+        return {addr: self._values[addr] for (addr, valid) in enumerate(self._valid) if valid}
+
+    def stats(self):
+        """Return a dict of the cache statistics."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "cached": sum(self._valid),
+            "page_select": self.page_select,
+        }
+
+    def _true_addr(self, raw_addr):
+        """Return the true address of a raw register address.
+
+        :param raw_addr: raw register address
+        :return: true register address, or None if the address cannot be resolved, i.e. it is out
+                 of range or depends on a page select which is not known
+        """
+        if raw_addr < self.NUM_COMMON_REGISTERS:
+            return raw_addr
+        if self.page_select is None or raw_addr >= self.PAGE_SIZE:
+            return None
+        return self._page_addrs[self.page_select][raw_addr]
+
+    def _store(self, raw_addr, value):
+        """Store a register value in the cache if the register is cacheable.
+
+        :param raw_addr: raw register address
+        :param value: register value
+        """
+        addr = self._true_addr(raw_addr)
+        if addr is not None and self._cacheable[addr]:
+            self._values[addr] = value
+            self._valid[addr] = 1
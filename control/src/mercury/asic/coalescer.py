@@ -0,0 +1,82 @@
+"""MERCURY ASIC register write coalescing.
+
+This module implements the coalescing of register writes to the MERCURY ASIC, merging writes to
+consecutive addresses into single burst write transactions. Writes are only ever appended to the
+most recent pending burst, so that the order in which registers are written is preserved.
+
+Bursts are not merged where the resulting transaction would behave differently to the individual
+writes, i.e. across the boundary at which the page select starts to apply, after a write to the
+CONFIG1 register which may change the page select, or into the shift registers, which take all
+remaining bytes of a burst as shift register data.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+from .registers import RegisterMap
+
+
+class WriteCoalescer:
+    """
+    MERCURY ASIC register write coalescer class.
+
+    This class holds the pending register writes as a list of burst write transactions, counting
+    the writes added and the transactions they were coalesced into.
+    """
+
+    # Raw address at which the page select starts to apply
+    PAGE_BOUNDARY = 3
+
+    def __init__(self):
+        """Initialise the write coalescer."""
+        self._bursts = []
+        self._extendable = False
+        self._next_addr = None
+        self.writes = 0
+        self.transactions = 0
+
+    def __len__(self):
+        """Return the number of pending burst write transactions."""
+        return len(self._bursts)
+
+    def add(self, addr, vals):
+        """Add a register write, merging it into the last pending burst if possible.
+
+        :param addr: start address of the write
+        :param vals: values written to registers
+        """
+        self.writes += 1
+        end = addr + len(vals)
+
+        # Writes to CONFIG1, and those reaching the shift registers or beyond the end of the
+        # page, are never merged with other writes
+        isolated = not vals or addr == RegisterMap.CONFIG1 or end > RegisterMap.SR_CAL
+
+        if (
+            self._extendable and not isolated
+            and addr == self._next_addr and addr != self.PAGE_BOUNDARY
+        ):
+            self._bursts[-1].extend(vals)
+        else:
+            self._bursts.append(bytearray([addr, *vals]))
+
+        self._extendable = not isolated
+        self._next_addr = end
+
+    def take(self):
+        """Take the pending burst write transactions, leaving none pending.
+
+        :return: list of bytearray burst write transactions in order
+        """
+        (bursts, self._bursts) = (self._bursts, [])
+        self._extendable = False
+        self.transactions += len(bursts)
+        return bursts
+
+    def stats(self):
+        """Return a dict of the write coalescing statistics."""
+        pending = len(self._bursts)
+        return {
+            "writes": self.writes,
+            "transactions": self.transactions,
+            "pending": pending,
+            "saved": self.writes - self.transactions - pending,
+        }
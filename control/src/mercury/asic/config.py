@@ -0,0 +1,140 @@
+"""MERCURY ASIC register configuration.
+
+This module implements the planning of the register transactions needed to bring the MERCURY
+ASIC to a configuration. A configuration is given either as a register image, indexed by true
+register address, or as a dict of named register field values. The registers of the configuration
+which differ from the known register values are grouped by page into spans of consecutive raw
+addresses, each of which can be written in a single burst transaction.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+from .fields import REGISTER_FIELDS
+from .registers import REGISTER_METADATA, RegisterMap
+
+# Size of a register page and the number of registers at the start of the page common to all pages
+PAGE_SIZE = REGISTER_METADATA.PAGE_SIZE
+NUM_COMMON_REGISTERS = REGISTER_METADATA.NUM_COMMON_REGISTERS
+
+
+def register_page(addr):
+    """Return the page and raw address of a register.
+
+    :param addr: true register address
+    :return: tuple of the page select, or None for registers common to all pages, and raw address
+    :raises ValueError: if the register cannot be addressed in any page
+    """
+    if 0 <= addr < len(REGISTER_METADATA.offsets) and REGISTER_METADATA.offsets[addr] is not None:
+        return (REGISTER_METADATA.pages[addr], REGISTER_METADATA.offsets[addr])
+    raise ValueError(f"Register {addr} cannot be addressed in any page")
+
+
+def _is_addressable(addr):
+    """Return true if a register can be addressed in a page."""
+    try:
+        register_page(addr)
+        return True
+    except ValueError:
+        return False
+
+
+# Registers which can be configured, i.e. all except the shift registers, the read-only flags
+# and any which cannot be addressed, since the raw addresses at which they would be found in the
+# second page select the registers common to all pages
+CONFIG_REGISTERS = frozenset(
+    addr for addr in RegisterMap
+    if not REGISTER_METADATA.is_shift_register[addr]
+    and not REGISTER_METADATA.is_read_only[addr]
+    and _is_addressable(addr)
+)
+
+
+def config_dependencies(config):
+    """Return the registers whose current values are needed to encode a configuration.
+
+    Configurations given as named fields only set the bits of sub-fields within a register, so the
+    values of the other bits must be known.
+
+    :param config: register image or dict of register field values keyed by name
+    :return: set of true register addresses
+    """
+    if not isinstance(config, dict):
+        return set()
+
+    return {
+        REGISTER_FIELDS[name].addr for name in config
+        if name in REGISTER_FIELDS and REGISTER_FIELDS[name].mask != 0xFF
+    }
+
+
+def config_targets(config, current):
+    """Return the target register values of a configuration.
+
+    Registers in a register image which cannot be configured are ignored, whereas fields of such
+    registers in a dict of field values are rejected.
+
+    :param config: register image or dict of register field values keyed by name
+    :param current: dict of the current register values keyed by true address, which must include
+                    the registers returned by config_dependencies
+    :return: dict of target register values keyed by true address
+    :raises ValueError: if a field is unknown or cannot be configured, or a value is out of range
+    """
+    if not isinstance(config, dict):
+        targets = {}
+        for (addr, value) in enumerate(config):
+            if addr in CONFIG_REGISTERS:
+                value = int(value)
+                if not 0 <= value <= 0xFF:
+                    raise ValueError(
+                        f"Value {value} of register {REGISTER_METADATA.name(addr)} out of range "
+                        "0 to 255"
+                    )
+                targets[addr] = value
+        return targets
+
+    for name in config:
+        if name not in REGISTER_FIELDS:
+            raise ValueError(f"Unknown register field {name}")
+        if REGISTER_FIELDS[name].addr not in CONFIG_REGISTERS:
+            raise ValueError(f"Register field {name} cannot be configured")
+
+    addrs = {REGISTER_FIELDS[name].addr for name in config}
+    image = [0] * REGISTER_FIELDS.size
+    for addr in addrs:
+        image[addr] = current.get(addr, 0)
+    image = REGISTER_FIELDS.encode(config, image)
+
+    return {addr: int(image[addr]) for addr in addrs}
+
+
+def register_spans(addrs, fill=None, max_gap=0):
+    """Group registers into spans of consecutive raw addresses within each page.
+
+    Spans do not cross the boundary between the registers common to all pages and those which
+    depend on the page select. Spans separated by a gap of up to a maximum number of registers
+    are joined if the values of all the registers in the gap are known and can be written.
+
+    :param addrs: iterable of true register addresses
+    :param fill: dict of known register values keyed by true address, used to fill gaps
+    :param max_gap: maximum number of registers in a gap between spans which may be filled
+    :return: dict of lists of spans keyed by page select, or None for the common registers, each
+             span being a list of consecutive true register addresses
+    """
+    fill = fill or {}
+    spans = {}
+    for addr in sorted(addrs):
+        (page, _) = register_page(addr)
+        page_spans = spans.setdefault(page, [])
+
+        if page_spans:
+            last = page_spans[-1][-1]
+            gap = range(last + 1, addr)
+            if len(gap) <= max_gap and all(
+                gap_addr in fill and gap_addr in CONFIG_REGISTERS for gap_addr in gap
+            ):
+                page_spans[-1].extend(gap)
+                page_spans[-1].append(addr)
+                continue
+
+        page_spans.append([addr])
+
+    return spans
@@ -1,13 +1,118 @@
 """MercuryAsicDevice - device control class for the MERCURY ASIC.
 
 This class implements the control interface to the MERCURY ASIC. A real ASIC can be controlled via
-the SPI register interface or an emulator via client connection.
+the SPI register interface or an emulator via client connection. Register values can optionally be
+held in a write-through cache, so that reads of registers already written or read by the control
+system are returned without a device transaction, and register writes can optionally be coalesced,
+merging writes to consecutive registers made in quick succession into burst write transactions.
+Complete configurations can be applied, writing only the registers that differ from those cached,
+and pixel patterns loaded into, and read back from, the calibration and test shift registers.
+Register reads and writes can also be queued in a batch context and transferred together, and
+regular banks of per-segment registers read and written as groups in single bursts.
 
 Tim Nicholls, STFC Detector Systems Software Group
 """
+import asyncio
+import logging
 
+import numpy as np
+
+from .cache import RegisterCache
+from .coalescer import WriteCoalescer
+from .config import config_dependencies, config_targets, register_page, register_spans
+from .fields import REGISTER_FIELDS
+from .groups import REGISTER_GROUPS
+from .patterns import (
+    NUM_SECTORS, SR_CAL_SIZE, SR_TEST_SIZE, pack_cal_pattern, pack_test_pattern,
+    unpack_cal_pattern, unpack_test_pattern
+)
 from .registers import RegisterMap
+from .spi import MercuryAsicSpiClient, SpidevTransport
 from mercury.asic_emulator.client import MercuryAsicClient
+from mercury.asic_emulator.register_model import MercuryAsicRegisterModel
+
+
+class MercuryAsicDeviceError(Exception):
+    """Simple exception class for the MERCURY ASIC device."""
+
+    pass
+
+
+class MercuryAsicDeviceBatch:
+    """
+    MERCURY ASIC device register batch.
+
+    This class queues register reads and writes made within an async context, transferring them
+    to the device in a single batch when the context exits. Writes to consecutive registers are
+    merged into burst write transactions. Reads return futures which are resolved with the
+    outputs of the read transactions once the batch has been transferred.
+    """
+
+    def __init__(self, device):
+        """Initialise the register batch.
+
+        param device: MercuryAsicDevice to transfer the batch to
+        """
+        self._device = device
+        self._coalescer = WriteCoalescer()
+        self._transactions = []
+        self._reads = []
+
+    async def __aenter__(self):
+        """Enter the batch context."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Exit the batch context, transferring the queued transactions to the device.
+
+        If the context exits with an exception, or the transfer fails, the queued transactions are
+        discarded and the futures of the reads cancelled.
+        """
+        if exc_type is None:
+            self._transactions.extend(self._coalescer.take())
+            try:
+                if self._transactions:
+                    responses = await self._device.register_batch(*self._transactions)
+                    for (idx, future) in self._reads:
+                        future.set_result(responses[idx])
+            finally:
+                self._cancel_reads()
+        else:
+            self._cancel_reads()
+
+        return False
+
+    def __len__(self):
+        """Return the number of transactions queued in the batch."""
+        return len(self._transactions) + len(self._coalescer)
+
+    def register_read(self, addr, length):
+        """Queue a register read in the batch.
+
+        param addr: start address for reading
+        param length: number of registers to read
+        return: future resolved with the output of the read transaction once the batch is
+        transferred
+        """
+        self._transactions.extend(self._coalescer.take())
+        future = asyncio.get_running_loop().create_future()
+        self._reads.append((len(self._transactions), future))
+        self._transactions.append(self._device.read_transaction(addr, length))
+        return future
+
+    def register_write(self, addr, *vals):
+        """Queue a register write in the batch.
+
+        param addr: start address for writing
+        param vals: values to write to registers
+        """
+        self._coalescer.add(addr, vals)
+
+    def _cancel_reads(self):
+        """Cancel the futures of any reads not resolved by the batch transfer."""
+        for (_, future) in self._reads:
+            if not future.done():
+                future.cancel()
 
 
 class MercuryAsicDevice:
@@ -16,17 +121,51 @@ class MercuryAsicDevice:
 
     """
 
-    def __init__(self, emulate_asic=False, emulator_endpoint=None):
+    def __init__(
+        self, emulate_asic=False, emulator_endpoint=None, emulator_asic=None,
+        emulator_wire_format="msgpack", emulator_window=64, cache_registers=False,
+        coalesce_writes=False, coalesce_window=0.001, spi_device="/dev/spidev0.0",
+        spi_speed_hz=1000000, spi_mode=0, spi_transport=None
+    ):
         """Initialise the ASIC device control.
 
         param emulate_asic: boolean flag indicating if device should be emulated
         param emulator_endpoint: string endpoint URI for emulator if in use
+        param emulator_asic: index of the ASIC in a multi-ASIC emulator, or None for the default
+        param emulator_wire_format: wire format to use with the emulator, msgpack or raw
+        param emulator_window: maximum number of transactions in flight to the emulator, shared
+        by concurrent callers
+        param cache_registers: boolean flag enabling the write-through register cache
+        param coalesce_writes: boolean flag enabling the coalescing of register writes
+        param coalesce_window: time in seconds for which register writes are held to be coalesced
+        param spi_device: path of the spidev device connected to a real ASIC
+        param spi_speed_hz: SPI clock speed in Hz
+        param spi_mode: SPI mode
+        param spi_transport: SPI transport to use instead of opening the spidev device, e.g. a
+        loopback transport to the register model
         """
+        self.emulator_asic = emulator_asic
+
+        self.cache = RegisterCache() if cache_registers else None
+        self._cache_connections = 0
+
+        self.coalescer = WriteCoalescer() if coalesce_writes else None
+        self.coalesce_window = coalesce_window
+        self._flush_task = None
+        self._flush_error = None
+
+        # The locks serialising flushes of coalesced writes and page selection are created on
+        # first use, so that they are bound to the running event loop
+        self._locks = {}
 
         if emulate_asic:
-            self.device = MercuryAsicClient(emulator_endpoint)
+            self.device = MercuryAsicClient(
+                emulator_endpoint, emulator_wire_format, window=emulator_window
+            )
         else:
-            raise NotImplementedError("Real ASIC device not implemented yet")
+            if spi_transport is None:
+                spi_transport = SpidevTransport(spi_device, spi_speed_hz, spi_mode)
+            self.device = MercuryAsicSpiClient(spi_transport)
 
     def register_context(self, context):
         """Register device control with context.
@@ -41,6 +180,13 @@ class MercuryAsicDevice:
 
         context.register_read = self.register_read
         context.register_write = self.register_write
+        context.register_batch = self.register_batch
+        context.register_flush = self.flush
+        context.read_transaction = self.read_transaction
+        context.write_transaction = self.write_transaction
+        context.invalidate_cache = self.invalidate_cache
+        context.read_group = self.read_group
+        context.write_group = self.write_group
 
         for register in RegisterMap:
             context.setattr(register.name, register.value, wrap=False)
@@ -49,26 +195,564 @@ class MercuryAsicDevice:
         """Read ASIC device registers.
 
         This async method reads one or more registers from the ASIC device at
-        a specified address.
+        a specified address. If the register cache is enabled and the values of all the
+        registers are cached, they are returned without a device transaction. Any pending
+        coalesced writes are flushed to the device first.
 
         param addr: start address for reading
         param length: number of registers to read
-        return: output of the device read transaction
+        return: bytes output of the device read transaction, whether or not served from the cache
         """
-        transaction = [addr] + [0] * length
-        response = await self.device.read(transaction)
+        await self.flush()
+
+        if self.cache is not None:
+            self._check_connection()
+            values = self.cache.read(addr, length)
+            if values is not None:
+                response = self.read_transaction(addr, length)
+                response[1:] = values
+                return bytes(response)
+
+        transaction = self.read_transaction(addr, length)
+        response = bytes(await self.device.read(transaction, self.emulator_asic))
+
+        if self.cache is not None:
+            self.cache.update_read(addr, response[1:])
         return response
 
     async def register_write(self, addr, *vals):
         """Write ASIC device registers.
 
         This async method writes one or more registers to the ASIC device at
-        a specified address.
+        a specified address. If write coalescing is enabled, the write is held to be merged with
+        subsequent writes and is flushed to the device once the coalescing window has elapsed,
+        or earlier if flushed explicitly or by a read. Errors flushing writes at the end of the
+        window are raised by the next write or flush. Writes to CONFIG1 are serialised with other
+        operations which select and restore the page.
+
+        param addr: start address for writing
+        param vals: values to write to registers
+        return: output of the device write transaction, or None if the write is coalesced
+        """
+        if self.coalescer is not None:
+            self._raise_flush_error()
+            self.coalescer.add(addr, vals)
+            if self._flush_task is None:
+                self._flush_task = asyncio.get_running_loop().create_task(
+                    self._flush_after_window()
+                )
+            return None
+
+        if addr == RegisterMap.CONFIG1 and vals:
+            async with self._lock("paging"):
+                return await self._write(addr, vals)
+        return await self._write(addr, vals)
+
+    async def _write(self, addr, vals):
+        """Write ASIC device registers directly, updating the cache.
 
         param addr: start address for writing
         param vals: values to write to registers
-        return: output of the device write transaction
+        return: bytes output of the device write transaction
         """
-        transaction = [addr] + list(vals)
-        response = await self.device.write(transaction)
+        transaction = self.write_transaction(addr, *vals)
+        response = bytes(await self.device.write(transaction, self.emulator_asic))
+
+        if self.cache is not None:
+            self._check_connection()
+            self.cache.update_write(addr, vals)
         return response
+
+    async def register_batch(self, *transactions):
+        """Execute a batch of ASIC device register transactions.
+
+        This async method executes multiple register read and write transactions on the ASIC
+        device in a single batch, e.g. to apply a bring-up sequence of many small writes without
+        the overhead of a round trip per transaction. Transactions should be built with the
+        read_transaction and write_transaction methods. Any pending coalesced writes are flushed
+        to the device first.
+
+        param transactions: register transactions to execute, in order
+        return: list of the outputs of the device transactions
+        """
+        await self.flush()
+        return await self._transfer_unpaged(transactions)
+
+    def batch(self):
+        """Return a register batch transferring queued reads and writes to the device.
+
+        The batch is used as an async context manager, within which register reads and writes are
+        queued rather than executed. On exit from the context the queued transactions are sent to
+        the device in a single batch, with writes to consecutive registers merged into bursts,
+        and the futures returned by the reads resolved. Reads in a batch are always transferred
+        to the device rather than served from the register cache, e.g.:
+
+            async with device.batch() as batch:
+                batch.register_write(RegisterMap.GLOB1, 1, 2)
+                flags = batch.register_read(RegisterMap.CONFIG1, 1)
+            response = await flags
+
+        return: MercuryAsicDeviceBatch
+        """
+        return MercuryAsicDeviceBatch(self)
+
+    async def flush(self):
+        """Flush pending coalesced register writes to the device.
+
+        This async method sends any pending coalesced writes to the device in a single batch,
+        raising any error from a previous flush at the end of the coalescing window.
+        """
+        if self.coalescer is None:
+            return
+
+        async with self._lock("flush"):
+            self._raise_flush_error()
+            transactions = self.coalescer.take()
+            if transactions:
+                await self._transfer_unpaged(transactions)
+
+    def coalesce_stats(self):
+        """Return a dict of the write coalescing statistics, or None if not enabled."""
+        return self.coalescer.stats() if self.coalescer is not None else None
+
+    async def _flush_after_window(self):
+        """Flush pending coalesced register writes once the coalescing window has elapsed."""
+        await asyncio.sleep(self.coalesce_window)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as err:
+            logging.error(f"Error flushing coalesced register writes: {err}")
+            self._flush_error = err
+
+    def _raise_flush_error(self):
+        """Raise any error from flushing coalesced register writes at the end of the window."""
+        if self._flush_error is not None:
+            (err, self._flush_error) = (self._flush_error, None)
+            raise err
+
+    def _lock(self, name):
+        """Return a lock of the device, creating it on first use in the running event loop.
+
+        param name: name of the lock
+        return: asyncio lock
+        """
+        lock = self._locks.get(name)
+        if lock is None:
+            lock = self._locks[name] = asyncio.Lock()
+        return lock
+
+    async def _transfer_unpaged(self, transactions):
+        """Transfer a batch of register transactions not issued under the paging lock.
+
+        Batches which write CONFIG1 are transferred holding the paging lock, so that they cannot
+        be interleaved with operations which select a page and then restore CONFIG1 to the value
+        it had beforehand.
+
+        param transactions: register transactions to execute, in order
+        return: list of the outputs of the device transactions
+        """
+        if any(self._writes_config1(transaction) for transaction in transactions):
+            async with self._lock("paging"):
+                return await self._transfer_batch(transactions)
+        return await self._transfer_batch(transactions)
+
+    @staticmethod
+    def _writes_config1(transaction):
+        """Return true if a register transaction writes CONFIG1."""
+        return (
+            len(transaction) > 1
+            and not transaction[0] & MercuryAsicRegisterModel.REGISTER_RW_MASK
+            and transaction[0] & MercuryAsicRegisterModel.REGISTER_ADDR_MASK == RegisterMap.CONFIG1
+        )
+
+    async def _transfer_batch(self, transactions):
+        """Transfer a batch of register transactions to the device, updating the cache.
+
+        param transactions: register transactions to execute, in order
+        return: list of the outputs of the device transactions
+        """
+        (responses, status) = await self.device.transfer_batch(transactions, self.emulator_asic)
+
+        errors = [
+            f"transaction {idx}: {error}" for (idx, error) in enumerate(status) if error is not None
+        ]
+        if errors:
+            # The state of the registers after a failed batch is not known, so the cache is
+            # invalidated
+            if self.cache is not None:
+                self.cache.invalidate()
+            raise MercuryAsicDeviceError(f"Register batch failed: {'; '.join(errors)}")
+
+        if self.cache is not None:
+            self._check_connection()
+            for (transaction, response) in zip(transactions, responses):
+                addr = transaction[0] & MercuryAsicRegisterModel.REGISTER_ADDR_MASK
+                if transaction[0] & MercuryAsicRegisterModel.REGISTER_RW_MASK:
+                    self.cache.update_read(addr, response[1:])
+                else:
+                    self.cache.update_write(addr, transaction[1:])
+
+        return responses
+
+    async def apply_config(self, config, verify=False, max_gap=1):
+        """Apply a register configuration to the ASIC device.
+
+        This async method brings the device registers to a configuration, given either as a
+        register image indexed by true register address or as a dict of named register field
+        values. Only the registers which differ from the values held in the register cache, or are
+        not cached, are written, in the minimum number of burst write transactions in each page,
+        sent to the device in a single batch. The page select is restored afterwards unless set
+        by the configuration. The registers written can optionally be read back and verified.
+
+        param config: register image or dict of register field values keyed by name
+        param verify: boolean flag to read back and verify the registers written
+        param max_gap: maximum number of unchanged registers to rewrite to join two burst writes
+        return: list of the true addresses of the registers written
+        """
+        await self.flush()
+        async with self._lock("paging"):
+            return await self._apply_config(config, verify, max_gap)
+
+    async def _apply_config(self, config, verify, max_gap):
+        """Apply a register configuration to the ASIC device, holding the paging lock.
+
+        param config: register image or dict of register field values keyed by name
+        param verify: boolean flag to read back and verify the registers written
+        param max_gap: maximum number of unchanged registers to rewrite to join two burst writes
+        return: list of the true addresses of the registers written
+        """
+        # Determine the current values of CONFIG1 and of any registers needed to encode the
+        # configuration
+        current = await self._register_values(config_dependencies(config))
+        config1 = current[RegisterMap.CONFIG1]
+
+        try:
+            targets = config_targets(config, current)
+        except ValueError as err:
+            raise MercuryAsicDeviceError(f"Invalid register configuration: {err}")
+
+        # Build burst writes of the changed registers, and reads of them to verify if required,
+        # in each page. CONFIG1 is written last, since it also selects the page.
+        final_config1 = targets.pop(RegisterMap.CONFIG1, config1)
+        changed = sorted(addr for (addr, value) in targets.items() if current.get(addr) != value)
+        values = {**current, **targets}
+        spans = register_spans(changed, values, max_gap)
+
+        page_transactions = {}
+        for (page, page_spans) in spans.items():
+            transactions = [
+                self.write_transaction(register_page(span[0])[1], *(values[addr] for addr in span))
+                for span in page_spans
+            ]
+            if verify:
+                transactions.extend(
+                    self.read_transaction(register_page(span[0])[1], len(span))
+                    for span in page_spans
+                )
+            page_transactions[page] = transactions
+
+        responses = await self._paged_batch(page_transactions, config1, final_config1)
+
+        if final_config1 != config1:
+            changed.append(RegisterMap.CONFIG1)
+
+        if verify:
+            mismatches = []
+            for (page, page_spans) in spans.items():
+                for (span, response) in zip(page_spans, responses[page][len(page_spans):]):
+                    mismatches.extend(
+                        addr for (addr, value) in zip(span, response[1:]) if value != values[addr]
+                    )
+            if final_config1 != config1:
+                readback = await self._read_registers([RegisterMap.CONFIG1])
+                if readback[RegisterMap.CONFIG1] != final_config1:
+                    mismatches.append(RegisterMap.CONFIG1)
+            if mismatches:
+                raise MercuryAsicDeviceError(
+                    f"Register configuration verify failed at addresses {sorted(mismatches)}"
+                )
+
+        return changed
+
+    async def write_cal_pattern(self, pattern):
+        """Write a calibration pattern to the calibration shift register.
+
+        param pattern: tuple of boolean arrays of the column and row enables, or an 80x80 boolean
+        pixel mask selecting the pixels in the enabled rows of the enabled columns
+        """
+        data = pack_cal_pattern(pattern)
+        await self.flush()
+        async with self._lock("paging"):
+            config1 = (await self._register_values())[RegisterMap.CONFIG1]
+            await self._paged_batch(
+                {0: [self.write_transaction(RegisterMap.SR_CAL, *data)]}, config1
+            )
+
+    async def read_cal_pattern(self):
+        """Read the calibration pattern from the calibration shift register.
+
+        return: tuple of boolean arrays of the column and row enables
+        """
+        await self.flush()
+        async with self._lock("paging"):
+            config1 = (await self._register_values())[RegisterMap.CONFIG1]
+            responses = await self._paged_batch(
+                {0: [self.read_transaction(RegisterMap.SR_CAL, SR_CAL_SIZE)]}, config1
+            )
+            return unpack_cal_pattern(responses[0][0][1:])
+
+    async def write_test_pattern(self, pattern, sectors=None):
+        """Write a test pattern to the test shift register.
+
+        This async method packs a test pattern into the test shift register layout and writes
+        each sector as a single burst, selecting it with the sector field of TEST_SR, all in a
+        single batch. TEST_SR is restored afterwards.
+
+        param pattern: 80x80 array of the test word of each pixel, 80x80x12 boolean array of the
+        bits of each test word, or 20x480 array of the contents of each sector
+        param sectors: iterable of the sectors to write, or None to write all sectors
+        """
+        data = pack_test_pattern(pattern)
+        sectors = range(NUM_SECTORS) if sectors is None else sectors
+        await self._test_sector_batch(
+            sectors, lambda sector: self.write_transaction(RegisterMap.SR_TEST, *data[sector])
+        )
+
+    async def read_test_pattern(self):
+        """Read the test pattern from all the sectors of the test shift register.
+
+        return: 80x80 uint16 array of the test word of each pixel, indexed by row and column
+        """
+        responses = await self._test_sector_batch(
+            range(NUM_SECTORS), lambda _: self.read_transaction(RegisterMap.SR_TEST, SR_TEST_SIZE)
+        )
+        data = b"".join(bytes(response[1:]) for response in responses[1:-1:2])
+        return unpack_test_pattern(np.frombuffer(data, dtype=np.uint8))
+
+    async def _test_sector_batch(self, sectors, transaction):
+        """Transfer a transaction to each of a number of test shift register sectors in a batch.
+
+        param sectors: iterable of sectors
+        param transaction: callable returning the transaction for a sector
+        return: list of the responses to the transactions, including the TEST_SR writes
+        """
+        await self.flush()
+        async with self._lock("paging"):
+            current = await self._register_values([RegisterMap.TEST_SR])
+            sector_field = REGISTER_FIELDS["TEST_SR_SECTOR"]
+            test_sr = current[RegisterMap.TEST_SR]
+
+            transactions = []
+            for sector in sectors:
+                if not 0 <= sector < NUM_SECTORS:
+                    raise MercuryAsicDeviceError(
+                        f"Test shift register sector {sector} is not valid"
+                    )
+                transactions.append(self.write_transaction(
+                    RegisterMap.TEST_SR, sector_field.encode(test_sr, sector)
+                ))
+                transactions.append(transaction(sector))
+            transactions.append(self.write_transaction(RegisterMap.TEST_SR, test_sr))
+
+            responses = await self._paged_batch({0: transactions}, current[RegisterMap.CONFIG1])
+            return responses[0]
+
+    async def read_registers(self, addrs):
+        """Read registers by true address, selecting pages as required.
+
+        This async method reads the current values of registers in any page from the ASIC device,
+        bypassing the register cache, in a single batch of burst reads of consecutive registers.
+        The page select is restored afterwards. Any pending coalesced writes are flushed to the
+        device first. Only the value of CONFIG1 is taken from the cache, if enabled, otherwise it
+        is read from the device first.
+
+        param addrs: iterable of true register addresses
+        return: dict of register values keyed by true address
+        """
+        addrs = list(addrs)
+        await self.flush()
+        async with self._lock("paging"):
+            config1 = None
+            if any(register_page(addr)[0] is not None for addr in addrs):
+                config1 = (await self._register_values())[RegisterMap.CONFIG1]
+            return await self._read_registers(addrs, config1)
+
+    async def read_group(self, group):
+        """Read the registers of a register group.
+
+        This async method reads all the registers of a group, e.g. the serialiser control
+        registers of every segment, from the ASIC device in a single burst, selecting the page of
+        the group if required. Any pending coalesced writes are flushed to the device first.
+
+        param group: RegisterGroup or name of the group
+        return: uint8 array of the register values, indexed by segment
+        """
+        group = self._register_group(group)
+        transaction = self.read_transaction(group.offset, len(group))
+        responses = await self._group_batch(group, transaction)
+        return group.unpack(responses[0][1:])
+
+    async def write_group(self, group, values):
+        """Write the registers of a register group.
+
+        This async method writes all the registers of a group to the ASIC device in a single
+        burst, selecting the page of the group if required. Any pending coalesced writes are
+        flushed to the device first.
+
+        param group: RegisterGroup or name of the group
+        param values: array of register values indexed by segment, or a value to be written to
+        all the registers of the group
+        """
+        group = self._register_group(group)
+        try:
+            data = group.pack(values)
+        except ValueError as err:
+            raise MercuryAsicDeviceError(str(err))
+        await self._group_batch(group, self.write_transaction(group.offset, *data))
+
+    @staticmethod
+    def _register_group(group):
+        """Return a register group given either the group or its name."""
+        if isinstance(group, str):
+            try:
+                return REGISTER_GROUPS[group]
+            except KeyError:
+                raise MercuryAsicDeviceError(f"Unknown register group {group}")
+        return group
+
+    async def _group_batch(self, group, transaction):
+        """Transfer a transaction to the registers of a group, selecting its page as required.
+
+        param group: RegisterGroup
+        param transaction: register transaction for the group
+        return: list of the responses to the transaction
+        """
+        await self.flush()
+        async with self._lock("paging"):
+            config1 = None
+            if group.page is not None:
+                config1 = (await self._register_values())[RegisterMap.CONFIG1]
+            responses = await self._paged_batch({group.page: [transaction]}, config1)
+            return responses[group.page]
+
+    async def _register_values(self, addrs=()):
+        """Return the current values of CONFIG1 and other registers.
+
+        The values are taken from the register cache where possible, otherwise read from the
+        device, reading CONFIG1 first so that the registers can be read in the right page.
+
+        param addrs: iterable of true register addresses
+        return: dict of register values keyed by true address
+        """
+        if self.cache is not None:
+            self._check_connection()
+        current = self.cache.values() if self.cache is not None else {}
+        if RegisterMap.CONFIG1 not in current:
+            current.update(await self._read_registers([RegisterMap.CONFIG1]))
+
+        needed = set(addrs) - set(current)
+        if needed:
+            current.update(await self._read_registers(needed, current[RegisterMap.CONFIG1]))
+        return current
+
+    async def _read_registers(self, addrs, config1=None):
+        """Read registers by true address, selecting pages as required.
+
+        param addrs: iterable of true register addresses
+        param config1: current value of CONFIG1, which need only be given if reading paged registers
+        return: dict of register values keyed by true address
+        """
+        spans = register_spans(addrs)
+        page_transactions = {
+            page: [
+                self.read_transaction(register_page(span[0])[1], len(span)) for span in page_spans
+            ]
+            for (page, page_spans) in spans.items()
+        }
+        responses = await self._paged_batch(page_transactions, config1)
+
+        values = {}
+        for (page, page_spans) in spans.items():
+            for (span, response) in zip(page_spans, responses[page]):
+                values.update(zip(span, response[1:]))
+        return values
+
+    async def _paged_batch(self, page_transactions, config1, final_config1=None):
+        """Transfer a batch of transactions grouped by page, selecting pages as required.
+
+        The transactions for registers common to all pages are transferred first, followed by
+        those for the current page and then the other page, writing CONFIG1 to change the page
+        select as required. CONFIG1 is finally written with its final value if that differs from
+        the value last written.
+
+        param page_transactions: dict of lists of transactions keyed by page select, or None for
+        the registers common to all pages
+        param config1: current value of CONFIG1, or None if only common registers are accessed
+        param final_config1: final value of CONFIG1, or None to restore the current value
+        return: dict of lists of the responses to the transactions keyed by page select
+        """
+        if final_config1 is None:
+            final_config1 = config1
+
+        page_select_field = REGISTER_FIELDS["PAGE_SELECT"]
+        last_config1 = config1
+        transactions = []
+        offsets = {}
+        for page in sorted(
+            page_transactions,
+            key=lambda page: (page is not None, page != page_select_field.decode(config1 or 0))
+        ):
+            if page is not None and page != page_select_field.decode(last_config1):
+                last_config1 = page_select_field.encode(final_config1, page)
+                transactions.append(self.write_transaction(RegisterMap.CONFIG1, last_config1))
+            offsets[page] = len(transactions)
+            transactions.extend(page_transactions[page])
+
+        if last_config1 != final_config1:
+            transactions.append(self.write_transaction(RegisterMap.CONFIG1, final_config1))
+
+        responses = await self._transfer_batch(transactions) if transactions else []
+        return {
+            page: responses[offset:offset + len(page_transactions[page])]
+            for (page, offset) in offsets.items()
+        }
+
+    def invalidate_cache(self):
+        """Invalidate the register cache, if enabled.
+
+        This method should be called if the registers of the device may have been changed other
+        than by this device control, e.g. if the device has been reset.
+        """
+        if self.cache is not None:
+            self.cache.invalidate()
+
+    def cache_stats(self):
+        """Return a dict of the register cache statistics, or None if the cache is not enabled."""
+        return self.cache.stats() if self.cache is not None else None
+
+    def _check_connection(self):
+        """Invalidate the register cache if the device has reconnected since last checked."""
+        if self.device.connections != self._cache_connections:
+            self.cache.invalidate()
+            self._cache_connections = self.device.connections
+
+    @staticmethod
+    def read_transaction(addr, length):
+        """Build a register read transaction for use in a batch.
+
+        param addr: start address for reading
+        param length: number of registers to read
+        return: read transaction
+        """
+        return MercuryAsicClient.read_transaction(addr, length)
+
+    @staticmethod
+    def write_transaction(addr, *vals):
+        """Build a register write transaction for use in a batch.
+
+        param addr: start address for writing
+        param vals: values to write to registers
+        return: write transaction
+        """
+        return MercuryAsicClient.write_transaction(addr, *vals)
@@ -0,0 +1,208 @@
+"""MERCURY ASIC register field schema.
+
+This module implements a declarative schema of the named bit fields within the SPI registers of
+the MERCURY ASIC. Every register has a full-width field named after the register, and registers
+with known sub-fields, such as the page select in CONFIG1 and the sector select in TEST_SR, also
+have named fields for those. The schema is compiled at import into arrays of register addresses,
+shifts and masks, allowing a complete register image to be decoded into, or encoded from, named
+field values with vectorised NumPy operations.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import numpy as np
+
+from .registers import REGISTER_METADATA, RegisterMap
+
+
+class RegisterField:
+    """
+    MERCURY ASIC register field.
+
+    This class defines a named bit field within a register, with precomputed mask and shift
+    values used to decode the field from, and encode it into, a register value.
+    """
+
+    __slots__ = ("name", "addr", "index", "width", "mask", "register_mask")
+
+    def __init__(self, name, addr, index=0, width=8):
+        """Initialise the register field.
+
+        :param name: name of the field
+        :param addr: address of the register containing the field
+        :param index: index of the least significant bit of the field
+        :param width: width of the field in bits
+        """
+        self.name = name
+        self.addr = int(addr)
+        self.index = index
+        self.width = width
+        self.mask = (1 << width) - 1
+        self.register_mask = self.mask << index
+
+    def decode(self, value):
+        """Decode the field from a register value.
+
+        :param value: register value
+        :return: right-shifted value of the field
+        """
+        return (value >> self.index) & self.mask
+
+    def encode(self, value, field_value):
+        """Encode the field into a register value.
+
+        :param value: current register value
+        :param field_value: value of the field
+        :return: register value with the field updated
+        """
+        return (value & ~self.register_mask) | ((field_value & self.mask) << self.index)
+
+    def __repr__(self):
+        """Return a string representation of the field."""
+        return f"RegisterField({self.name!r}, {self.addr}, {self.index}, {self.width})"
+
+
+class RegisterFieldSchema:
+    """
+    MERCURY ASIC register field schema.
+
+    This class compiles a set of register fields into arrays of addresses, shifts and masks,
+    allowing register images to be decoded into, and encoded from, named field values with
+    vectorised operations. Full-width fields covering a whole register are applied before
+    sub-fields when encoding, so that sub-field values take precedence.
+    """
+
+    def __init__(self, fields, size):
+        """Compile the register field schema.
+
+        :param fields: iterable of RegisterField instances
+        :param size: size of the register address space
+        """
+        self.fields = tuple(fields)
+        self.size = size
+        self._index = {field.name: idx for (idx, field) in enumerate(self.fields)}
+        if len(self._index) != len(self.fields):
+            raise ValueError("Register field names must be unique")
+
+        self.names = tuple(field.name for field in self.fields)
+        self.addrs = np.array([field.addr for field in self.fields], dtype=np.intp)
+        self.shifts = np.array([field.index for field in self.fields], dtype=np.uint8)
+        self.masks = np.array([field.mask for field in self.fields], dtype=np.uint8)
+        self.full_width = self.masks == 0xFF
+
+    def __getitem__(self, name):
+        """Return the field with the specified name."""
+        return self.fields[self._index[name]]
+
+    def __contains__(self, name):
+        """Return true if the schema contains a field with the specified name."""
+        return name in self._index
+
+    def _as_image(self, registers):
+        """Convert registers to an array, zero-extending images shorter than the address space.
+
+        :param registers: register values, either a single image or an array of images
+        :return: uint8 array of register images
+        """
+        registers = np.asarray(registers, dtype=np.uint8)
+        if registers.shape[-1] < self.size:
+            padding = [(0, 0)] * (registers.ndim - 1) + [(0, self.size - registers.shape[-1])]
+            registers = np.pad(registers, padding)
+        return registers
+
+    def decode_array(self, registers):
+        """Decode register images into an array of field values.
+
+        :param registers: register image, or an array of images with registers in the last axis
+        :return: uint8 array of field values, ordered as the fields in the schema
+        """
+        return (self._as_image(registers)[..., self.addrs] >> self.shifts) & self.masks
+
+    def decode(self, registers):
+        """Decode a register image into named field values.
+
+        :param registers: register image, or an array of images with registers in the last axis
+        :return: dict of field values keyed by name, as arrays if multiple images were given
+        """
+        values = self.decode_array(registers)
+        if values.ndim == 1:
+            return dict(zip(self.names, values.tolist()))
+        return {name: values[..., idx] for (idx, name) in enumerate(self.names)}
+
+    def encode(self, fields, registers=None):
+        """Encode named field values into a register image.
+
+        :param fields: dict of field values keyed by name
+        :param registers: register image to update, or None to start from all zeros
+        :return: uint8 array of the updated register image
+        :raises KeyError: if a field is unknown
+        :raises ValueError: if a field value is outside the range of the field
+        """
+        if registers is None:
+            image = np.zeros(self.size, dtype=np.uint8)
+        else:
+            image = self._as_image(registers).copy()
+
+        try:
+            idxs = np.array([self._index[name] for name in fields], dtype=np.intp)
+        except KeyError as err:
+            raise KeyError(f"Unknown register field {err}")
+        values = np.array(list(fields.values()), dtype=np.int64).reshape(len(idxs))
+
+        # Reject any values which do not fit in their fields rather than truncating them
+        out_of_range = np.flatnonzero((values < 0) | (values > self.masks[idxs]))
+        if out_of_range.size:
+            idx = out_of_range[0]
+            raise ValueError(
+                f"Value {values[idx]} of register field {self.names[idxs[idx]]} out of range "
+                f"0 to {self.masks[idxs[idx]]}"
+            )
+
+        # Set any full-width fields first, then update the bits of sub-fields
+        full = self.full_width[idxs]
+        image[self.addrs[idxs[full]]] = values[full]
+
+        sub_idxs = idxs[~full]
+        sub_addrs = self.addrs[sub_idxs]
+        shifts = self.shifts[sub_idxs]
+        masks = self.masks[sub_idxs]
+        np.bitwise_and.at(image, sub_addrs, ~(masks << shifts))
+        np.bitwise_or.at(image, sub_addrs, (values[~full] << shifts).astype(np.uint8))
+
+        return image
+
+
+def _build_fields():
+    """Build the list of fields for the register field schema.
+
+    :return: list of RegisterField instances
+    """
+    # Every register is accessible as a full-width field with the name of the register
+    fields = [RegisterField(register.name, register) for register in RegisterMap]
+
+    # Configuration fields
+    fields.extend([
+        RegisterField("PAGE_SELECT", RegisterMap.CONFIG1, 0, 1),
+        RegisterField("TEST_SR_SECTOR", RegisterMap.TEST_SR, 2, 5),
+    ])
+
+    # PLL bias nibbles
+    for register in (RegisterMap.SER_BIAS, RegisterMap.TDC_BIAS):
+        fields.extend([
+            RegisterField(f"{register.name}_LOW", register, 0, 4),
+            RegisterField(f"{register.name}_HIGH", register, 4, 4),
+        ])
+
+    # Per-FIFO full flags and per-serialiser clock status flags, numbered from one
+    flag_registers = (
+        ("FIFO_FULL", (RegisterMap.FIFO_FULL1, RegisterMap.FIFO_FULL2, RegisterMap.FIFO_FULL3), 20),
+        ("SER_CLK_CHECK", (RegisterMap.SER_CLK_CHECK1, RegisterMap.SER_CLK_CHECK2), 16),
+    )
+    for (prefix, registers, num_flags) in flag_registers:
+        for flag in range(num_flags):
+            fields.append(RegisterField(f"{prefix}_{flag + 1}", registers[flag // 8], flag % 8, 1))
+
+    return fields
+
+
+# The compiled schema of all MERCURY ASIC register fields
+REGISTER_FIELDS = RegisterFieldSchema(_build_fields(), REGISTER_METADATA.size)
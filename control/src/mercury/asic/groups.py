@@ -0,0 +1,106 @@
+"""MERCURY ASIC register groups.
+
+This module implements groups of the SPI registers of the MERCURY ASIC which form regular banks
+with the same registers repeated for each of the 10 segments of the ASIC, e.g. the serialiser
+control registers SER_CONTROL1A to SER_CONTROL10F. The registers of each bank are consecutive
+within a page, so a whole bank can be read or written in a single burst transaction, with the
+register values held in NumPy arrays indexed by segment.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import numpy as np
+
+from .registers import REGISTER_METADATA, RegisterMap
+
+NUM_SEGMENTS = 10
+
+
+class RegisterGroup:
+    """
+    MERCURY ASIC register group.
+
+    This class defines a bank of consecutive registers with a fixed number of registers for each
+    segment, with the page and raw address at which the bank can be accessed in a single burst,
+    and packs and unpacks the register values of the bank to and from NumPy arrays.
+    """
+
+    __slots__ = ("name", "addr", "num_segments", "stride", "page", "offset", "shape")
+
+    def __init__(self, name, addr, num_segments=NUM_SEGMENTS, stride=1):
+        """Initialise the register group.
+
+        :param name: name of the group
+        :param addr: true address of the first register of the group
+        :param num_segments: number of segments in the group
+        :param stride: number of registers for each segment
+        :raises ValueError: if the registers of the group cannot be accessed in a single burst
+        """
+        self.name = name
+        self.addr = int(addr)
+        self.num_segments = num_segments
+        self.stride = stride
+        self.shape = (num_segments,) if stride == 1 else (num_segments, stride)
+
+        addrs = range(self.addr, self.addr + len(self))
+        pages = {REGISTER_METADATA.pages[addr] for addr in addrs}
+        if (
+            len(pages) != 1
+            or not all(REGISTER_METADATA.is_register[addr] for addr in addrs)
+            or any(REGISTER_METADATA.offsets[addr] is None for addr in addrs)
+            or any(REGISTER_METADATA.is_shift_register[addr] for addr in addrs)
+        ):
+            raise ValueError(f"Register group {name} cannot be accessed in a single burst")
+
+        self.page = pages.pop()
+        self.offset = REGISTER_METADATA.offsets[self.addr]
+
+    def __len__(self):
+        """Return the number of registers in the group."""
+        return self.num_segments * self.stride
+
+    def pack(self, values):
+        """Pack register values into the contents of a burst write to the group.
+
+        :param values: array of register values of the shape of the group, indexed by segment, or
+                       a value to be broadcast to all registers in the group
+        :return: bytes of the register values
+        :raises ValueError: if the values cannot be broadcast to the group or are out of range
+        """
+        values = np.asarray(values)
+        try:
+            values = np.broadcast_to(values, self.shape)
+        except ValueError:
+            raise ValueError(
+                f"Values of shape {values.shape} cannot be written to register group {self.name} "
+                f"of shape {self.shape}"
+            )
+        if values.size and (values.min() < 0 or values.max() > 0xFF):
+            raise ValueError(f"Values written to register group {self.name} must be 0 to 255")
+        return values.astype(np.uint8).tobytes()
+
+    def unpack(self, data):
+        """Unpack the contents of a burst read of the group into register values.
+
+        :param data: bytes-like register values read from the group
+        :return: uint8 array of register values of the shape of the group, indexed by segment
+        """
+        values = np.frombuffer(bytes(data), dtype=np.uint8, count=len(self))
+        return values.reshape(self.shape).copy()
+
+    def __repr__(self):
+        """Return a string representation of the group."""
+        return (
+            f"RegisterGroup({self.name!r}, {self.addr}, {self.num_segments}, {self.stride})"
+        )
+
+
+# The register groups keyed by name
+REGISTER_GROUPS = {
+    group.name: group for group in (
+        RegisterGroup("SEG_CONTROL_SER", RegisterMap.SEG_CONTROL1_SER),
+        RegisterGroup("SEG_CONTROL_EN", RegisterMap.SEG_CONTROL1_EN),
+        RegisterGroup("RAMP_CONTROL", RegisterMap.RAMP_CONTROL1, stride=2),
+        RegisterGroup("SER_CONTROL", RegisterMap.SER_CONTROL1A, stride=6),
+        RegisterGroup("SER_BIAS", RegisterMap.SER_BIAS1),
+    )
+}
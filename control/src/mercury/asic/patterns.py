@@ -0,0 +1,121 @@
+"""MERCURY ASIC shift register patterns.
+
+This module implements the packing of pixel patterns into the byte layout of the calibration and
+test shift registers of the MERCURY ASIC, and the inverse unpacking of shift register contents
+read back from the ASIC, with vectorised NumPy operations.
+
+The calibration shift register SR_CAL selects the pixels to which calibration pulses are applied
+by enabling columns and rows, i.e. a pixel is selected if both its column and row are enabled. The
+register holds one enable bit for each of the 80 columns followed by one for each of the 80 rows,
+packed most significant bit first.
+
+The test shift register SR_TEST holds a 12-bit test word for each pixel. The pixels are divided
+into 20 sectors of 4 adjacent columns, each sector being written and read as a separate 480-byte
+shift register selected by the sector field of the TEST_SR register. Within a sector, the test
+words are ordered by column and then by row, and packed most significant bit first.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import numpy as np
+
+NUM_ROWS = 80
+NUM_COLUMNS = 80
+NUM_SECTORS = 20
+COLUMNS_PER_SECTOR = NUM_COLUMNS // NUM_SECTORS
+TEST_WORD_BITS = 12
+
+SR_CAL_SIZE = (NUM_COLUMNS + NUM_ROWS) // 8
+SR_TEST_SIZE = NUM_ROWS * COLUMNS_PER_SECTOR * TEST_WORD_BITS // 8
+
+# Bit shifts of the test word, most significant bit first
+_TEST_WORD_SHIFTS = np.arange(TEST_WORD_BITS - 1, -1, -1, dtype=np.uint16)
+
+
+def pack_cal_pattern(pattern):
+    """Pack a calibration pattern into the calibration shift register layout.
+
+    :param pattern: tuple of boolean arrays of the 80 column and 80 row enables, or an 80x80
+                    boolean pixel mask, indexed by row and column, which must select the pixels
+                    in the enabled rows of the enabled columns
+    :return: bytes contents of the calibration shift register
+    :raises ValueError: if the pattern is malformed or the pixel mask cannot be represented
+    """
+    if isinstance(pattern, tuple):
+        (columns, rows) = (np.asarray(enables, dtype=bool) for enables in pattern)
+        if columns.shape != (NUM_COLUMNS,) or rows.shape != (NUM_ROWS,):
+            raise ValueError(
+                f"Calibration enables must have {NUM_COLUMNS} columns and {NUM_ROWS} rows"
+            )
+    else:
+        mask = np.asarray(pattern, dtype=bool)
+        if mask.shape != (NUM_ROWS, NUM_COLUMNS):
+            raise ValueError(f"Calibration pixel mask must have shape ({NUM_ROWS}, {NUM_COLUMNS})")
+        columns = mask.any(axis=0)
+        rows = mask.any(axis=1)
+        if not np.array_equal(np.outer(rows, columns), mask):
+            raise ValueError("Calibration pixel mask must select whole rows of whole columns")
+
+    return np.packbits(np.concatenate([columns, rows])).tobytes()
+
+
+def unpack_cal_pattern(data):
+    """Unpack the contents of the calibration shift register.
+
+    :param data: bytes-like contents of the calibration shift register
+    :return: tuple of boolean arrays of the column and row enables
+    """
+    bits = np.unpackbits(np.frombuffer(bytes(data), dtype=np.uint8, count=SR_CAL_SIZE)).astype(bool)
+    return (bits[:NUM_COLUMNS], bits[NUM_COLUMNS:])
+
+
+def cal_pattern_mask(columns, rows):
+    """Return the pixel mask selected by calibration column and row enables.
+
+    :param columns: boolean array of the column enables
+    :param rows: boolean array of the row enables
+    :return: 80x80 boolean pixel mask indexed by row and column
+    """
+    return np.outer(np.asarray(rows, dtype=bool), np.asarray(columns, dtype=bool))
+
+
+def pack_test_pattern(pattern):
+    """Pack a test pattern into the test shift register sector layout.
+
+    :param pattern: 80x80 array of the test word of each pixel, indexed by row and column, an
+                    80x80x12 boolean array of the bits of each test word, most significant first,
+                    or a 20x480 array of the contents of each sector
+    :return: 20x480 uint8 array of the contents of each test shift register sector
+    :raises ValueError: if the pattern is malformed
+    """
+    pattern = np.asarray(pattern)
+    if pattern.shape == (NUM_SECTORS, SR_TEST_SIZE):
+        return pattern.astype(np.uint8)
+
+    if pattern.shape == (NUM_ROWS, NUM_COLUMNS, TEST_WORD_BITS):
+        bits = pattern.astype(bool)
+    elif pattern.shape == (NUM_ROWS, NUM_COLUMNS):
+        if pattern.dtype != bool and (pattern.min() < 0 or pattern.max() >= 1 << TEST_WORD_BITS):
+            raise ValueError(f"Test words must be between 0 and {(1 << TEST_WORD_BITS) - 1}")
+        bits = (pattern.astype(np.uint16)[..., np.newaxis] >> _TEST_WORD_SHIFTS) & 1
+    else:
+        raise ValueError(f"Test pattern has unsupported shape {pattern.shape}")
+
+    # Reorder the bits by sector, column within the sector and row, then pack each sector
+    bits = bits.reshape(NUM_ROWS, NUM_SECTORS, COLUMNS_PER_SECTOR, TEST_WORD_BITS)
+    bits = bits.transpose(1, 2, 0, 3).reshape(NUM_SECTORS, -1)
+    return np.packbits(bits, axis=1)
+
+
+def unpack_test_pattern(sectors):
+    """Unpack the contents of the test shift register sectors into per-pixel test words.
+
+    :param sectors: 20x480 array of the contents of each test shift register sector, or the
+                    contents of the sectors concatenated in a flat array
+    :return: 80x80 uint16 array of the test word of each pixel, indexed by row and column
+    """
+    sectors = np.asarray(sectors, dtype=np.uint8).reshape(NUM_SECTORS, SR_TEST_SIZE)
+    bits = np.unpackbits(sectors, axis=1).reshape(
+        NUM_SECTORS, COLUMNS_PER_SECTOR, NUM_ROWS, TEST_WORD_BITS
+    )
+    words = (bits.astype(np.uint16) << _TEST_WORD_SHIFTS).sum(axis=-1, dtype=np.uint16)
+    return words.transpose(2, 0, 1).reshape(NUM_ROWS, NUM_COLUMNS)
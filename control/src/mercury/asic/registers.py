@@ -2,7 +2,10 @@
 
 This module implements a simple enumerated map of the SPI registers
 of the MERCURY ASIC, linking the register names (as defined by the ASIC
-documentation) with their addresses.
+documentation) with their addresses. Metadata describing the register map,
+such as the size of the address space and the page and raw address of each
+register, is precomputed at import into lookup tables indexed by address,
+avoiding enum lookups in the inner loops of the device and emulator.
 
 Tim Nicholls, STFC Detector Systems Software Group
 """
@@ -191,4 +194,93 @@ class RegisterMap(IntEnum):
 
         :return: size of the register address space
         """
-        return max([item.value for item in cls])
+        return REGISTER_METADATA.size
+
+
+class RegisterMetadata:
+    """
+    MERCURY ASIC register map metadata.
+
+    This class precomputes lookup tables of the register names and addresses, the page and raw
+    address of each true register address and the raw to true address translation of each page,
+    and flags indicating the read-only and shift registers. The tables indexed by true address
+    cover the whole paged address space.
+    """
+
+    # Size of a register page and the number of registers at the start of the page common to all
+    # pages, i.e. CONFIG1, GLOB1 and GLOB2, which are not affected by the page select
+    PAGE_SIZE = 128
+    NUM_PAGES = 2
+    NUM_COMMON_REGISTERS = 3
+
+    # Shift registers, which take all remaining bytes of a burst as shift register data
+    SHIFT_REGISTERS = (RegisterMap.SR_CAL, RegisterMap.SR_TEST)
+
+    # Read-only flag registers, the values of which are set by the ASIC
+    READ_ONLY_REGISTERS = (
+        RegisterMap.FIFO_FULL1,
+        RegisterMap.FIFO_FULL2,
+        RegisterMap.FIFO_FULL3,
+        RegisterMap.SER_CLK_CHECK1,
+        RegisterMap.SER_CLK_CHECK2,
+    )
+
+    def __init__(self, registers):
+        """Build the register map metadata.
+
+        :param registers: iterable of register enum members
+        """
+        registers = tuple(registers)
+        num_addrs = self.NUM_PAGES * self.PAGE_SIZE
+
+        # Size of the register address space, i.e. one more than the highest register address
+        self.size = max(register.value for register in registers) + 1
+
+        # Register names indexed by address, None where there is no register, and addresses keyed
+        # by name
+        names = [None] * num_addrs
+        for register in registers:
+            names[register.value] = register.name
+        self.names = tuple(names)
+        self.addrs = {register.name: register.value for register in registers}
+
+        # True addresses indexed by raw address in each page
+        self.page_addrs = tuple(
+            tuple(
+                addr + page * self.PAGE_SIZE if addr >= self.NUM_COMMON_REGISTERS else addr
+                for addr in range(self.PAGE_SIZE)
+            )
+            for page in range(self.NUM_PAGES)
+        )
+
+        # Page and raw address indexed by true address. Registers common to all pages have a page
+        # of None and registers which cannot be addressed in any page, since the raw addresses at
+        # which they would be found select the common registers, have a raw address of None.
+        self.pages = tuple(
+            None if addr < self.NUM_COMMON_REGISTERS else addr // self.PAGE_SIZE
+            for addr in range(num_addrs)
+        )
+        self.offsets = tuple(
+            None if page is not None and addr % self.PAGE_SIZE < self.NUM_COMMON_REGISTERS
+            else addr % self.PAGE_SIZE
+            for (addr, page) in enumerate(self.pages)
+        )
+
+        # Flags indexed by true address
+        self.is_register = bytes(names[addr] is not None for addr in range(num_addrs))
+        self.is_read_only = bytes(addr in self.READ_ONLY_REGISTERS for addr in range(num_addrs))
+        self.is_shift_register = bytes(addr in self.SHIFT_REGISTERS for addr in range(num_addrs))
+
+    def name(self, addr):
+        """Return the name of a register.
+
+        :param addr: true register address
+        :return: name of the register, or the address as a string if there is no register
+        """
+        if 0 <= addr < len(self.names) and self.names[addr] is not None:
+            return self.names[addr]
+        return str(addr)
+
+
+# The precomputed MERCURY ASIC register map metadata
+REGISTER_METADATA = RegisterMetadata(RegisterMap)
@@ -0,0 +1,425 @@
+"""MercuryAsicSpiClient - SPI hardware interface to the MERCURY ASIC.
+
+This module implements the interface to a real MERCURY ASIC via the Linux spidev driver,
+presenting the same register transaction interface as the emulator client, so that either can be
+used by the device control. Transactions are transferred by a dedicated worker thread, so that
+the asyncio loop is never blocked, which combines the transactions queued by concurrent callers
+into a single SPI_IOC_MESSAGE ioctl using preallocated transfer descriptors and buffers. Each
+transaction is a separate transfer within the message, with the chip select deasserted between
+them. A loopback transport, routing transactions to the ASIC register model, allows the interface
+to be used without SPI hardware.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import asyncio
+import ctypes
+import fcntl
+import logging
+import os
+import queue
+import struct
+import threading
+
+from mercury.asic_emulator.register_model import MercuryAsicRegisterModel
+
+
+class MercuryAsicSpiError(Exception):
+    """Simple exception class for the MERCURY ASIC SPI interface."""
+
+    pass
+
+
+class SpiIocTransfer(ctypes.Structure):
+    """Linux spidev transfer descriptor, i.e. struct spi_ioc_transfer."""
+
+    _fields_ = [
+        ("tx_buf", ctypes.c_uint64),
+        ("rx_buf", ctypes.c_uint64),
+        ("len", ctypes.c_uint32),
+        ("speed_hz", ctypes.c_uint32),
+        ("delay_usecs", ctypes.c_uint16),
+        ("bits_per_word", ctypes.c_uint8),
+        ("cs_change", ctypes.c_uint8),
+        ("tx_nbits", ctypes.c_uint8),
+        ("rx_nbits", ctypes.c_uint8),
+        ("word_delay_usecs", ctypes.c_uint8),
+        ("pad", ctypes.c_uint8),
+    ]
+
+
+def _spi_ioc_write(number, size):
+    """Return the request code of a spidev ioctl writing to the driver, i.e. _IOW('k', nr, size).
+
+    :param number: ioctl number
+    :param size: size of the ioctl argument in bytes
+    :return: ioctl request code
+    """
+    return (1 << 30) | (size << 16) | (ord("k") << 8) | number
+
+
+SPI_IOC_WR_MODE = _spi_ioc_write(1, 1)
+SPI_IOC_WR_BITS_PER_WORD = _spi_ioc_write(3, 1)
+SPI_IOC_WR_MAX_SPEED_HZ = _spi_ioc_write(4, 4)
+
+# Maximum number of transfers in a single message, limited by the size field of the request code
+SPI_IOC_MAX_TRANSFERS = ((1 << 14) - 1) // ctypes.sizeof(SpiIocTransfer)
+
+
+def spi_ioc_message(num_transfers):
+    """Return the request code of a spidev ioctl transferring a message, i.e. SPI_IOC_MESSAGE(n).
+
+    :param num_transfers: number of transfers in the message
+    :return: ioctl request code
+    """
+    if not 0 < num_transfers <= SPI_IOC_MAX_TRANSFERS:
+        raise ValueError(f"Number of transfers must be between 1 and {SPI_IOC_MAX_TRANSFERS}")
+    return _spi_ioc_write(0, num_transfers * ctypes.sizeof(SpiIocTransfer))
+
+
+def check_transfer(transport, transactions):
+    """Check that transactions fit within the limits of a single transfer of a transport.
+
+    :param transport: transport to transfer the transactions
+    :param transactions: list of register transactions
+    :raises MercuryAsicSpiError: if the transactions exceed the limits
+    """
+    if not 0 < len(transactions) <= transport.max_transfers:
+        raise MercuryAsicSpiError(
+            f"Number of transactions in a transfer must be between 1 and {transport.max_transfers}"
+        )
+    length = sum(len(transaction) for transaction in transactions)
+    if length > transport.buffer_size:
+        raise MercuryAsicSpiError(
+            f"Total length of transactions {length} exceeds transfer buffer size "
+            f"{transport.buffer_size}"
+        )
+
+
+class SpidevTransport:
+    """
+    Linux spidev SPI transport class.
+
+    This class transfers register transactions to the ASIC via a spidev device, transferring
+    multiple transactions in a single ioctl. The transfer descriptors and the transmit and
+    receive buffers are allocated once, limiting the number and total length of the transactions
+    in each transfer.
+    """
+
+    def __init__(
+        self, path="/dev/spidev0.0", speed_hz=1000000, mode=0, max_transfers=64, buffer_size=4096
+    ):
+        """Initialise the transport, opening and configuring the spidev device.
+
+        :param path: path of the spidev device
+        :param speed_hz: SPI clock speed in Hz
+        :param mode: SPI mode
+        :param max_transfers: maximum number of transactions in a single transfer
+        :param buffer_size: maximum total length in bytes of the transactions in a single transfer
+        """
+        spi_ioc_message(max_transfers)
+        self.path = path
+        self.max_transfers = max_transfers
+        self.buffer_size = buffer_size
+
+        self.fd = os.open(path, os.O_RDWR)
+        try:
+            fcntl.ioctl(self.fd, SPI_IOC_WR_MODE, struct.pack("=B", mode))
+            fcntl.ioctl(self.fd, SPI_IOC_WR_BITS_PER_WORD, struct.pack("=B", 8))
+            fcntl.ioctl(self.fd, SPI_IOC_WR_MAX_SPEED_HZ, struct.pack("=I", speed_hz))
+        except OSError:
+            os.close(self.fd)
+            raise
+
+        self._tx_buf = ctypes.create_string_buffer(buffer_size)
+        self._rx_buf = ctypes.create_string_buffer(buffer_size)
+        self._transfers = (SpiIocTransfer * max_transfers)()
+        for transfer in self._transfers:
+            transfer.speed_hz = speed_hz
+            transfer.bits_per_word = 8
+
+        logging.info(f"Opened SPI device {path} at {speed_hz} Hz in mode {mode}")
+
+    def transfer(self, transactions):
+        """Transfer register transactions to the ASIC in a single ioctl.
+
+        :param transactions: list of register transactions
+        :return: tuple of the list of responses and the list of transaction status values, which
+                 are always None since the bus does not report errors
+        """
+        check_transfer(self, transactions)
+
+        tx_addr = ctypes.addressof(self._tx_buf)
+        rx_addr = ctypes.addressof(self._rx_buf)
+        offset = 0
+        for (idx, transaction) in enumerate(transactions):
+            length = len(transaction)
+            ctypes.memmove(tx_addr + offset, bytes(transaction), length)
+            transfer = self._transfers[idx]
+            transfer.tx_buf = tx_addr + offset
+            transfer.rx_buf = rx_addr + offset
+            transfer.len = length
+            transfer.cs_change = idx < len(transactions) - 1
+            offset += length
+
+        fcntl.ioctl(self.fd, spi_ioc_message(len(transactions)), self._transfers)
+
+        responses = []
+        offset = 0
+        for transaction in transactions:
+            responses.append(ctypes.string_at(rx_addr + offset, len(transaction)))
+            offset += len(transaction)
+
+        return (responses, [None] * len(transactions))
+
+    def close(self):
+        """Close the spidev device."""
+        os.close(self.fd)
+
+
+class LoopbackTransport:
+    """
+    Loopback SPI transport class.
+
+    This class stands in for a spidev transport, routing register transactions to an ASIC
+    register model and applying the same limits to each transfer, allowing the SPI interface to
+    be used without hardware. Errors processing transactions are reported in their status.
+    """
+
+    def __init__(self, register_model=None, max_transfers=64, buffer_size=4096):
+        """Initialise the transport.
+
+        :param register_model: register model to route transactions to, or None to create one
+        :param max_transfers: maximum number of transactions in a single transfer
+        :param buffer_size: maximum total length in bytes of the transactions in a single transfer
+        """
+        if register_model is None:
+            register_model = MercuryAsicRegisterModel(None, False)
+
+        self.register_model = register_model
+        self.max_transfers = max_transfers
+        self.buffer_size = buffer_size
+
+    def transfer(self, transactions):
+        """Transfer register transactions to the register model.
+
+        :param transactions: list of register transactions
+        :return: tuple of the list of responses and the list of transaction status values, which
+                 are None if the transaction succeeded and an error message otherwise
+        """
+        check_transfer(self, transactions)
+
+        responses = []
+        status = []
+        for transaction in transactions:
+            try:
+                response = self.register_model.process_transaction(
+                    bytearray(transaction), raise_errors=True
+                )
+                status.append(None)
+            except Exception as err:
+                response = transaction
+                status.append(f"{type(err).__name__}: {err}")
+            responses.append(bytes(response))
+
+        return (responses, status)
+
+    def close(self):
+        """Close the transport."""
+        pass
+
+
+class MercuryAsicSpiClient:
+    """
+    MERCURY ASIC SPI client class.
+
+    This class provides the register transaction interface of the emulator client for a real
+    ASIC connected via an SPI transport. Requests from concurrent callers are queued to a worker
+    thread, which transfers as many queued requests as fit in a single transfer of the transport.
+    The transactions of each request are transferred in order, together unless they do not fit
+    in a single transfer.
+    """
+
+    def __init__(self, transport):
+        """Initialise the client, starting the worker thread.
+
+        :param transport: SPI transport to transfer transactions with
+        """
+        self.transport = transport
+
+        # The connection to the ASIC is made once, so the count of connections never changes
+        self.connections = 1
+
+        self.transfers = 0
+        self.transactions = 0
+
+        self._requests = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._run_worker, name="mercury-asic-spi", daemon=True
+        )
+        self._thread.start()
+
+    async def read(self, transaction, asic=None):
+        """Execute an ASIC register read transaction.
+
+        :param transaction: bytearray of the appropriate length (read length + 1 address byte)
+        :param asic: must be None, since the SPI interface addresses a single ASIC
+        :return bytes response from the ASIC
+        """
+        transaction = bytearray(transaction)
+        transaction[0] |= MercuryAsicRegisterModel.REGISTER_RW_MASK
+        return await self.transfer(transaction, asic)
+
+    async def write(self, transaction, asic=None):
+        """Execute an ASIC register write transaction.
+
+        :param transaction: bytearray of the appropriate length (1 address byte + register values)
+        :param asic: must be None, since the SPI interface addresses a single ASIC
+        :return bytes response from the ASIC
+        """
+        transaction = bytearray(transaction)
+        transaction[0] &= MercuryAsicRegisterModel.REGISTER_ADDR_MASK
+        return await self.transfer(transaction, asic)
+
+    async def transfer(self, transaction, asic=None):
+        """Transfer an ASIC register transaction.
+
+        :param transaction: bytearray of the register transaction to transfer
+        :param asic: must be None, since the SPI interface addresses a single ASIC
+        :return bytes response from the ASIC
+        :raises MercuryAsicSpiError: if the transaction failed
+        """
+        (responses, status) = await self.transfer_batch([transaction], asic)
+        if status[0] is not None:
+            raise MercuryAsicSpiError(f"Transaction failed: {status[0]}")
+        return responses[0]
+
+    async def transfer_batch(self, transactions, asic=None):
+        """Transfer a batch of ASIC register transactions in a single transfer.
+
+        :param transactions: iterable of bytearray register transactions to transfer
+        :param asic: must be None, since the SPI interface addresses a single ASIC
+        :return: tuple of the list of responses and the list of transaction status values
+        """
+        if asic is not None:
+            raise ValueError("SPI interface addresses a single ASIC")
+
+        transactions = [bytes(transaction) for transaction in transactions]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._requests.put((transactions, loop, future))
+        return await future
+
+    def close(self):
+        """Close the client, stopping the worker thread and closing the transport."""
+        self._requests.put(None)
+        self._thread.join()
+        self.transport.close()
+
+    def _run_worker(self):
+        """Run the worker thread loop.
+
+        Each iteration of the loop waits for a request to be queued, then takes any further
+        requests already queued that fit in the same transfer, transfers them and resolves the
+        future of each request with its responses and status. A request that does not fit is
+        held over to the next transfer.
+        """
+        request = None
+        while True:
+            if request is None:
+                request = self._requests.get()
+            if request is None:
+                break
+
+            group = [request]
+            num_transactions = len(request[0])
+            length = sum(len(transaction) for transaction in request[0])
+            request = None
+            while True:
+                try:
+                    request = self._requests.get_nowait()
+                except queue.Empty:
+                    request = None
+                    break
+                if request is None:
+                    self._requests.put(None)
+                    break
+                num_transactions += len(request[0])
+                length += sum(len(transaction) for transaction in request[0])
+                if (
+                    num_transactions > self.transport.max_transfers
+                    or length > self.transport.buffer_size
+                ):
+                    break
+                group.append(request)
+                request = None
+
+            self._transfer_group(group)
+
+    def _transfer_group(self, group):
+        """Transfer a group of requests and resolve their futures.
+
+        :param group: list of requests, each a tuple of the transactions, loop and future
+        """
+        transactions = [transaction for (request, _, _) in group for transaction in request]
+        try:
+            (responses, status) = ([], [])
+            for chunk in self._chunks(transactions):
+                (chunk_responses, chunk_status) = self.transport.transfer(chunk)
+                responses.extend(chunk_responses)
+                status.extend(chunk_status)
+                self.transfers += 1
+                self.transactions += len(chunk)
+            error = None
+        except Exception as err:
+            logging.error(f"SPI transfer failed: {err}")
+            error = err
+
+        offset = 0
+        for (request, loop, future) in group:
+            try:
+                if error is None:
+                    result = (
+                        responses[offset:offset + len(request)],
+                        status[offset:offset + len(request)],
+                    )
+                    loop.call_soon_threadsafe(self._set_result, future, result)
+                else:
+                    loop.call_soon_threadsafe(self._set_exception, future, error)
+            except RuntimeError:
+                logging.debug("Discarding SPI response for request from a closed loop")
+            offset += len(request)
+
+    def _chunks(self, transactions):
+        """Split transactions into chunks which each fit in a single transfer of the transport.
+
+        A single request with more transactions than fit in one transfer, e.g. a large batch, is
+        thereby transferred in order in several transfers.
+
+        :param transactions: list of register transactions
+        :return: generator of lists of transactions
+        """
+        chunk = []
+        length = 0
+        for transaction in transactions:
+            if chunk and (
+                len(chunk) == self.transport.max_transfers
+                or length + len(transaction) > self.transport.buffer_size
+            ):
+                yield chunk
+                chunk = []
+                length = 0
+            chunk.append(transaction)
+            length += len(transaction)
+        yield chunk
+
+    @staticmethod
+    def _set_result(future, result):
+        """Set the result of a request future, unless cancelled."""
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def _set_exception(future, error):
+        """Set the exception of a request future, unless cancelled."""
+        if not future.done():
+            future.set_exception(error)
@@ -2,20 +2,25 @@
 
 This class implements a client that communicates with the MERCURY ASIC emulator, simulating the
 SPI transaction interface that the real ASIC will present to the control system. The connection
-is made via a ZeroMQ channel, with register read/write accesses encoded with msgpack.
+is made via a ZeroMQ channel, with register read/write accesses encoded with msgpack or, if
+negotiated with the emulator, sent as raw bytes. Requests are pipelined: each is sent with a
+request ID, which the emulator returns with the response, allowing multiple requests to be in
+flight at once and concurrent tasks to share the client.
 
 Tim Nicholls, STFC Detector Systems Software Group
 """
 import asyncio
+import itertools
 import logging
 import random
 import signal
+import struct
 
 import zmq
 import zmq.asyncio
-from zmq.utils.strtypes import cast_bytes
-import msgpack
+import zmq.utils.monitor
 
+from . import protocol
 from .register_model import MercuryAsicRegisterModel
 
 
@@ -26,30 +31,70 @@ class MercuryAsicClient:
     This class provides a client for communicating with the MERCURY ASIC emulator via a ZeroMQ
     channel. The client can either be run standalone, sending and receiving a fixed set of
     transaction as a basic test, or used by other code to read/write communication as necessary.
+
+    Each request is sent with a request ID frame, which the emulator returns in the routing
+    envelope of the response. A background task receives the responses and resolves the future
+    awaited by the sender of each request, so that responses are matched to requests whatever
+    order they are received in. The number of requests in flight is limited to a window.
+
+    The connections made by the socket to the emulator are counted by a monitor task, allowing
+    users of the client to detect reconnection, e.g. to an emulator which has been restarted.
     """
 
-    def __init__(self, endpoint="tcp://127.0.0.1:5555"):
+    # Format of the request ID frame sent with each request
+    REQUEST_ID = struct.Struct("<I")
+
+    def __init__(
+        self, endpoint="tcp://127.0.0.1:5555", wire_format=protocol.FORMAT_MSGPACK, identity=None,
+        window=64
+    ):
         """Initialise the client object.
 
         :param endpoint: string endpoint URI of the emulator server (default tcp://127.0.0.1:5555)
+        :param wire_format: wire format to negotiate with the emulator for single transactions
+                            (default msgpack, which requires no negotiation)
+        :param identity: client ID to identify the client to the emulator, e.g. to be scheduled
+                         with a specific weight, or None for a randomised ID
+        :param window: maximum number of requests in flight at once
         """
         self.endpoint = endpoint
         logging.info(f"Connecting client to emulator at endpoint {self.endpoint}")
 
+        # Use msgpack until any other requested wire format has been negotiated with the server
+        if wire_format not in protocol.WIRE_FORMATS:
+            raise ValueError(f"Unsupported wire format {wire_format}")
+        self.wire_format = protocol.FORMAT_MSGPACK
+        self._requested_wire_format = wire_format
+
         # Create a ZeroMQ async context and socket
         self.ctx = zmq.asyncio.Context.instance()
         self.socket = self.ctx.socket(zmq.DEALER)
 
-        # As this is a dealer socket, define a randomised client ID and set on the socket
-        identity = "{:04x}-{:04x}".format(
-            random.randrange(0x10000), random.randrange(0x10000)
-        )
-        self.socket.setsockopt(zmq.IDENTITY, cast_bytes(identity))
+        # As this is a dealer socket, define a client ID, randomised unless specified, and set
+        # on the socket
+        if identity is None:
+            identity = "{:04x}-{:04x}".format(random.randrange(0x10000), random.randrange(0x10000))
+        self.identity = identity.encode("utf-8") if isinstance(identity, str) else bytes(identity)
+        self.socket.setsockopt(zmq.IDENTITY, self.identity)
 
-        # Connect the socket to the server
+        # Monitor the socket for connection events, then connect the socket to the server
+        self.connections = 0
+        self._monitor_socket = self.socket.get_monitor_socket(zmq.EVENT_CONNECTED)
         self.socket.connect(self.endpoint)
 
-    async def read(self, transaction):
+        # Initialise the state of requests in flight, the response receiver task and window
+        # semaphore of which are created when the first request is sent, so that they are bound
+        # to the running event loop
+        self.window = window
+        self._window = None
+        self._negotiate_lock = None
+        self._request_ids = itertools.count()
+        self._pending = {}
+        self._receive_task = None
+        self._receive_error = None
+        self._monitor_task = None
+
+    async def read(self, transaction, asic=None):
         """Execute an ASIC register read transaction.
 
         This method sends a register read transaction to the ASIC emulator. The transaction
@@ -59,6 +104,7 @@ class MercuryAsicClient:
         address, the total length would be four.
 
         :param transaction: bytearray of the appropriate length (read length + 1 address byte)
+        :param asic: index of the emulated ASIC to address, or None for the default ASIC
         :return bytearray response from the emulator
         """
         logging.debug(
@@ -69,10 +115,10 @@ class MercuryAsicClient:
         transaction[0] |= MercuryAsicRegisterModel.REGISTER_RW_MASK
 
         # Send the transaction and return the response
-        response = await self.transfer(transaction)
+        response = await self.transfer(transaction, asic)
         return response
 
-    async def write(self, transaction):
+    async def write(self, transaction, asic=None):
         """Execute an ASIC register write transaction.
 
         This method sends a register write transaction to the ASIC emulator. The transaction is
@@ -81,6 +127,8 @@ class MercuryAsicClient:
         values of the registers at consecutive addresses to be written.
 
         :param transaction: bytearray of the appropriate length (1 address byte + register values)
+        :param asic: index of the emulated ASIC to address, protocol.ASIC_BROADCAST to address
+                     all ASICs, or None for the default ASIC
         :return bytearray response from the emulator
         """
         logging.debug(
@@ -91,28 +139,200 @@ class MercuryAsicClient:
         transaction[0] &= MercuryAsicRegisterModel.REGISTER_ADDR_MASK
 
         # Send the transaction and return the response
-        response = await self.transfer(transaction)
+        response = await self.transfer(transaction, asic)
         return response
 
-    async def transfer(self, transaction):
+    async def transfer(self, transaction, asic=None):
         """Transfer an ASIC register transaction to the emulator.
 
-        This method transfers an encoded ASIC register transaction to the emulator. The
-        transaction is encoded with msgpack then transmitted on the ZeroMQ channel. A response is
-        then awaited, unpacked and returned.
+        This method transfers an ASIC register transaction to the emulator. The transaction is
+        either encoded with msgpack or, if the raw wire format has been negotiated with the
+        emulator, sent as raw bytes preceded by a short header. A response is then awaited,
+        unpacked and returned.
 
         :param transaction: bytearray of the register transaction to transfer
+        :param asic: index of the emulated ASIC to address, or None for the default ASIC
         :return response: bytearray response from the emulator
         """
-        # Pack the transaction and send on the socket
-        send_msg = msgpack.packb(transaction)
-        await self.socket.send(send_msg)
-
-        # Receive the response, unpack it and return
-        recv_msg = await self.socket.recv()
-        response = msgpack.unpackb(recv_msg)
+        # Negotiate the requested wire format with the server if not already done, ensuring that
+        # only one of any concurrent transfers does so
+        if self._requested_wire_format != self.wire_format:
+            if self._negotiate_lock is None:
+                self._negotiate_lock = asyncio.Lock()
+            async with self._negotiate_lock:
+                if self._requested_wire_format != self.wire_format:
+                    await self.negotiate(self._requested_wire_format)
+
+        # Send raw transactions with a header and return the response without the header
+        if self.wire_format == protocol.FORMAT_RAW:
+            header = protocol.pack_raw_header(asic)
+            recv_msg = await self._request(header + bytes(transaction))
+            return recv_msg[len(header):]
+
+        # Pack the transaction and send it, then unpack the response and return it
+        recv_msg = await self._request(protocol.pack_transaction(transaction, asic))
+        (response, _) = protocol.unpack_transaction(recv_msg)
         return response
 
+    async def negotiate(self, wire_format=protocol.FORMAT_RAW):
+        """Negotiate the wire format for single transactions with the emulator.
+
+        This method sends a hello message to the emulator requesting the specified wire format.
+        Servers which do not support the requested format, including those which do not
+        understand hello messages, leave the client using msgpack.
+
+        :param wire_format: wire format to request
+        :return: the negotiated wire format
+        """
+        recv_msg = await self._request(protocol.pack_hello([wire_format]))
+        self.wire_format = protocol.unpack_hello_response(recv_msg)
+        self._requested_wire_format = self.wire_format
+
+        logging.debug(f"Negotiated {self.wire_format} wire format with emulator")
+        return self.wire_format
+
+    async def transfer_batch(self, transactions, asic=None):
+        """Transfer a batch of ASIC register transactions to the emulator.
+
+        This method transfers multiple register transactions to the emulator in a single batch
+        message, requiring only one round trip. The transactions must already have the RW bit in
+        the address byte set appropriately, e.g. by building them with the read_transaction and
+        write_transaction methods. The responses are returned along with the status of each
+        transaction, which is None if the transaction succeeded and an error message otherwise.
+
+        :param transactions: iterable of bytearray register transactions to transfer
+        :param asic: index of the emulated ASIC to address, or None for the default ASIC
+        :return: tuple of the list of responses and the list of transaction status values
+        """
+        # Pack the batch and send it, then unpack the batch response and return it
+        recv_msg = await self._request(protocol.pack_batch(transactions, asic))
+        return protocol.unpack_batch_response(recv_msg)
+
+    async def snapshot(self, asic=None):
+        """Request a snapshot of the registers of an emulated ASIC.
+
+        The snapshot contains the current register values and the version of the last register
+        change event published by the emulator for the ASIC, allowing a subscriber to register
+        change events to apply subsequent events to the snapshot.
+
+        :param asic: index of the emulated ASIC, or None for the default ASIC
+        :return: tuple of the version and bytes register values
+        """
+        recv_msg = await self._request(protocol.pack_snapshot_request(asic))
+        return protocol.unpack_snapshot_response(recv_msg)
+
+    def close(self):
+        """Close the client, cancelling any requests in flight."""
+        for task in (self._receive_task, self._monitor_task):
+            if task is not None:
+                task.cancel()
+        self._receive_task = None
+        self._monitor_task = None
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self.socket.disable_monitor()
+        self._monitor_socket.close(linger=0)
+        self.socket.close(linger=0)
+
+    async def _request(self, data):
+        """Send a request to the emulator and await the response.
+
+        The request is sent with a new request ID once there is room in the window of requests
+        in flight. The response is received by the receiver task which, along with the socket
+        monitor task, is started if necessary.
+
+        :param data: bytes encoded request message
+        :return: bytes encoded response
+        :raises ServerBusyError: if the emulator was too busy to accept the message
+        :raises Exception: the error which stopped the receiver task, if it is no longer running
+        """
+        if self._receive_task is None:
+            self._receive_task = asyncio.get_running_loop().create_task(self._run_receiver())
+            self._monitor_task = asyncio.get_running_loop().create_task(self._run_monitor())
+        if self._window is None:
+            self._window = asyncio.Semaphore(self.window)
+
+        async with self._window:
+            if self._receive_error is not None:
+                raise self._receive_error
+            request_id = self.REQUEST_ID.pack(next(self._request_ids) & 0xFFFFFFFF)
+            future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+            try:
+                await self.socket.send_multipart([request_id, data])
+                return await future
+            finally:
+                self._pending.pop(request_id, None)
+
+    async def _run_receiver(self):
+        """Run the response receiver task loop.
+
+        Each response received is matched to the request in flight with the request ID returned
+        in the response envelope, resolving the future awaited by the sender of the request.
+        Responses to requests no longer in flight, e.g. those cancelled by the sender, are
+        discarded. If receiving fails, e.g. because the socket has been closed, the error is
+        raised in every request in flight and in any request made subsequently.
+        """
+        while True:
+            try:
+                recvd_msg = await self.socket.recv_multipart()
+            except Exception as err:
+                logging.error(f"Error receiving emulator response: {err}")
+                self._receive_error = err
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(err)
+                return
+
+            if len(recvd_msg) != 2:
+                logging.warning(f"Discarding emulator response with {len(recvd_msg)} frames")
+                continue
+
+            (request_id, response) = recvd_msg
+            future = self._pending.get(request_id)
+            if future is None or future.done():
+                logging.debug("Discarding emulator response to request no longer in flight")
+                continue
+
+            if protocol.is_busy(response):
+                future.set_exception(protocol.ServerBusyError("Emulator is busy, message rejected"))
+            else:
+                future.set_result(response)
+
+    async def _run_monitor(self):
+        """Run the socket monitor task loop, counting the connections made to the emulator."""
+        while True:
+            event = zmq.utils.monitor.parse_monitor_message(
+                await self._monitor_socket.recv_multipart()
+            )
+            if event["event"] == zmq.EVENT_CONNECTED:
+                self.connections += 1
+                logging.debug(f"Client connected to emulator at {event['endpoint']}")
+
+    @staticmethod
+    def read_transaction(addr, length):
+        """Build a register read transaction.
+
+        :param addr: start address for reading
+        :param length: number of registers to read
+        :return: bytearray read transaction with the RW bit set in the address byte
+        """
+        transaction = bytearray(1 + length)
+        transaction[0] = (addr & MercuryAsicRegisterModel.REGISTER_ADDR_MASK) | (
+            MercuryAsicRegisterModel.REGISTER_RW_MASK
+        )
+        return transaction
+
+    @staticmethod
+    def write_transaction(addr, *vals):
+        """Build a register write transaction.
+
+        :param addr: start address for writing
+        :param vals: values to write to registers
+        :return: bytearray write transaction with the RW bit cleared in the address byte
+        """
+        return bytearray([addr & MercuryAsicRegisterModel.REGISTER_ADDR_MASK, *vals])
+
     def test(self, ioloop=None):
         """
         Test the client-server communication.
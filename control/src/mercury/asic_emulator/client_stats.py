@@ -0,0 +1,250 @@
+"""ClientStats - per-client transaction statistics for the MERCURY ASIC emulator.
+
+This module implements the statistics recorded by the emulator server for each client, i.e.
+counts of the transactions, messages, bytes, errors and rejected messages, and a histogram of
+the time taken by the server to process each message. The histogram uses log-linear buckets, in
+the style of an HDR histogram, so that recording a latency costs only a few integer operations
+and the precision of each bucket is proportional to its value.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import collections
+import time
+
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram class.
+
+    This class implements a histogram of latencies in nanoseconds. Latencies are divided into
+    power-of-two ranges, each of which is split into a fixed number of linear sub-buckets, giving
+    a constant relative precision of the recorded values. Latencies above the maximum trackable
+    value are counted in the last bucket.
+    """
+
+    def __init__(self, sub_bucket_bits=3, max_value=1 << 32):
+        """Initialise the histogram.
+
+        :param sub_bucket_bits: number of bits of precision of each bucket, i.e. each power-of-two
+                                range is split into 2**sub_bucket_bits buckets
+        :param max_value: maximum trackable latency in nanoseconds
+        """
+        self.sub_bucket_bits = sub_bucket_bits
+        self.max_value = max_value
+        self.counts = [0] * (self._index(max_value) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        """Return the index of the bucket counting a value.
+
+        :param value: latency value in nanoseconds
+        :return: index of the bucket
+        """
+        shift = max(0, value.bit_length() - self.sub_bucket_bits - 1)
+        return (shift << self.sub_bucket_bits) + (value >> shift)
+
+    def bucket_value(self, index):
+        """Return the lowest value counted by a bucket.
+
+        :param index: index of the bucket
+        :return: lowest latency value in nanoseconds counted by the bucket
+        """
+        shift = max(0, (index >> self.sub_bucket_bits) - 1)
+        return (index - (shift << self.sub_bucket_bits)) << shift
+
+    def record(self, value):
+        """Record a latency value in the histogram.
+
+        :param value: latency in nanoseconds
+        """
+        self.counts[self._index(min(value, self.max_value))] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percentile):
+        """Return the value at a percentile of the recorded latencies.
+
+        The value returned is the lowest value of the bucket containing the percentile, so is
+        accurate to the precision of the histogram buckets.
+
+        :param percentile: percentile between 0 and 100
+        :return: latency in nanoseconds at the percentile, or None if nothing has been recorded
+        """
+        if not self.count:
+            return None
+
+        threshold = max(1, -(-self.count * percentile // 100))
+        cumulative = 0
+        for (index, count) in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= threshold:
+                return max(self.min, min(self.bucket_value(index), self.max))
+
+    def stats(self):
+        """Return a dict of the histogram statistics.
+
+        Latencies are reported in microseconds, with the non-empty buckets of the histogram as a
+        list of pairs of the lowest value and count of each bucket.
+
+        :return: dict of histogram statistics
+        """
+        def to_us(value):
+            return None if value is None else value / 1000.0
+
+        return {
+            "count": self.count,
+            "min_us": to_us(self.min),
+            "mean_us": to_us(self.total / self.count if self.count else None),
+            "max_us": to_us(self.max),
+            "p50_us": to_us(self.percentile(50)),
+            "p90_us": to_us(self.percentile(90)),
+            "p99_us": to_us(self.percentile(99)),
+            "buckets": [
+                [to_us(self.bucket_value(index)), count]
+                for (index, count) in enumerate(self.counts) if count
+            ],
+        }
+
+
+class ClientStats:
+    """
+    Emulator client statistics class.
+
+    This class holds the statistics of the messages and transactions processed by the emulator
+    server for a single client.
+    """
+
+    __slots__ = (
+        "messages", "transactions", "reads", "writes", "bytes_received", "bytes_sent", "errors",
+        "busy", "last_active", "latency",
+    )
+
+    def __init__(self):
+        """Initialise the client statistics."""
+        self.messages = 0
+        self.transactions = 0
+        self.reads = 0
+        self.writes = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.errors = 0
+        self.busy = 0
+        self.last_active = None
+        self.latency = LatencyHistogram()
+
+    def record_transaction(self, is_read, error=False):
+        """Record a transaction processed for the client.
+
+        :param is_read: boolean indicating a read transaction
+        :param error: boolean indicating the transaction failed
+        """
+        self.transactions += 1
+        if is_read:
+            self.reads += 1
+        else:
+            self.writes += 1
+        if error:
+            self.errors += 1
+
+    def record_message(self, bytes_received, bytes_sent, latency):
+        """Record a message processed for the client.
+
+        :param bytes_received: length of the message received from the client
+        :param bytes_sent: length of the response sent to the client
+        :param latency: time taken to process the message in nanoseconds
+        """
+        self.messages += 1
+        self.bytes_received += bytes_received
+        self.bytes_sent += bytes_sent
+        self.last_active = time.time()
+        self.latency.record(latency)
+
+    def stats(self):
+        """Return a dict of the client statistics."""
+        return {
+            "messages": self.messages,
+            "transactions": self.transactions,
+            "reads": self.reads,
+            "writes": self.writes,
+            "bytes_received": self.bytes_received,
+            "bytes_sent": self.bytes_sent,
+            "errors": self.errors,
+            "busy": self.busy,
+            "last_active": self.last_active,
+            "latency": self.latency.stats(),
+        }
+
+
+class ClientStatsTable:
+    """
+    Emulator client statistics table class.
+
+    This class holds the statistics of each client of the emulator server, keyed by client ID.
+    The number of clients held is limited, discarding the statistics of the least recently
+    active client when a new client exceeds the limit, so that clients repeatedly reconnecting
+    with new IDs do not grow the table without bound.
+    """
+
+    def __init__(self, max_clients=256):
+        """Initialise the client statistics table.
+
+        :param max_clients: maximum number of clients to hold statistics for
+        """
+        self.max_clients = max_clients
+        self._clients = collections.OrderedDict()
+
+    def __len__(self):
+        """Return the number of clients in the table."""
+        return len(self._clients)
+
+    def get(self, client_id):
+        """Get the statistics of a client, creating them if required.
+
+        :param client_id: bytes ID of the client
+        :return: ClientStats instance for the client
+        """
+        try:
+            client_stats = self._clients[client_id]
+            self._clients.move_to_end(client_id)
+        except KeyError:
+            client_stats = self._clients[client_id] = ClientStats()
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+
+        return client_stats
+
+    def clear(self):
+        """Clear the statistics of all clients."""
+        self._clients.clear()
+
+    def stats(self):
+        """Return a dict of the statistics of each client, keyed by printable client ID."""
+        return {
+            self.client_name(client_id): client_stats.stats()
+            for (client_id, client_stats) in self._clients.items()
+        }
+
+    @staticmethod
+    def client_name(client_id):
+        """Return a printable name for a client ID.
+
+        Client IDs set by the emulator client are printable text, whereas those assigned by the
+        server socket are binary, so are rendered in hexadecimal.
+
+        :param client_id: bytes ID of the client
+        :return: printable client name
+        """
+        try:
+            name = client_id.decode("ascii")
+            if name.isprintable():
+                return name
+        except UnicodeDecodeError:
+            pass
+        return "0x" + client_id.hex()
@@ -9,8 +9,11 @@ import logging
 
 from odin.adapters.parameter_tree import ParameterTree, ParameterTreeError
 
-from .register_model import MercuryAsicRegisterModel
+from mercury.asic.fields import REGISTER_FIELDS
+from .farm import EmulatorFarm
+from .multi_register_model import MercuryMultiAsicRegisterModel
 from .server import EmulatorServer
+from .tracer import TransactionTracer
 
 
 class MercuryAsicEmulatorError(Exception):
@@ -37,24 +40,142 @@ class MercuryAsicEmulator:
         # Extract the required configuration settings from the options dict
         endpoint = options.get("endpoint", "127.0.0.1:5555")
         log_register_writes = options.get("log_register_writes", False)
-
-        # Create the ASIC register model
-        self.register_model = MercuryAsicRegisterModel(self, log_register_writes)
-
-        # Create the emulator server
-        self.server = EmulatorServer(endpoint, ioloop, self.register_model)
-
-        # Define the parameter tree containing register state and client status
+        self.num_asics = int(options.get("num_asics", 1))
+        trace_records = int(options.get("trace_records", 4096))
+        trace_payload_size = int(options.get("trace_payload_size", 32))
+        self.trace_enabled = bool(options.get("trace_transactions", False))
+        self.trace_file = options.get("trace_file", "emulator_trace.bin")
+        max_batch_size = int(options.get("max_batch_size", 64))
+        publish_endpoint = options.get("publish_endpoint", None)
+        self.num_workers = int(options.get("num_workers", 0))
+        high_water_mark = int(options.get("client_high_water_mark", 1024))
+        client_weights = self._parse_client_weights(options.get("client_weights", ""))
+
+        # Create the transaction tracer
+        self.tracer = TransactionTracer(trace_records, trace_payload_size)
+
+        # If worker processes are specified, create an emulator farm with the ASIC register
+        # models divided between the workers. Otherwise create the ASIC register model and
+        # the emulator server in this process.
+        if self.num_workers:
+            if publish_endpoint or self.trace_enabled:
+                logging.warning(
+                    "Register change publishing and transaction tracing are not supported "
+                    "by the emulator farm"
+                )
+            self.register_model = None
+            self.server = EmulatorFarm(
+                endpoint, ioloop, self.num_workers, self.num_asics, log_register_writes,
+                max_batch_size, high_water_mark=high_water_mark, client_weights=client_weights
+            )
+        else:
+            self.register_model = MercuryMultiAsicRegisterModel(
+                self, log_register_writes, self.num_asics
+            )
+            self.server = EmulatorServer(
+                endpoint,
+                ioloop,
+                self.register_model,
+                self.tracer if self.trace_enabled else None,
+                max_batch_size,
+                publish_endpoint,
+                high_water_mark,
+                client_weights,
+            )
+
+        # Define the parameter tree containing register state and client status, and the status
+        # of the workers if running an emulator farm
+        farm_tree = {
+            "num_workers": (lambda: self.num_workers, None),
+            "workers": (self.server.worker_stats if self.num_workers else list, None),
+        }
         self.parameters = ParameterTree(
             {
                 "status": {
                     "connected": (self.server.connected, None),
-                    "clients": (self.server.clients, None),
+                    "connections": (self.server.clients, None),
+                    "clients": (self.server.client_stats, None),
+                    "queued": (self.server.queued, None),
+                    "publish_endpoint": (lambda: self.server.publish_endpoint or "", None),
+                },
+                "num_asics": (lambda: self.num_asics, None),
+                "farm": farm_tree,
+                "registers": (self._get_registers, None),
+                "fields": (self._get_fields, None),
+                "trace": {
+                    "enabled": (lambda: self.trace_enabled, self._set_trace_enabled),
+                    "records": (lambda: self.tracer.count, None),
+                    "file": (lambda: self.trace_file, self._save_trace),
                 },
-                "registers": (self.register_model.registers, None),
             }
         )
 
+    @staticmethod
+    def _parse_client_weights(client_weights):
+        """Parse the client scheduling weights option.
+
+        :param client_weights: comma-separated list of client ID:weight pairs, or a dict
+        :return: dict of weights keyed by client ID
+        """
+        if isinstance(client_weights, dict):
+            return {client_id: int(weight) for (client_id, weight) in client_weights.items()}
+
+        weights = {}
+        for entry in filter(None, (entry.strip() for entry in client_weights.split(","))):
+            try:
+                (client_id, weight) = entry.rsplit(":", 1)
+                weights[client_id.strip()] = int(weight)
+            except ValueError:
+                raise MercuryAsicEmulatorError(f"Invalid client weight specification: {entry}")
+        return weights
+
+    def _get_registers(self):
+        """Return the current register values.
+
+        :return: list of register values, or a list of lists if emulating multiple ASICs, which
+                 is empty if the registers are emulated by an emulator farm
+        """
+        if self.register_model is None:
+            return []
+        if self.num_asics == 1:
+            return self.register_model.registers()
+        return self.register_model.register_array.tolist()
+
+    def _get_fields(self):
+        """Return the current register field values.
+
+        :return: dict of field values, as lists indexed by ASIC if emulating multiple ASICs,
+                 which is empty if the registers are emulated by an emulator farm
+        """
+        if self.register_model is None:
+            return {}
+        fields = REGISTER_FIELDS.decode(self.register_model.register_array)
+        if self.num_asics == 1:
+            return {name: int(values[0]) for (name, values) in fields.items()}
+        return {name: values.tolist() for (name, values) in fields.items()}
+
+    def _set_trace_enabled(self, enabled):
+        """Enable or disable transaction tracing.
+
+        :param enabled: boolean flag to enable tracing
+        """
+        self.trace_enabled = bool(enabled)
+        self.server.tracer = self.tracer if self.trace_enabled else None
+
+    def _save_trace(self, trace_file):
+        """Save the contents of the transaction trace buffer to a file.
+
+        The saved file can be rendered with the emulator_trace command.
+
+        :param trace_file: path of the file to save the trace to
+        """
+        self.trace_file = trace_file
+        try:
+            self.tracer.save(trace_file)
+        except OSError as err:
+            raise ParameterTreeError(f"Failed to save transaction trace: {err}")
+        logging.info(f"Saved {self.tracer.count} transaction trace records to {trace_file}")
+
     async def get(self, path):
         """Get values from the emulator paramter tree.
 
@@ -0,0 +1,462 @@
+"""EmulatorFarm - process-sharded MERCURY ASIC emulation.
+
+This module implements an emulator farm for the simulation of large numbers of MERCURY ASICs.
+The emulated ASICs are divided into contiguous shards, each of which is emulated by an emulator
+server running in a separate worker process. A front-end ROUTER socket, to which clients connect
+as they would to a single emulator server, routes each transaction to the worker emulating the
+ASIC it is addressed to, re-addressing it with the index of the ASIC within that shard, and
+returns the responses to the clients. Transactions broadcast to all ASICs are forwarded to every
+worker, with the response returned once all workers have processed the transaction, combining the
+responses so that an error from any worker is returned.
+
+The front end records the statistics of each client, as a single emulator server would. The
+numbers of messages, transactions, bytes and the latency are measured at the front end, which
+includes the time taken to route messages to and from the workers. Errors are counted where
+they are reported in responses, i.e. failed batch transactions and rejected messages, but not
+for single transactions, the responses to which do not indicate failure.
+
+A worker whose queue for a client is full rejects the message with a busy response. A broadcast
+rejected by any worker returns the busy response to the client, although the other workers may
+already have applied it, so a busy response to a broadcast does not mean that no ASIC was written.
+
+Transactions from a client to any one ASIC are processed in order. Transactions from a client
+that has several outstanding to ASICs in different shards may be answered out of order.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+import msgpack
+import zmq
+import zmq.asyncio
+
+from . import protocol
+from .multi_register_model import MercuryMultiAsicRegisterModel
+from .register_model import MercuryAsicRegisterModel
+from .server import EmulatorServer
+
+
+def run_worker(endpoint, num_asics, log_register_writes, server_options, parent_pid):
+    """Run an emulator farm worker.
+
+    This function is the entry point of an emulator farm worker process, running an emulator
+    server for a shard of ASICs until the process is terminated or the front-end process which
+    started it exits.
+
+    :param endpoint: ZMQ endpoint URI for the worker server
+    :param num_asics: number of ASICs in the shard emulated by the worker
+    :param log_register_writes: boolean option to emit logging messages for register writes
+    :param server_options: dict of keyword arguments for the worker EmulatorServer
+    :param parent_pid: process ID of the front end
+    """
+    async def watch_parent():
+        while os.getppid() == parent_pid:
+            await asyncio.sleep(1.0)
+        logging.warning(f"Emulator farm front end exited, stopping worker at {endpoint}")
+
+    async def serve():
+        register_model = MercuryMultiAsicRegisterModel(None, log_register_writes, num_asics)
+        server = EmulatorServer(
+            endpoint, asyncio.get_running_loop(), register_model, client_frame=1, **server_options
+        )
+        await asyncio.wait(
+            [server.server_task, asyncio.ensure_future(watch_parent())],
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+class EmulatorFarmWorker:
+    """
+    MERCURY ASIC emulator farm worker class.
+
+    This class holds the state of an emulator farm worker in the front end, i.e. the worker
+    process, the socket connected to it and the statistics of the transactions routed to it.
+    """
+
+    def __init__(self, index, first_asic, num_asics, endpoint, process, socket):
+        """Initialise the worker state.
+
+        :param index: index of the worker
+        :param first_asic: index of the first ASIC in the shard emulated by the worker
+        :param num_asics: number of ASICs in the shard
+        :param endpoint: ZMQ endpoint URI of the worker server
+        :param process: worker process
+        :param socket: front-end socket connected to the worker server
+        """
+        self.index = index
+        self.first_asic = first_asic
+        self.num_asics = num_asics
+        self.endpoint = endpoint
+        self.process = process
+        self.socket = socket
+        self.requests = 0
+        self.responses = 0
+
+    def stats(self):
+        """Return a dict of the worker statistics."""
+        return {
+            "pid": self.process.pid,
+            "alive": self.process.is_alive(),
+            "asics": [self.first_asic, self.first_asic + self.num_asics - 1],
+            "requests": self.requests,
+            "responses": self.responses,
+            "pending": self.requests - self.responses,
+        }
+
+
+class EmulatorFarmRequest:
+    """
+    MERCURY ASIC emulator farm request class.
+
+    This class holds the state of a message routed to one or more workers by the front end until
+    all the workers have responded.
+    """
+
+    __slots__ = (
+        "client_stats", "start_time", "length", "reads", "is_batch", "pending", "responses"
+    )
+
+    def __init__(self, client_stats, length, reads, is_batch, num_workers):
+        """Initialise the request state.
+
+        :param client_stats: ClientStats instance of the client sending the message
+        :param length: length of the message received from the client
+        :param reads: list of booleans indicating the read transactions in the message
+        :param is_batch: boolean indicating the message is a batch message
+        :param num_workers: number of workers the message is routed to
+        """
+        self.client_stats = client_stats
+        self.start_time = time.perf_counter_ns()
+        self.length = length
+        self.reads = reads
+        self.is_batch = is_batch
+        self.pending = num_workers
+        self.responses = {}
+
+
+class EmulatorFarm(EmulatorServer):
+    """
+    MERCURY ASIC emulator farm class.
+
+    This class implements the emulator farm front end, starting the worker processes and
+    routing transactions between clients and workers. It presents the same client status
+    interface as a single emulator server.
+    """
+
+    # ASIC index used for transactions addressed to ASICs outside the farm, which is out of range
+    # for every worker, causing the transaction to be rejected
+    INVALID_ASIC = MercuryMultiAsicRegisterModel.ASIC_BROADCAST - 1
+
+    # Prefix of the route frame identifying requests routed to workers
+    REQUEST_TOKEN = b"R"
+
+    def __init__(
+        self, endpoint, ioloop, num_workers, num_asics, log_register_writes=False,
+        max_batch_size=64, worker_endpoint=None, high_water_mark=1024, client_weights=None
+    ):
+        """Initialise the emulator farm.
+
+        :param endpoint: ZMQ endpoint URI for the front end
+        :param ioloop: asyncio ioloop to run the front end in, or None if to be created
+        :param num_workers: number of worker processes
+        :param num_asics: total number of ASICs to emulate
+        :param log_register_writes: boolean option to emit logging messages for register writes
+        :param max_batch_size: maximum number of received messages processed in each batch
+        :param worker_endpoint: format string for worker endpoint URIs, formatted with the worker
+                                index, or None to use IPC endpoints in the temporary directory
+        :param high_water_mark: maximum number of messages queued for processing per client by
+                                each worker
+        :param client_weights: dict of client scheduling weights keyed by client ID, or None
+        """
+        if not 0 < num_workers <= num_asics:
+            raise ValueError(f"Number of workers must be between 1 and {num_asics}")
+        if not 0 < num_asics < self.INVALID_ASIC:
+            raise ValueError(f"Number of ASICs must be between 1 and {self.INVALID_ASIC - 1}")
+
+        self.num_asics = num_asics
+        if worker_endpoint is None:
+            worker_endpoint = "ipc://" + os.path.join(
+                tempfile.gettempdir(), f"mercury_emulator_{os.getpid()}_{{}}"
+            )
+
+        # The workers schedule the messages from each client, which are forwarded with the ID of
+        # the originating client, so are configured with the client queue options
+        server_options = {
+            "max_batch_size": max_batch_size,
+            "high_water_mark": high_water_mark,
+            "client_weights": client_weights,
+        }
+
+        # Start the worker processes, dividing the ASICs into contiguous shards and mapping each
+        # ASIC to the worker emulating it and its index in that shard
+        self.ctx = zmq.asyncio.Context.instance()
+        mp_context = multiprocessing.get_context("spawn")
+        self.workers = []
+        self._asic_map = []
+        (shard_size, remainder) = divmod(num_asics, num_workers)
+        for index in range(num_workers):
+            shard_asics = shard_size + (1 if index < remainder else 0)
+            first_asic = len(self._asic_map)
+            endpoint_uri = worker_endpoint.format(index)
+
+            process = mp_context.Process(
+                target=run_worker,
+                args=(
+                    endpoint_uri, shard_asics, log_register_writes, server_options, os.getpid()
+                ),
+                name=f"mercury-emulator-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            logging.info(
+                f"Started emulator farm worker {index} (pid {process.pid}) for ASICs "
+                f"{first_asic}-{first_asic + shard_asics - 1} at endpoint {endpoint_uri}"
+            )
+
+            socket = self.ctx.socket(zmq.DEALER)
+            socket.connect(endpoint_uri)
+            self.workers.append(
+                EmulatorFarmWorker(index, first_asic, shard_asics, endpoint_uri, process, socket)
+            )
+            self._asic_map.extend((index, asic) for asic in range(shard_asics))
+
+        # Initialise the state of pending requests, keyed by routing token
+        self._request_tokens = itertools.count()
+        self._requests = {}
+
+        # Initialise the front end as an emulator server without a local register model
+        super().__init__(endpoint, ioloop, None, max_batch_size=max_batch_size)
+
+        # Start a task to receive responses from each worker
+        self.worker_tasks = [
+            self.ioloop.create_task(self._run_worker_responses(worker)) for worker in self.workers
+        ]
+
+    def worker_stats(self):
+        """Return a list of the statistics of each worker."""
+        return [worker.stats() for worker in self.workers]
+
+    def shutdown(self):
+        """Shut down the farm, terminating the worker processes."""
+        for task in [self.server_task, self.monitor_task] + self.worker_tasks:
+            task.cancel()
+        self.socket.close(linger=0)
+        for worker in self.workers:
+            worker.socket.close(linger=0)
+            worker.process.terminate()
+        for worker in self.workers:
+            worker.process.join()
+
+            # Remove the socket files of IPC endpoints left by the terminated workers
+            if worker.endpoint.startswith("ipc://"):
+                try:
+                    os.remove(worker.endpoint[len("ipc://"):])
+                except OSError:
+                    pass
+
+    async def _run_server(self):
+        """Run the front-end socket task loop.
+
+        Each iteration of the loop waits for a message to be received from a client, then
+        drains any further messages already queued, up to the maximum batch size, and routes
+        each to the appropriate worker.
+        """
+        while True:
+            recvd_msgs = [await self.socket.recv_multipart()]
+            while (
+                len(recvd_msgs) < self.max_batch_size
+                and self.socket.get(zmq.EVENTS) & zmq.POLLIN
+            ):
+                recvd_msgs.append(await self.socket.recv_multipart(flags=zmq.NOBLOCK))
+
+            for recvd_msg in recvd_msgs:
+                await self._route_message(recvd_msg[:-1], recvd_msg[-1])
+
+            # Yield to the worker response tasks if under load, since receiving a message that
+            # is already available does not yield
+            if len(recvd_msgs) > 1:
+                await asyncio.sleep(0)
+
+    async def _route_message(self, envelope, data):
+        """Route a message from a client to the appropriate worker.
+
+        The message is forwarded with the routing envelope received from the client, i.e. the
+        client ID and any frames sent by the client before the message, with a route frame
+        inserted after the client ID containing a token identifying the request. Workers
+        therefore receive the ID of the originating client as the second frame of the envelope,
+        following the ID of the front-end socket connected to them.
+
+        :param envelope: list of routing envelope frames received with the message
+        :param data: bytes encoded message
+        """
+        client_id = envelope[0]
+        client_stats = self._client_stats.get(client_id)
+
+        # Determine the ASIC the message is addressed to. Messages which cannot be decoded,
+        # or are not addressed to a specific ASIC, are forwarded to the first worker, which
+        # handles them as a single emulator server would.
+        try:
+            (asic, message) = protocol.message_asic(data)
+        except (msgpack.UnpackException, msgpack.UnpackValueError, ValueError) as err:
+            logging.debug("Forwarding undecodable message from client ID %s: %s", client_id, err)
+            client_stats.errors += 1
+            (asic, message, reads) = (None, None, [])
+        else:
+            reads = self._transaction_reads(data, message)
+
+        if asic == protocol.ASIC_BROADCAST:
+            workers = self.workers
+        else:
+            if isinstance(asic, int):
+                if 0 <= asic < self.num_asics:
+                    (worker_index, local_asic) = self._asic_map[asic]
+                else:
+                    (worker_index, local_asic) = (0, self.INVALID_ASIC)
+                data = protocol.readdress_message(data, message, local_asic)
+            else:
+                worker_index = 0
+            workers = [self.workers[worker_index]]
+
+        # Record the state of the request until all the workers it is routed to have responded
+        token = self.REQUEST_TOKEN + next(self._request_tokens).to_bytes(8, "little")
+        self._requests[token] = EmulatorFarmRequest(
+            client_stats, len(data), reads, protocol.is_batch(message), len(workers)
+        )
+
+        for worker in workers:
+            worker.requests += 1
+            await worker.socket.send_multipart([client_id, token, *envelope[1:], data])
+
+    @staticmethod
+    def _transaction_reads(data, message):
+        """Determine which of the transactions in a message are read transactions.
+
+        Malformed transactions are rejected by the worker processing the message, so are not
+        counted in the client statistics by the front end.
+
+        :param data: bytes encoded message
+        :param message: decoded message, as returned by message_asic(), or None for a raw message
+        :return: list of booleans indicating whether each transaction is a read transaction
+        """
+        try:
+            if message is None:
+                (_, header_len) = protocol.parse_raw_header(data)
+                transactions = [data[header_len:]]
+            elif protocol.is_batch(message):
+                transactions = protocol.parse_batch(message)[0]
+            elif protocol.is_hello(message) or protocol.is_snapshot(message):
+                transactions = []
+            else:
+                transactions = [protocol.parse_transaction(message)[0]]
+
+            return [
+                bool(len(transaction)
+                     and transaction[0] & MercuryAsicRegisterModel.REGISTER_RW_MASK)
+                for transaction in transactions
+            ]
+        except (TypeError, protocol.ProtocolError):
+            return []
+
+    async def _run_worker_responses(self, worker):
+        """Run the task loop receiving responses from a worker and returning them to clients.
+
+        :param worker: EmulatorFarmWorker instance to receive responses from
+        """
+        while True:
+            recvd_msg = await worker.socket.recv_multipart()
+            worker.responses += 1
+
+            # Return the response to a request once all the workers it was routed to have
+            # responded, removing the route frame from the envelope returned to the client
+            (client_id, token, *envelope, response) = recvd_msg
+            request = self._requests.get(token)
+            if request is None:
+                logging.error(
+                    "Discarding response from worker %d with unknown route token %s",
+                    worker.index, token.hex()
+                )
+                continue
+            request.responses[worker.index] = response
+            request.pending -= 1
+            if request.pending:
+                continue
+            del self._requests[token]
+
+            response = self._combine_responses(request)
+            self._record_request(request, response)
+            await self.socket.send_multipart([client_id, *envelope, response])
+
+    @staticmethod
+    def _combine_responses(request):
+        """Combine the responses of the workers to a request into the response to the client.
+
+        A busy response, or a batch error response, from any worker is returned as is. A busy
+        response to a broadcast is returned even though the other workers may have processed
+        the message, so a client receiving it cannot assume that no ASIC was written. The
+        statuses of batch responses are combined so that a transaction reports the first error
+        reported by any worker, with the transaction responses of the last worker. Single
+        transaction responses do not report errors, so the response of the last worker is
+        returned.
+
+        :param request: EmulatorFarmRequest instance of the request
+        :return: bytes encoded response
+        """
+        responses = [request.responses[index] for index in sorted(request.responses)]
+        if len(responses) == 1:
+            return responses[0]
+
+        for response in responses:
+            if protocol.is_busy(response):
+                return response
+
+        if not request.is_batch:
+            return responses[-1]
+
+        messages = [protocol.decode_message(response) for response in responses]
+        for (response, message) in zip(responses, messages):
+            if protocol.KEY_ERROR in message:
+                return response
+
+        status = [
+            next((error for error in errors if error is not None), None)
+            for errors in zip(*(message[protocol.KEY_STATUS] for message in messages))
+        ]
+        return protocol.pack_batch_response(messages[-1][protocol.KEY_BATCH], status)
+
+    @staticmethod
+    def _record_request(request, response):
+        """Record a completed request in the statistics of the client.
+
+        :param request: EmulatorFarmRequest instance of the request
+        :param response: bytes encoded response returned to the client
+        """
+        client_stats = request.client_stats
+        if protocol.is_busy(response):
+            client_stats.busy += 1
+            return
+
+        status = [None] * len(request.reads)
+        if request.is_batch:
+            try:
+                (_, status) = protocol.unpack_batch_response(response)
+            except protocol.ProtocolError:
+                client_stats.errors += 1
+                status = []
+
+        for (is_read, error) in zip(request.reads, status):
+            client_stats.record_transaction(is_read, error is not None)
+
+        client_stats.record_message(
+            request.length, len(response), time.perf_counter_ns() - request.start_time
+        )
@@ -0,0 +1,211 @@
+"""MercuryMultiAsicRegisterModel - SPI register model for emulation of multiple ASICs.
+
+This module implements a model of the SPI register space of multiple MERCURY ASICs, e.g. those
+on a detector module, for use in the MERCURY ASIC emulation. The registers of all the ASICs are
+held in a single two-dimensional NumPy array, indexed by ASIC and register address, with each
+row modelled by a MercuryAsicRegisterModel instance holding the page and sector select state of
+that ASIC. Transactions are addressed to individual ASICs by index, or broadcast to all ASICs.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import logging
+
+import numpy as np
+
+from mercury.asic.registers import REGISTER_METADATA
+
+from .register_model import MercuryAsicRegisterModel
+
+
+class MercuryMultiAsicRegisterModel:
+    """
+    MERCURY multi-ASIC register model class.
+
+    This class implements the SPI register model for the emulation of multiple MERCURY ASICs
+    in a single process.
+    """
+
+    # ASIC index used to address a transaction to all ASICs
+    ASIC_BROADCAST = 0xFF
+
+    def __init__(self, emulator, log_register_writes, num_asics=1):
+        """Initialise the multi-ASIC register model.
+
+        :param emulator: reference to emulator instance that can be used in callbacks
+        :param log_register_writes: boolean option to emit logging messages for register writes
+        :param num_asics: number of ASICs to model
+        """
+        if not 0 < num_asics < self.ASIC_BROADCAST:
+            raise ValueError(f"Number of ASICs must be between 1 and {self.ASIC_BROADCAST - 1}")
+
+        self.num_asics = num_asics
+
+        # Create the array holding the registers of all ASICs
+        self.register_array = np.zeros((num_asics, REGISTER_METADATA.size), dtype=np.uint8)
+
+        # Create a register model for the first ASIC, then fork it to create the others, sharing
+        # the address translation tables and each backed by a row of the register array
+        first_model = MercuryAsicRegisterModel(
+            emulator, log_register_writes, self.register_array[0]
+        )
+        self.asics = [first_model] + [
+            first_model.fork(self.register_array[asic]) for asic in range(1, num_asics)
+        ]
+
+    def registers(self, asic=0):
+        """Return a list of current register values for an ASIC.
+
+        :param asic: index of the ASIC
+        :return: list of register values
+        """
+        return self.asics[asic].registers()
+
+    def register_bytes(self, asic=0):
+        """Return the current register values of an ASIC as bytes.
+
+        :param asic: index of the ASIC
+        :return: bytes of register values, indexed by true register address
+        """
+        return self.asics[asic].register_bytes()
+
+    def page_selects(self):
+        """Return an array of the current register page select of each ASIC."""
+        return np.array([model.page_select for model in self.asics], dtype=np.uint8)
+
+    def test_sr_sectors(self):
+        """Return an array of the current test shift register sector of each ASIC."""
+        return np.array([model.test_sr_sector for model in self.asics], dtype=np.uint8)
+
+    def process_transaction(self, transaction, asic=0, raise_errors=False):
+        """Process a register transaction addressed to one or all ASICs.
+
+        :param transaction: iterable of transaction values, representing the bytes in an SPI
+                            transaction
+        :param asic: index of the ASIC to process the transaction, or ASIC_BROADCAST for all
+        :param raise_errors: re-raise any error processing the transaction after logging it
+        :return: list of output bytes representing the response of the ASIC to an SPI transaction
+        """
+        if asic == self.ASIC_BROADCAST:
+            return self._process_broadcast(transaction, raise_errors)
+
+        if not 0 <= asic < self.num_asics:
+            logging.error(f"Error processing transaction: ASIC index {asic} out of range")
+            if raise_errors:
+                raise ValueError(f"ASIC index {asic} out of range")
+            return transaction
+
+        return self.asics[asic].process_transaction(transaction, raise_errors)
+
+    def _process_broadcast(self, transaction, raise_errors=False):
+        """Process a write transaction broadcast to all ASICs.
+
+        If all ASICs have the same page selected, each span of the burst is written to all ASICs
+        with a single operation on the register array. Otherwise, the transaction is processed
+        by each ASIC in turn, continuing past any ASIC failing to process it so that the write is
+        applied to every other ASIC, with the failures reported once all ASICs have processed it.
+
+        :param transaction: iterable of transaction values
+        :param raise_errors: re-raise any error processing the transaction after logging it
+        :return: the transaction
+        """
+        error = None
+        lead_model = self.asics[0]
+        try:
+            if not lead_model.is_write_transaction(transaction):
+                raise ValueError("read transactions cannot be broadcast")
+
+            register_addr = int(transaction[0]) & lead_model.REGISTER_ADDR_MASK
+            transaction_len = len(transaction) - 1
+
+            if np.any(self.page_selects() != lead_model.page_select):
+                failed = []
+                for (asic, model) in enumerate(self.asics):
+                    try:
+                        model.process_transaction(transaction, raise_errors=True)
+                    except Exception as err:
+                        failed.append((asic, err))
+                if failed:
+                    raise ValueError(
+                        f"failed for ASICs {[asic for (asic, _) in failed]}: "
+                        f"{type(failed[0][1]).__name__}: {failed[0][1]}"
+                    )
+                return transaction
+
+            logging.debug(
+                "Broadcast write transaction to register %d length %d",
+                register_addr, transaction_len
+            )
+            payload = np.frombuffer(bytes(transaction), dtype=np.uint8)
+            self._process_broadcast_burst(transaction, payload, register_addr, transaction_len)
+
+        except Exception as err:
+            logging.error(f"Error processing broadcast transaction: {type(err)} {err}")
+            error = err
+
+        # Notify subscribers of each ASIC of any registers changed by the transaction
+        for model in self.asics:
+            if model._dirty:
+                model._notify_subscribers()
+
+        if error is not None and raise_errors:
+            raise error
+
+        return transaction
+
+    def _process_broadcast_burst(self, transaction, payload, register_addr, transaction_len):
+        """Write the payload of a broadcast burst transaction to all ASICs.
+
+        :param transaction: iterable of transaction values
+        :param payload: array of transaction values
+        :param register_addr: raw register address from the first byte of the transaction
+        :param transaction_len: length of the transaction payload
+        """
+        idx = 0
+        while idx < transaction_len:
+
+            # Resolve the next span of the burst from the page table of the first ASIC, which
+            # is shared by all ASICs with the same page selected
+            page_table = self.asics[0]._page_table
+            raw_addr = register_addr + idx
+            addr = page_table.addrs[raw_addr]
+
+            # Shift registers are held by each ASIC model, so process those accesses in turn
+            if page_table.is_shift_register[raw_addr]:
+                for model in self.asics:
+                    model.process_sr_transaction(transaction, idx, addr)
+                break
+
+            span_len = min(page_table.write_span[raw_addr], transaction_len - idx)
+            if not span_len:
+                raise IndexError(f"register address {addr} out of range")
+
+            # Note the values in every ASIC of any callback register terminating the span
+            callback_addr = addr + span_len - 1
+            is_callback = page_table.is_callback[raw_addr + span_len - 1]
+            if is_callback:
+                old_callback_values = self.register_array[:, callback_addr].copy()
+
+            # Write the span to all ASICs in a single operation, marking changed registers for
+            # any ASIC with subscribers to changes
+            span = self.register_array[:, addr : addr + span_len]
+            tracked = [asic for (asic, model) in enumerate(self.asics) if model._subscriptions]
+            if tracked:
+                old_values = span[tracked].copy()
+            span[:] = payload[1 + idx : 1 + idx + span_len]
+            for (row, asic) in enumerate(tracked):
+                self.asics[asic]._mark_changed(addr, old_values[row].tobytes())
+
+            # Execute the callback for the register terminating the span in every ASIC in which
+            # the value of that register was changed by the write
+            if is_callback:
+                changed = self.register_array[:, callback_addr] != old_callback_values
+                for asic in np.flatnonzero(changed):
+                    self.asics[asic]._callbacks[callback_addr]()
+
+            # Log the register writes of every ASIC if enabled
+            if self.asics[0].log_register_writes:
+                for model in self.asics:
+                    for reg_addr in range(addr, addr + span_len):
+                        model.log_register_write(reg_addr)
+
+            idx += span_len
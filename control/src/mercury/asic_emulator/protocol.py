@@ -0,0 +1,450 @@
+"""MERCURY ASIC emulator message protocol.
+
+This module implements the encoding and decoding of the messages exchanged between clients and
+the MERCURY ASIC emulator server. Messages are encoded with msgpack. A plain transaction, i.e. a
+list of the bytes of an SPI transaction, is addressed to the first (or only) emulated ASIC,
+while a transaction addressed to a specific ASIC is sent as a map containing the transaction and
+the ASIC index. Responses take the same form as the request they answer. Each message is the
+last frame of a ZeroMQ multipart message; any frames preceding it, such as a request ID added by
+the client, are returned unchanged with the response, allowing clients to match responses to
+requests when multiple requests are in flight.
+
+Multiple transactions can be sent in a single versioned batch message, a map containing the
+list of transactions and, optionally, the ASIC they are addressed to. The response to a batch
+contains the list of responses and a matching list of status values, which are None for each
+transaction processed successfully and an error message otherwise. A batch which cannot be
+processed at all, e.g. due to an unsupported version, is answered with a map containing an
+error message.
+
+Clients can negotiate a raw wire format with a hello message. In raw format, transactions are
+sent as bare bytes preceded by a short header, which is a marker byte followed, for transactions
+addressed to a specific ASIC, by the ASIC index. Responses are returned with the same header.
+The marker bytes encode small positive integers in msgpack, which are never valid messages in
+this protocol, so raw messages are distinguished from msgpack messages by their first byte and
+clients can still send msgpack batch messages once the raw format has been negotiated.
+
+The server can also publish register change events on a separate channel. Each event is
+published with a topic identifying the ASIC, allowing subscribers to filter events by ASIC, and a
+compact binary payload containing a version number, incremented for each event published for
+that ASIC, and the address and new values of each contiguous run of changed registers.
+Subscribers initialise their copy of the registers from a snapshot, requested with a snapshot
+message, which contains the register values and the version of the last event published. The
+channel sends a welcome message to each new subscriber once its subscription is active, so that
+subscribers can request the snapshot without missing events published in the meantime.
+
+A server which has too many messages from a client queued for processing rejects further
+messages from that client with a busy response, a map which is the same whatever the type or
+wire format of the message rejected. Busy responses are sent as soon as the message is rejected,
+so may overtake the responses to earlier messages from the client still queued. Clients should
+retry the rejected message later.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import struct
+
+import msgpack
+
+from .multi_register_model import MercuryMultiAsicRegisterModel
+
+# Message map keys
+KEY_ASIC = "asic"
+KEY_TRANSACTION = "transaction"
+KEY_VERSION = "version"
+KEY_BATCH = "batch"
+KEY_STATUS = "status"
+KEY_ERROR = "error"
+
+KEY_HELLO = "hello"
+KEY_SNAPSHOT = "snapshot"
+KEY_REGISTERS = "registers"
+KEY_BUSY = "busy"
+
+# Version of the batch message format
+BATCH_VERSION = 1
+
+# Wire formats for single transactions, in order of server preference
+FORMAT_RAW = "raw"
+FORMAT_MSGPACK = "msgpack"
+WIRE_FORMATS = (FORMAT_RAW, FORMAT_MSGPACK)
+
+# Raw message header marker bytes
+RAW_DEFAULT_ASIC = 0x01
+RAW_ADDRESSED = 0x02
+
+# Register change event topic prefix and payload formats: the event version, followed by the
+# address and length of each run of changed registers and the new values
+CHANGE_TOPIC = b"R"
+CHANGE_WELCOME = b"W"
+CHANGE_HEADER = struct.Struct("<Q")
+CHANGE_RUN_HEADER = struct.Struct("<BB")
+
+# ASIC index used to broadcast a transaction to all ASICs
+ASIC_BROADCAST = MercuryMultiAsicRegisterModel.ASIC_BROADCAST
+
+
+class ProtocolError(ValueError):
+    """Exception class for emulator message protocol errors."""
+
+    pass
+
+
+class ServerBusyError(ProtocolError):
+    """Exception class for messages rejected by a busy emulator server."""
+
+    pass
+
+
+# Response to messages rejected by a busy server
+BUSY_RESPONSE = msgpack.packb({KEY_BUSY: True})
+
+
+def pack_transaction(transaction, asic=None):
+    """Encode a transaction or response message.
+
+    :param transaction: bytes-like or list of transaction bytes
+    :param asic: index of the ASIC the transaction is addressed to, or None for a plain message
+    :return: bytes encoded message
+    """
+    if asic is None:
+        return msgpack.packb(transaction)
+    return msgpack.packb({KEY_ASIC: asic, KEY_TRANSACTION: transaction})
+
+
+def decode_message(data):
+    """Decode a message without interpreting its contents.
+
+    :param data: bytes encoded message
+    :return: decoded message object
+    """
+    return msgpack.unpackb(data)
+
+
+def is_batch(message):
+    """Return true if a decoded message is a batch message or batch response.
+
+    :param message: decoded message object
+    """
+    return isinstance(message, dict) and (KEY_BATCH in message or KEY_ERROR in message)
+
+
+def is_hello(message):
+    """Return true if a decoded message is a hello message or hello response.
+
+    :param message: decoded message object
+    """
+    return isinstance(message, dict) and KEY_HELLO in message
+
+
+def unpack_transaction(data):
+    """Decode a transaction or response message.
+
+    :param data: bytes encoded message
+    :return: tuple of the transaction and the ASIC index, which is None for a plain message
+    """
+    return parse_transaction(decode_message(data))
+
+
+def parse_transaction(message):
+    """Extract the transaction and ASIC index from a decoded transaction or response message.
+
+    :param message: decoded message object
+    :return: tuple of the transaction and the ASIC index, which is None for a plain message
+    """
+    if not isinstance(message, dict):
+        return (message, None)
+
+    try:
+        return (message[KEY_TRANSACTION], int(message[KEY_ASIC]))
+    except (KeyError, TypeError) as err:
+        raise ProtocolError(f"Malformed addressed transaction message: {err}")
+
+
+def pack_batch(transactions, asic=None):
+    """Encode a batch message.
+
+    :param transactions: iterable of bytes-like or lists of transaction bytes
+    :param asic: index of the ASIC all the transactions are addressed to, or None for the default
+    :return: bytes encoded message
+    """
+    message = {KEY_VERSION: BATCH_VERSION, KEY_BATCH: list(transactions)}
+    if asic is not None:
+        message[KEY_ASIC] = asic
+    return msgpack.packb(message)
+
+
+def parse_batch(message):
+    """Extract the transactions and ASIC index from a decoded batch message.
+
+    :param message: decoded batch message object
+    :return: tuple of the list of transactions and the ASIC index, which is None if not specified
+    """
+    version = message.get(KEY_VERSION)
+    if version != BATCH_VERSION:
+        raise ProtocolError(f"Unsupported batch message version {version}")
+
+    transactions = message.get(KEY_BATCH)
+    if not isinstance(transactions, list):
+        raise ProtocolError("Malformed batch message: transactions must be a list")
+
+    asic = message.get(KEY_ASIC)
+    try:
+        asic = None if asic is None else int(asic)
+    except (TypeError, ValueError) as err:
+        raise ProtocolError(f"Malformed batch message: {err}")
+
+    return (transactions, asic)
+
+
+def pack_batch_response(responses, status):
+    """Encode a batch response message.
+
+    :param responses: list of transaction responses
+    :param status: list of status values, None for success or an error message, per transaction
+    :return: bytes encoded message
+    """
+    return msgpack.packb({KEY_VERSION: BATCH_VERSION, KEY_BATCH: responses, KEY_STATUS: status})
+
+
+def pack_batch_error(error):
+    """Encode a response to a batch message which could not be processed.
+
+    :param error: error message
+    :return: bytes encoded message
+    """
+    return msgpack.packb({KEY_VERSION: BATCH_VERSION, KEY_ERROR: str(error)})
+
+
+def unpack_batch_response(data):
+    """Decode a batch response message.
+
+    :param data: bytes encoded message
+    :return: tuple of the list of responses and the list of status values
+    """
+    message = decode_message(data)
+    if not is_batch(message):
+        raise ProtocolError("Response is not a batch response message")
+    if KEY_ERROR in message:
+        raise ProtocolError(f"Batch message failed: {message[KEY_ERROR]}")
+
+    try:
+        return (message[KEY_BATCH], message[KEY_STATUS])
+    except KeyError as err:
+        raise ProtocolError(f"Malformed batch response message: missing {err}")
+
+
+def pack_hello(formats):
+    """Encode a hello message requesting a wire format.
+
+    :param formats: iterable of wire formats acceptable to the client, in order of preference
+    :return: bytes encoded message
+    """
+    return msgpack.packb({KEY_HELLO: list(formats)})
+
+
+def negotiate_format(message):
+    """Select the wire format requested in a decoded hello message.
+
+    :param message: decoded hello message object
+    :return: the first wire format requested by the client which is supported, otherwise msgpack
+    """
+    formats = message.get(KEY_HELLO)
+    if isinstance(formats, list):
+        for wire_format in formats:
+            if wire_format in WIRE_FORMATS:
+                return wire_format
+    return FORMAT_MSGPACK
+
+
+def pack_hello_response(wire_format):
+    """Encode a response to a hello message.
+
+    :param wire_format: wire format selected by the server
+    :return: bytes encoded message
+    """
+    return msgpack.packb({KEY_HELLO: wire_format})
+
+
+def unpack_hello_response(data):
+    """Decode a response to a hello message.
+
+    A server which does not understand hello messages answers with a plain message, in which case
+    the msgpack format is assumed.
+
+    :param data: bytes encoded message
+    :return: wire format selected by the server
+    """
+    message = decode_message(data)
+    if is_hello(message) and message[KEY_HELLO] in WIRE_FORMATS:
+        return message[KEY_HELLO]
+    return FORMAT_MSGPACK
+
+
+def message_asic(data):
+    """Determine the ASIC an encoded message is addressed to.
+
+    :param data: bytes encoded message
+    :return: tuple of the ASIC index, which is None for the default ASIC, and the decoded message,
+             which is None for a raw message
+    """
+    if is_raw(data):
+        return (parse_raw_header(data)[0], None)
+
+    message = decode_message(data)
+    if is_snapshot(message):
+        return (message[KEY_SNAPSHOT], message)
+    if isinstance(message, dict) and not is_hello(message):
+        return (message.get(KEY_ASIC), message)
+    return (None, message)
+
+
+def readdress_message(data, message, asic):
+    """Encode a message addressed to an ASIC, re-addressing it to a different ASIC.
+
+    This allows an intermediary to forward a message to a server emulating a subset of ASICs,
+    with ASIC indices local to that server. Raw message headers keep the same length, so that
+    the header of the response matches that of the original message.
+
+    :param data: bytes encoded message addressed to an ASIC
+    :param message: decoded message, as returned by message_asic(), or None for a raw message
+    :param asic: index of the ASIC to address the message to
+    :return: bytes encoded message
+    """
+    if message is None:
+        return bytes((RAW_ADDRESSED, asic)) + data[2:]
+
+    message = dict(message)
+    message[KEY_SNAPSHOT if is_snapshot(message) else KEY_ASIC] = asic
+    return msgpack.packb(message)
+
+
+def is_raw(data):
+    """Return true if an encoded message is a raw message.
+
+    :param data: bytes encoded message
+    """
+    return len(data) > 0 and data[0] in (RAW_DEFAULT_ASIC, RAW_ADDRESSED)
+
+
+def pack_raw_header(asic=None):
+    """Encode the header of a raw message.
+
+    :param asic: index of the ASIC the transaction is addressed to, or None for the default ASIC
+    :return: bytes header
+    """
+    if asic is None:
+        return bytes((RAW_DEFAULT_ASIC,))
+    return bytes((RAW_ADDRESSED, asic))
+
+
+def parse_raw_header(data):
+    """Decode the header of a raw message.
+
+    :param data: bytes encoded message
+    :return: tuple of the ASIC index, which is None for the default ASIC, and the header length
+    """
+    if not is_raw(data):
+        raise ProtocolError("Message is not a raw message")
+
+    if data[0] == RAW_DEFAULT_ASIC:
+        return (None, 1)
+    if len(data) < 2:
+        raise ProtocolError("Raw message header is truncated")
+    return (data[1], 2)
+
+
+def pack_snapshot_request(asic=None):
+    """Encode a message requesting a snapshot of the registers.
+
+    :param asic: index of the ASIC to snapshot, or None for the default ASIC
+    :return: bytes encoded message
+    """
+    return msgpack.packb({KEY_SNAPSHOT: asic})
+
+
+def is_snapshot(message):
+    """Return true if a decoded message is a snapshot request or response.
+
+    :param message: decoded message object
+    """
+    return isinstance(message, dict) and KEY_SNAPSHOT in message
+
+
+def pack_snapshot_response(version, registers):
+    """Encode a register snapshot response.
+
+    :param version: version of the last register change event published for the ASIC
+    :param registers: bytes-like register values
+    :return: bytes encoded message
+    """
+    return msgpack.packb(
+        {KEY_SNAPSHOT: {KEY_VERSION: version, KEY_REGISTERS: bytes(registers)}}
+    )
+
+
+def unpack_snapshot_response(data):
+    """Decode a register snapshot response.
+
+    :param data: bytes encoded message
+    :return: tuple of the version and bytes register values
+    """
+    message = decode_message(data)
+    try:
+        snapshot = message[KEY_SNAPSHOT]
+        return (snapshot[KEY_VERSION], snapshot[KEY_REGISTERS])
+    except (KeyError, TypeError) as err:
+        raise ProtocolError(f"Malformed snapshot response message: {err}")
+
+
+def change_topic(asic=None):
+    """Return the topic of register change events for an ASIC.
+
+    :param asic: index of the ASIC, or None for the default ASIC
+    :return: bytes topic
+    """
+    return CHANGE_TOPIC + bytes((asic or 0,))
+
+
+def pack_change_event(version, runs):
+    """Encode the payload of a register change event.
+
+    :param version: version of the event
+    :param runs: iterable of tuples of the address and bytes-like new values of each run of
+                 changed registers
+    :return: bytes encoded payload
+    """
+    payload = bytearray(CHANGE_HEADER.pack(version))
+    for (addr, values) in runs:
+        payload += CHANGE_RUN_HEADER.pack(addr, len(values))
+        payload += values
+    return bytes(payload)
+
+
+def unpack_change_event(data):
+    """Decode the payload of a register change event.
+
+    :param data: bytes encoded payload
+    :return: tuple of the version and a list of tuples of the address and new values of each run
+    """
+    try:
+        (version,) = CHANGE_HEADER.unpack_from(data)
+        runs = []
+        offset = CHANGE_HEADER.size
+        while offset < len(data):
+            (addr, length) = CHANGE_RUN_HEADER.unpack_from(data, offset)
+            offset += CHANGE_RUN_HEADER.size
+            if offset + length > len(data):
+                raise ProtocolError("Register change event is truncated")
+            runs.append((addr, bytes(data[offset : offset + length])))
+            offset += length
+    except struct.error as err:
+        raise ProtocolError(f"Malformed register change event: {err}")
+
+    return (version, runs)
+
+
+def is_busy(data):
+    """Return true if an encoded message is a busy response.
+
+    :param data: bytes encoded message
+    """
+    return data == BUSY_RESPONSE
@@ -8,9 +8,64 @@ to the registers.
 
 Tim Nicholls, STFC Detector Systems Software Group
 """
+import copy
+import itertools
 import logging
+import struct
 
-from mercury.asic.registers import RegisterMap
+from mercury.asic.fields import REGISTER_FIELDS
+from mercury.asic.registers import REGISTER_METADATA, RegisterMap
+
+
+class _PageTable:
+    """
+    Register address translation table for a single register page.
+
+    This class holds precomputed tables, indexed by the raw address in a transaction, giving the
+    true register address with the page select applied, flags indicating which raw addresses
+    fall on shift registers or registers with callbacks, and the length of the longest span of
+    registers starting at each raw address that can be copied in a single operation in burst
+    read and write transactions.
+    """
+
+    __slots__ = ("addrs", "is_shift_register", "is_callback", "write_span", "read_span")
+
+    def __init__(self, addrs, shift_register_addrs, callback_addrs, num_registers, boundary):
+        """Build the translation table for a page.
+
+        :param addrs: sequence of true register addresses indexed by raw address
+        :param shift_register_addrs: collection of true shift register addresses
+        :param callback_addrs: collection of true addresses of registers with callbacks
+        :param num_registers: size of the register address space
+        :param boundary: raw address at which the page offset starts to apply
+        """
+        num_addrs = len(addrs)
+        self.addrs = tuple(addrs)
+        self.is_shift_register = tuple(addr in shift_register_addrs for addr in addrs)
+        self.is_callback = tuple(addr in callback_addrs for addr in addrs)
+
+        # Calculate span lengths by working backwards from the end of the page. Spans are
+        # terminated by the page boundary, the start of a shift register or the end of the
+        # register space and, for writes, immediately after a register with a callback. Raw
+        # addresses mapping beyond the register space have a span length of zero.
+        write_span = [0] * num_addrs
+        read_span = [0] * num_addrs
+        for raw_addr in reversed(range(num_addrs)):
+            if self.is_shift_register[raw_addr] or addrs[raw_addr] >= num_registers:
+                continue
+            read_span[raw_addr] = write_span[raw_addr] = 1
+            next_addr = raw_addr + 1
+            if (
+                next_addr < num_addrs
+                and next_addr != boundary
+                and not self.is_shift_register[next_addr]
+            ):
+                read_span[raw_addr] += read_span[next_addr]
+                if not self.is_callback[raw_addr]:
+                    write_span[raw_addr] += write_span[next_addr]
+
+        self.write_span = tuple(write_span)
+        self.read_span = tuple(read_span)
 
 
 class MercuryAsicRegisterModel:
@@ -21,6 +76,10 @@ class MercuryAsicRegisterModel:
     emulation.
     """
 
+    # Snapshot header format: format version, page select and test shift register sector
+    SNAPSHOT_HEADER = struct.Struct("<BBB")
+    SNAPSHOT_VERSION = 1
+
     # Common constants for register transactions
     REGISTER_RW_MASK = 0x80
     REGISTER_ADDR_MASK = 0x7F
@@ -28,6 +87,10 @@ class MercuryAsicRegisterModel:
     REGISTER_WRITE_TRANSACTION = 0x0
     REGISTER_PAGE_SIZE = 128
 
+    # Register fields decoded by callbacks
+    PAGE_SELECT_FIELD = REGISTER_FIELDS["PAGE_SELECT"]
+    TEST_SR_SECTOR_FIELD = REGISTER_FIELDS["TEST_SR_SECTOR"]
+
     REGISTER_SR_CAL_SIZE = 20
     REGISTER_SR_TEST_SIZE = 480
     REGISTER_SR_TEST_NUM_SECTORS = 20
@@ -43,21 +106,24 @@ class MercuryAsicRegisterModel:
         """
         return (register >> index) & ((2 ** width) - 1)
 
-    def __init__(self, emulator, log_register_writes):
+    def __init__(self, emulator, log_register_writes, registers=None):
         """Initialise the register model.
 
         This constructor initialises the default state of the register model, setting
         default values for all registers and defining a set of callback functions that
-        execute when a register is written to.
+        execute when a register is written to. The register values can optionally be held in
+        an externally allocated buffer, e.g. a row of an array holding the registers of
+        multiple ASICs.
 
         :param emulator: reference to emulator instance that can be used in callbacks
         :param log_register_writes: boolean option to emit logging messages for register writes
+        :param registers: optional writable buffer to hold register values, or None to allocate
         """
         self.emulator = emulator
         self.log_register_writes = log_register_writes
 
         # Create registers and set default values
-        self._registers = bytearray(RegisterMap.size())
+        self._registers = self._register_storage(registers)
         self._registers[RegisterMap.CONFIG1] = 0b01010000
         self._registers[RegisterMap.GLOB1] = 0b00000000
         self._registers[RegisterMap.GLOB2] = 0b00000000
@@ -70,15 +136,7 @@ class MercuryAsicRegisterModel:
         self._registers[RegisterMap.TDC_BIAS] = 0b10001000
 
         # Create shift registers for calibration and test
-        self._shift_registers = {
-            RegisterMap.SR_CAL: bytearray(self.REGISTER_SR_CAL_SIZE),
-            RegisterMap.SR_TEST: [bytearray(self.REGISTER_SR_TEST_SIZE)]
-            * self.REGISTER_SR_TEST_NUM_SECTORS,
-        }
-
-        # Initialise internal state of register model
-        self.page_select = 0
-        self.test_sr_sector = 0
+        self._create_shift_registers()
 
         # Define register-specific callbacks that run when a register is modified
         self._callbacks = {
@@ -86,87 +144,424 @@ class MercuryAsicRegisterModel:
             RegisterMap.TEST_SR: self._do_test_sr,
         }
 
+        # Initialise the register change subscriptions and the bitmap of registers changed by
+        # the current transaction
+        self._subscriptions = {}
+        self._subscription_ids = itertools.count()
+        self._dirty = 0
+
+        # Build the address translation tables for each register page
+        self._page_tables = [
+            self._build_page_table(page_select) for page_select in range(2)
+        ]
+
+        # Initialise internal state of register model
+        self.page_select = 0
+        self.test_sr_sector = 0
+
         # Execute all the callbacks to initialise state of model
         for callback in self._callbacks.values():
             callback()
 
+    @property
+    def page_select(self):
+        """Return the current register page select."""
+        return self._page_select
+
+    @page_select.setter
+    def page_select(self, page_select):
+        """Set the register page select.
+
+        Setting the page select also swaps in the address translation table for the page and
+        updates the page select field of CONFIG1, so that none of these can get out of step and
+        the CONFIG1 callback, which only runs when the register changes, sees any later write
+        selecting a different page.
+
+        :param page_select: register page select value
+        """
+        self._page_table = self._page_tables[page_select]
+        self._page_select = page_select
+        self._registers[RegisterMap.CONFIG1] = self.PAGE_SELECT_FIELD.encode(
+            self._registers[RegisterMap.CONFIG1], page_select
+        )
+
     def registers(self):
         """Return a list of current register values."""
         return list(self._registers)
 
-    def process_transaction(self, transaction):
+    def register_bytes(self):
+        """Return the current register values as bytes, indexed by true register address."""
+        return bytes(self._registers)
+
+    def snapshot(self):
+        """Capture a snapshot of the state of the register model.
+
+        This method captures the register values, the contents of the shift registers and the
+        page and sector select state of the model into a single immutable bytes object, which
+        can be passed to restore() on this or any other model instance.
+
+        :return: bytes snapshot of the model state
+        """
+        return b"".join((
+            self.SNAPSHOT_HEADER.pack(
+                self.SNAPSHOT_VERSION, self.page_select, self.test_sr_sector
+            ),
+            self._registers,
+            self._sr_cal,
+            self._sr_test_bank,
+        ))
+
+    def restore(self, snapshot):
+        """Restore the state of the register model from a snapshot.
+
+        This method restores the register values, shift register contents and the page and
+        sector select state of the model from a snapshot. The state normally derived by the
+        register callbacks is restored directly from the snapshot without executing them.
+
+        :param snapshot: bytes snapshot returned by snapshot()
+        """
+        header_size = self.SNAPSHOT_HEADER.size
+        expected_size = (
+            header_size + len(self._registers) + len(self._sr_cal) + len(self._sr_test_bank)
+        )
+        if len(snapshot) != expected_size:
+            raise ValueError(
+                f"Register model snapshot has length {len(snapshot)}, expected {expected_size}"
+            )
+
+        (version, page_select, test_sr_sector) = self.SNAPSHOT_HEADER.unpack_from(snapshot)
+        if version != self.SNAPSHOT_VERSION:
+            raise ValueError(f"Register model snapshot has unsupported version {version}")
+
+        # Copy the register and shift register contents from the snapshot, marking changed
+        # registers for notification if there are subscribers to changes
+        track_changes = bool(self._subscriptions)
+        view = memoryview(snapshot)
+        offset = header_size
+        for (addr, buffer) in (
+            (0, self._registers),
+            (RegisterMap.SR_CAL, self._sr_cal),
+            (RegisterMap.SR_TEST, self._sr_test_bank),
+        ):
+            old_values = bytes(buffer) if track_changes else None
+            buffer[:] = view[offset : offset + len(buffer)]
+            if track_changes and old_values != buffer:
+                if buffer is self._registers:
+                    self._mark_changed(0, old_values)
+                else:
+                    self._dirty |= 1 << addr
+            offset += len(buffer)
+
+        # Restore the page and sector select state
+        self.page_select = page_select
+        self._select_test_sr_sector(test_sr_sector)
+
+        # Notify subscribers of any registers changed by the restore
+        if self._dirty:
+            self._notify_subscribers()
+
+    def fork(self, registers=None):
+        """Create an independent copy of the register model.
+
+        This method creates a new register model with the same state as this one, which can be
+        modified without affecting the original. The forked model shares the immutable address
+        translation tables with this model rather than rebuilding them, so is cheaper to create
+        than a new model. Subscriptions to register changes are not copied to the forked model.
+
+        :param registers: optional writable buffer to hold register values, or None to allocate
+        :return: forked register model instance
+        """
+        model = copy.copy(self)
+
+        # Give the forked model its own storage and callbacks bound to it, then copy the state
+        model._registers = self._register_storage(registers)
+        model._create_shift_registers()
+        model._callbacks = {
+            addr: getattr(model, callback.__name__) for (addr, callback) in self._callbacks.items()
+        }
+        model._subscriptions = {}
+        model._subscription_ids = itertools.count()
+        model._dirty = 0
+        model.restore(self.snapshot())
+
+        return model
+
+    def process_transaction(self, transaction, raise_errors=False):
         """Process a register transaction.
 
         This method processes in incoming register read or write transaction, updating the
         values of the registers and executing callbacks for any modified registers. Transactions
         take account of the register page select defined in CONFIG1. Burst read and write
-        transactions are supported.
+        transactions are supported and are processed as a sequence of contiguous register spans,
+        each of which is copied with a single slice operation.
 
         :param transaction: iterable of transaction values, representing the bytes in an SPI
                             transaction
+        :param raise_errors: re-raise any error processing the transaction after logging it
         :return: list of output bytes representing the response of the ASIC to an SPI transaction
         """
+        error = None
         try:
             # Extract the register address from the first byte of the transaction and determine
             # the length
             register_addr = int(transaction[0]) & self.REGISTER_ADDR_MASK
-            transaction_len = len(transaction[1:])
+            transaction_len = len(transaction) - 1
 
             # If this is a write transaction, handle accordingly, updating register values and
             # executing any registered callbacks for modified registers
             if self.is_write_transaction(transaction):
                 logging.debug(
-                    f"Write transaction to register {register_addr} length {transaction_len}"
+                    "Write transaction to register %d length %d", register_addr, transaction_len
                 )
-                # Loop over the payload of the transaction
-                for idx in range(transaction_len):
-
-                    # Calcuate the address, taking into account the page select state
-                    addr = self.calc_register_addr(register_addr + idx)
-
-                    # Intercept shift-register writes where a burst mode transaction doesn't
-                    # increment the register address
-                    if addr in self._shift_registers:
-
-                        self.process_sr_transaction(transaction, idx, addr)
-                        break
-
-                    else:
-                        # Update the register value accordingly
-                        self._registers[addr] = transaction[1 + idx]
-
-                        # Execute a callback if defined for this register
-                        if addr in self._callbacks:
-                            self._callbacks[addr]()
-
-                        # Log the register write if enabled
-                        if self.log_register_writes:
-                            self.log_register_write(addr)
+                self._process_write_burst(transaction, register_addr, transaction_len)
 
             # Otherwise handle a read transaction.
             else:
                 logging.debug(
-                    f"Read transaction from register {register_addr} length {transaction_len}"
+                    "Read transaction from register %d length %d", register_addr, transaction_len
                 )
-                # Loop over the payload of the transaction, copying the relevant register
-                # values into the response
-                for idx in range(transaction_len):
-                    addr = self.calc_register_addr(register_addr + idx)
-
-                    # Intercept shift-register reads where a burst mode transaction doesn't
-                    # increment the register address
-                    if addr in self._shift_registers:
-                        self.process_sr_transaction(transaction, idx, addr)
-                        break
-                    else:
-                        # Update values in the transaction with register values
-                        transaction[1 + idx] = self._registers[addr]
+                self._process_read_burst(transaction, register_addr, transaction_len)
 
         except Exception as err:
             logging.error(f"Error processing transaction: {type(err)} {err}")
+            error = err
+
+        # Notify subscribers of any registers changed by the transaction
+        if self._dirty:
+            self._notify_subscribers()
+
+        if error is not None and raise_errors:
+            raise error
 
         return transaction
 
+    def subscribe(self, callback, addr, length=1):
+        """Subscribe to changes to a range of registers.
+
+        This method subscribes a callback to changes in the values of a range of registers. The
+        callback is called once at the end of each transaction that changes one or more of the
+        registers in the range, with a tuple of the changed register addresses in that range.
+        Writes to a shift register are reported as a change to the shift register address if
+        they modify its contents.
+
+        :param callback: callable to notify with a tuple of changed register addresses
+        :param addr: true address of the first register in the range
+        :param length: number of registers in the range
+        :return: subscription ID to pass to unsubscribe()
+        """
+        mask = ((1 << length) - 1) << addr
+        subscription_id = next(self._subscription_ids)
+        self._subscriptions[subscription_id] = (mask, callback)
+        return subscription_id
+
+    def unsubscribe(self, subscription_id):
+        """Remove a subscription to changes to a range of registers.
+
+        :param subscription_id: subscription ID returned by subscribe()
+        """
+        self._subscriptions.pop(subscription_id, None)
+
+    def _mark_changed(self, addr, old_values):
+        """Mark registers changed by a write in the dirty bitmap.
+
+        :param addr: true address of the first register written
+        :param old_values: values of the registers before the write
+        """
+        new_values = self._registers[addr : addr + len(old_values)]
+        for (offset, (old_value, new_value)) in enumerate(zip(old_values, new_values)):
+            if old_value != new_value:
+                self._dirty |= 1 << (addr + offset)
+
+    def _notify_subscribers(self):
+        """Notify subscribers of the registers changed by a transaction.
+
+        This method notifies each subscriber whose register range intersects with the changed
+        registers marked in the dirty bitmap, then clears the bitmap. The cost of matching a
+        subscription is independent of the number of registers written.
+        """
+        dirty = self._dirty
+        self._dirty = 0
+
+        for (mask, callback) in list(self._subscriptions.values()):
+            changed = dirty & mask
+            if not changed:
+                continue
+
+            # Decode the changed bits into a tuple of register addresses
+            changed_addrs = []
+            while changed:
+                lowest = changed & -changed
+                changed_addrs.append(lowest.bit_length() - 1)
+                changed ^= lowest
+
+            try:
+                callback(tuple(changed_addrs))
+            except Exception as err:
+                logging.error(f"Error notifying register change subscriber: {type(err)} {err}")
+
+    def _process_write_burst(self, transaction, register_addr, transaction_len):
+        """Process the payload of a burst write transaction.
+
+        This method writes the payload of a transaction into the register model one contiguous
+        span at a time, resolving each span with the translation table for the current page.
+        Since a span always ends on a callback register, callbacks are looked up once per span
+        rather than for every byte, and run only if the value of the register changes. Any change
+        to the page select made by a callback is taken into account when resolving the next span.
+
+        :param transaction: iterable of transaction values
+        :param register_addr: raw register address from the first byte of the transaction
+        :param transaction_len: length of the transaction payload
+        """
+        track_changes = bool(self._subscriptions)
+
+        # Access the transaction payload through a memoryview so that spans can be copied
+        # into the registers without intermediate copies
+        if not isinstance(transaction, (bytearray, bytes, memoryview)):
+            transaction = bytes(transaction)
+        payload = memoryview(transaction)
+
+        idx = 0
+        while idx < transaction_len:
+
+            # Resolve the next span of the burst from the current page table
+            page_table = self._page_table
+            raw_addr = register_addr + idx
+            addr = page_table.addrs[raw_addr]
+
+            # Intercept shift-register writes where a burst mode transaction doesn't
+            # increment the register address
+            if page_table.is_shift_register[raw_addr]:
+                self.process_sr_transaction(transaction, idx, addr)
+                break
+
+            span_len = min(page_table.write_span[raw_addr], transaction_len - idx)
+            if not span_len:
+                raise IndexError(f"register address {addr} out of range")
+
+            # Note the value of any callback register terminating the span before it is written
+            callback_addr = addr + span_len - 1
+            is_callback = page_table.is_callback[raw_addr + span_len - 1]
+            if is_callback:
+                old_callback_value = self._registers[callback_addr]
+
+            # Update the register values in a single slice assignment, marking any changed
+            # registers in the dirty bitmap if there are subscribers to changes
+            if track_changes:
+                old_values = self._registers[addr : addr + span_len].tobytes()
+            self._registers[addr : addr + span_len] = payload[1 + idx : 1 + idx + span_len]
+            if track_changes and old_values != self._registers[addr : addr + span_len]:
+                self._mark_changed(addr, old_values)
+
+            # Execute the callback defined for the register terminating the span only if the
+            # value of that register was changed by the write
+            if is_callback and self._registers[callback_addr] != old_callback_value:
+                self._callbacks[callback_addr]()
+
+            # Log the register writes if enabled
+            if self.log_register_writes:
+                for reg_addr in range(addr, addr + span_len):
+                    self.log_register_write(reg_addr)
+
+            idx += span_len
+
+    def _process_read_burst(self, transaction, register_addr, transaction_len):
+        """Process the payload of a burst read transaction.
+
+        This method copies register values into the payload of the transaction one contiguous
+        span at a time, resolving each span with the translation table for the current page.
+
+        :param transaction: iterable of transaction values, updated with register values
+        :param register_addr: raw register address from the first byte of the transaction
+        :param transaction_len: length of the transaction payload
+        """
+        page_table = self._page_table
+        idx = 0
+        while idx < transaction_len:
+
+            raw_addr = register_addr + idx
+            addr = page_table.addrs[raw_addr]
+
+            # Intercept shift-register reads where a burst mode transaction doesn't
+            # increment the register address
+            if page_table.is_shift_register[raw_addr]:
+                self.process_sr_transaction(transaction, idx, addr)
+                break
+
+            span_len = min(page_table.read_span[raw_addr], transaction_len - idx)
+            if not span_len:
+                raise IndexError(f"register address {addr} out of range")
+
+            # Update values in the transaction with register values
+            transaction[1 + idx : 1 + idx + span_len] = self._registers[addr : addr + span_len]
+
+            idx += span_len
+
+    def _register_storage(self, registers=None):
+        """Return storage for the register values.
+
+        :param registers: optional writable buffer to hold register values, or None to allocate
+        :return: memoryview of the register storage
+        """
+        if registers is None:
+            registers = bytearray(REGISTER_METADATA.size)
+
+        storage = memoryview(registers).cast("B")
+        if len(storage) != REGISTER_METADATA.size or storage.readonly:
+            raise ValueError(
+                f"Register storage must be a writable buffer of {REGISTER_METADATA.size} bytes"
+            )
+        return storage
+
+    def _create_shift_registers(self):
+        """Create the shift registers for calibration and test.
+
+        The test shift register is a bank of sectors held in a single contiguous buffer, with a
+        memoryview window onto each sector. The window for the sector selected in TEST_SR is
+        mapped into the shift registers when the sector is selected.
+        """
+        self._sr_cal = bytearray(self.REGISTER_SR_CAL_SIZE)
+        self._sr_test_bank = bytearray(
+            self.REGISTER_SR_TEST_SIZE * self.REGISTER_SR_TEST_NUM_SECTORS
+        )
+        sr_test_view = memoryview(self._sr_test_bank)
+        self._sr_test_sectors = [
+            sr_test_view[offset : offset + self.REGISTER_SR_TEST_SIZE]
+            for offset in range(0, len(self._sr_test_bank), self.REGISTER_SR_TEST_SIZE)
+        ]
+        self._shift_registers = {
+            RegisterMap.SR_CAL: memoryview(self._sr_cal),
+            RegisterMap.SR_TEST: self._sr_test_sectors[0],
+        }
+
+    def _select_test_sr_sector(self, test_sr_sector):
+        """Select the active sector of the test shift register.
+
+        This method maps the window onto the selected sector into the shift registers. Accesses
+        to an invalid sector are mapped onto an empty window and have no effect.
+
+        :param test_sr_sector: test shift register sector to select
+        """
+        if test_sr_sector < self.REGISTER_SR_TEST_NUM_SECTORS:
+            sector_window = self._sr_test_sectors[test_sr_sector]
+        else:
+            logging.warning(f"Test shift register sector {test_sr_sector} is not valid")
+            sector_window = memoryview(bytearray())
+
+        self._shift_registers[RegisterMap.SR_TEST] = sector_window
+        self.test_sr_sector = test_sr_sector
+
+    def _build_page_table(self, page_select):
+        """Build the address translation table for a register page.
+
+        :param page_select: page select value to build the table for
+        :return: translation table for the page
+        """
+        boundary = REGISTER_METADATA.NUM_COMMON_REGISTERS if page_select else None
+        addrs = REGISTER_METADATA.page_addrs[page_select]
+        return _PageTable(
+            addrs, self._shift_registers, self._callbacks, len(self._registers), boundary
+        )
+
     def process_sr_transaction(self, transaction, idx, addr):
         """Process a shift register transaction.
 
@@ -182,27 +577,34 @@ class MercuryAsicRegisterModel:
         # Calcuate position of start and end of shift register in transction, taking account
         # of the maximum length of the shift register. This behaviour may differ from that of
         # the real ASIC.
+        shift_register = self._shift_registers[addr]
         trans_start = 1 + idx
-        sr_trans_len = min(
-            len(self._shift_registers[addr]),
-            len(transaction[1 + idx :]),
-        )
-        trans_end = 1 + idx + sr_trans_len
+        sr_trans_len = min(len(shift_register), len(transaction) - trans_start)
+        trans_end = trans_start + sr_trans_len
 
-        # Handle write and read transactions appropriately
+        # Handle write and read transactions appropriately. Transfers are made directly between
+        # the transaction and the shift register storage without intermediate copies where the
+        # transaction is a bytes-like buffer.
         if self.is_write_transaction(transaction):
 
             logging.debug(
-                f"Write transaction to shift register at addr {addr} length {sr_trans_len}"
+                "Write transaction to shift register at addr %d length %d", addr, sr_trans_len
             )
-            self._shift_registers[addr][:sr_trans_len] = transaction[trans_start:trans_end]
+            if self._subscriptions:
+                old_values = shift_register[:sr_trans_len].tobytes()
+            if isinstance(transaction, (bytearray, memoryview)):
+                shift_register[:sr_trans_len] = memoryview(transaction)[trans_start:trans_end]
+            else:
+                shift_register[:sr_trans_len] = bytes(transaction[trans_start:trans_end])
+            if self._subscriptions and old_values != shift_register[:sr_trans_len]:
+                self._dirty |= 1 << addr
 
         else:
 
             logging.debug(
-                f"Read transaction from shift register at addr {addr} length {sr_trans_len}"
+                "Read transaction from shift register at addr %d length %d", addr, sr_trans_len
             )
-            transaction[trans_start:trans_end] = self._shift_registers[addr][:sr_trans_len]
+            transaction[trans_start:trans_end] = shift_register[:sr_trans_len]
 
     def is_write_transaction(self, transaction):
         """Determine if a transaction is a write.
@@ -227,9 +629,7 @@ class MercuryAsicRegisterModel:
         :param addr: raw address from the transaction
         :return: true register address
         """
-        if self.page_select and addr > 2:
-            addr += self.REGISTER_PAGE_SIZE
-        return addr
+        return REGISTER_METADATA.page_addrs[self.page_select][addr]
 
     def log_register_write(self, addr):
         """Log register write operations.
@@ -238,8 +638,9 @@ class MercuryAsicRegisterModel:
 
         :param addr: address of the register written to
         """
-        reg_name = RegisterMap(addr).name
-        logging.debug(f"{reg_name} register: {self._registers[addr]:#04x}")
+        logging.debug(
+            "%s register: %#04x", REGISTER_METADATA.name(addr), self._registers[addr]
+        )
 
     def _do_config1(self):
         """Execute callback for CONFIG1 register writes.
@@ -248,7 +649,7 @@ class MercuryAsicRegisterModel:
         """
         # Determine if the page select is being changed by this write and, if so, update the
         # value and emit a debug message.
-        page_select = self.bitfield(self._registers[RegisterMap.CONFIG1], 0, 1)
+        page_select = self.PAGE_SELECT_FIELD.decode(self._registers[RegisterMap.CONFIG1])
         if page_select != self.page_select:
             logging.debug(f"Register page select is now {page_select}")
             self.page_select = page_select
@@ -258,7 +659,7 @@ class MercuryAsicRegisterModel:
 
         This callback is executed on writes to the TESTSR register.
         """
-        test_sr_sector = self.bitfield(self._registers[RegisterMap.TEST_SR], 2, 5)
+        test_sr_sector = self.TEST_SR_SECTOR_FIELD.decode(self._registers[RegisterMap.TEST_SR])
         if test_sr_sector != self.test_sr_sector:
             logging.debug(f"Test shift register sector select is now {test_sr_sector}")
-            self.test_sr_sector = test_sr_sector
\ No newline at end of file
+            self._select_test_sr_sector(test_sr_sector)
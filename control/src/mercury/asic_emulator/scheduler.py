@@ -0,0 +1,121 @@
+"""FairScheduler - fair scheduling of MERCURY ASIC emulator client requests.
+
+This module implements the scheduling of the requests received by the emulator server from its
+clients. Requests are queued per client and served by weighted round robin, so that a client
+flooding the emulator with requests cannot starve the others. The queue of each client is
+limited by a high-water mark, beyond which further requests are rejected, allowing the server to
+respond immediately that it is busy rather than letting the queue grow without bound.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import collections
+
+
+class FairScheduler:
+    """
+    Fair client request scheduler class.
+
+    This class implements a deficit round-robin scheduler of client requests. Each client with
+    queued requests takes a turn in serving up to its weight in requests, in order of arrival,
+    before the next client is served. Requests from each client are always served in order.
+    """
+
+    def __init__(self, high_water_mark=1024, weights=None, default_weight=1):
+        """Initialise the scheduler.
+
+        :param high_water_mark: maximum number of requests queued for each client
+        :param weights: dict of the weights of specific clients, keyed by client ID
+        :param default_weight: weight of clients without a specified weight
+        """
+        if high_water_mark < 1:
+            raise ValueError("High-water mark must be at least 1")
+
+        self.high_water_mark = high_water_mark
+        self.default_weight = default_weight
+        self._weights = {}
+        for (client_id, weight) in (weights or {}).items():
+            self.set_weight(client_id, weight)
+
+        self._queues = {}
+        self._active = collections.deque()
+        self._credit = 0
+        self._len = 0
+
+    def __len__(self):
+        """Return the total number of queued requests."""
+        return self._len
+
+    def set_weight(self, client_id, weight):
+        """Set the weight of a client.
+
+        :param client_id: bytes ID of the client
+        :param weight: number of requests served from the client in each round
+        """
+        if weight < 1:
+            raise ValueError(f"Weight of client {client_id} must be at least 1")
+        self._weights[client_id] = int(weight)
+
+    def weight(self, client_id):
+        """Return the weight of a client.
+
+        :param client_id: bytes ID of the client
+        """
+        return self._weights.get(client_id, self.default_weight)
+
+    def queued(self, client_id):
+        """Return the number of requests queued for a client.
+
+        :param client_id: bytes ID of the client
+        """
+        queue = self._queues.get(client_id)
+        return len(queue) if queue else 0
+
+    def put(self, client_id, request):
+        """Queue a request from a client.
+
+        :param client_id: bytes ID of the client
+        :param request: request to queue
+        :return: True if the request was queued, False if the queue of the client is full
+        """
+        queue = self._queues.get(client_id)
+        if queue is None:
+            queue = self._queues[client_id] = collections.deque()
+            self._active.append(client_id)
+        elif len(queue) >= self.high_water_mark:
+            return False
+
+        queue.append(request)
+        self._len += 1
+        return True
+
+    def get_batch(self, max_requests):
+        """Get a batch of queued requests in scheduled order.
+
+        The client at the head of the round keeps any credit left unused when the batch is full,
+        so that it completes its turn in the next batch.
+
+        :param max_requests: maximum number of requests in the batch
+        :return: list of requests
+        """
+        batch = []
+        while self._active and len(batch) < max_requests:
+            client_id = self._active[0]
+            queue = self._queues[client_id]
+            if not self._credit:
+                self._credit = self.weight(client_id)
+
+            while queue and self._credit and len(batch) < max_requests:
+                batch.append(queue.popleft())
+                self._credit -= 1
+
+            # Move on to the next client once this client has used its credit or has no more
+            # requests queued, discarding the queue of idle clients
+            if not queue:
+                self._active.popleft()
+                del self._queues[client_id]
+                self._credit = 0
+            elif not self._credit:
+                self._active.rotate(-1)
+
+        self._len -= len(batch)
+        return batch
@@ -2,18 +2,29 @@
 
 This module implements a server for the MERCURY ASIC emulation, handling
 client connections via ZeroMQ which emulate SPI register transactions. Transactions
-are encoded with msgpack and passed to the underlying register module for processing.
+are encoded with msgpack, optionally addressed to one of multiple emulated ASICs or sent in
+batches, or sent as raw bytes if negotiated by the client, and passed to the underlying register
+model for processing. Register changes can optionally be published to subscribing clients.
 
 Tim Nicholls, STFC Detector Systems Software Group.
 """
 import asyncio
+import functools
 import logging
+import time
 
 import zmq
 import zmq.asyncio
 import zmq.utils.monitor
 import msgpack
 
+from mercury.asic.registers import RegisterMap
+
+from . import protocol
+from .client_stats import ClientStatsTable
+from .scheduler import FairScheduler
+from .register_model import MercuryAsicRegisterModel
+
 
 class EmulatorServer:
     """
@@ -22,20 +33,46 @@ class EmulatorServer:
     The class implements the MERCURY ASIC emulator server.
     """
 
-    def __init__(self, endpoint, ioloop, register_model):
+    # Maximum number of messages received from the socket for each batch processed
+    RECEIVE_BATCHES = 4
+
+    def __init__(
+        self, endpoint, ioloop, register_model, tracer=None, max_batch_size=64,
+        publish_endpoint=None, high_water_mark=1024, client_weights=None, client_frame=0
+    ):
         """Intialize the EmulatorServer object.
 
         :param endpoint: ZMQ server endpoint URI
         :param ioloop: ayncio ioloop to run server in, or None if to be created
-        :param register_model: MercuryAsicRegisterModel instance
+        :param register_model: MercuryAsicRegisterModel or MercuryMultiAsicRegisterModel instance
+        :param tracer: TransactionTracer instance to record transactions in, or None
+        :param max_batch_size: maximum number of received messages processed in each batch
+        :param publish_endpoint: ZMQ endpoint URI to publish register changes on, or None
+        :param high_water_mark: maximum number of messages queued for processing per client
+        :param client_weights: dict of client scheduling weights keyed by client ID, or None
+        :param client_frame: index of the frame of the routing envelope of each message holding
+                             the ID of the client, which is non-zero for messages forwarded by an
+                             intermediary such as an emulator farm
         """
         # Store arguments for use
         self.endpoint = endpoint
         self.ioloop = ioloop
         self.register_model = register_model
+        self.tracer = tracer
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.client_frame = client_frame
 
-        # Initialise empty set of connected clients
+        # Initialise empty set of connected clients, the table of per-client statistics and the
+        # scheduler of the messages queued by each client
         self._clients = set()
+        self._client_stats = ClientStatsTable()
+        self._scheduler = FairScheduler(
+            high_water_mark,
+            {
+                (client_id.encode("utf-8") if isinstance(client_id, str) else client_id): weight
+                for (client_id, weight) in (client_weights or {}).items()
+            },
+        )
 
         # Create the ZeroMQ aysnc context, server and monitor sockets and bind the server socket
         logging.info(f"Starting emulator server listening at endpoint {self.endpoint}")
@@ -46,6 +83,24 @@ class EmulatorServer:
         )
         self.socket.bind(self.endpoint)
 
+        # If a publish endpoint is specified, create and bind the publisher socket and subscribe
+        # to changes to the registers of each ASIC in the model, maintaining a version number
+        # for each ASIC which is incremented for each change event published
+        self.publish_endpoint = publish_endpoint
+        self.publish_socket = None
+        self._asic_models = getattr(register_model, "asics", [register_model])
+        self._asic_addressing = hasattr(register_model, "asics")
+        self._change_versions = [0] * len(self._asic_models)
+        if self.publish_endpoint:
+            logging.info(f"Publishing register changes at endpoint {self.publish_endpoint}")
+            self.publish_socket = self.ctx.socket(zmq.XPUB)
+            self.publish_socket.setsockopt(zmq.XPUB_WELCOME_MSG, protocol.CHANGE_WELCOME)
+            self.publish_socket.bind(self.publish_endpoint)
+            for (asic, model) in enumerate(self._asic_models):
+                model.subscribe(
+                    functools.partial(self._publish_changes, asic), 0, len(model.registers())
+                )
+
         # There no ioloop was passed, get one
         if not self.ioloop:
             self.ioloop = asyncio.get_event_loop()
@@ -53,6 +108,8 @@ class EmulatorServer:
         # Start the server and monitor tasks on the ioloop
         self.server_task = self.ioloop.create_task(self._run_server())
         self.monitor_task = self.ioloop.create_task(self._run_monitor())
+        if self.publish_socket:
+            self.publish_task = self.ioloop.create_task(self._run_publisher())
 
     def connected(self):
         """Return true if one or more clients are connected."""
@@ -62,42 +119,350 @@ class EmulatorServer:
         """Return a list of connected clients."""
         return list(self._clients)
 
+    def client_stats(self):
+        """Return a dict of the transaction statistics of each client, keyed by client ID."""
+        return self._client_stats.stats()
+
+    def queued(self):
+        """Return the number of messages queued for processing."""
+        return len(self._scheduler)
+
     async def _run_server(self):
-        """Run the server socket task loop."""
+        """Run the server socket task loop.
+
+        Each iteration of the loop waits for a message to be received if none are queued, then
+        drains any further messages already queued on the socket without waiting, adding each
+        to the queue of the client sending it. Messages from a client whose queue is full are
+        rejected immediately with a busy response. A batch of queued messages, up to the maximum
+        batch size, is then taken from the client queues in scheduled order and processed, which
+        preserves the order of the transactions from each client, and the responses then sent
+        together. This avoids a full event loop cycle for every message when many clients have
+        requests queued, while preventing a client flooding the server from starving others.
+        """
+        max_receive = self.max_batch_size * self.RECEIVE_BATCHES
         while True:
 
-            # Wait for a message to be received on the socket
-            recvd_msg = await self.socket.recv_multipart()
+            # Wait for a message to be received on the socket if none are queued, then drain
+            # any other messages ready to be received, checking the socket events to avoid a
+            # failed receive, and queue the messages by client
+            resp_msgs = []
+            if not self._scheduler:
+                self._queue_message(await self.socket.recv_multipart(), resp_msgs)
+            num_received = 0
+            while num_received < max_receive and self.socket.get(zmq.EVENTS) & zmq.POLLIN:
+                self._queue_message(
+                    await self.socket.recv_multipart(flags=zmq.NOBLOCK), resp_msgs
+                )
+                num_received += 1
 
-            # Extract the router-dealer client ID from the message
-            client_id = recvd_msg[0].decode("utf-8")
+            # Process the next batch of queued messages, handling each according to its wire
+            # format and returning the routing envelope of the message with the response. The
+            # statistics of the client are updated with the time taken to process the message.
+            for (envelope, client_id, data) in self._scheduler.get_batch(self.max_batch_size):
+                start_time = time.perf_counter_ns()
+                client_stats = self._client_stats.get(client_id)
+                if protocol.is_raw(data):
+                    response = self._process_raw_message(client_id, client_stats, data)
+                else:
+                    response = self._process_message(client_id, client_stats, data)
+                resp_msgs.append(envelope + [response])
+                client_stats.record_message(
+                    len(data), len(response), time.perf_counter_ns() - start_time
+                )
 
-            try:
+            # Transmit the responses to the clients on the socket
+            for resp_msg in resp_msgs:
+                await self.socket.send_multipart(resp_msg)
 
-                # Decode the transaction
-                transaction = msgpack.unpackb(recvd_msg[1])
-                logging.info(
-                    f"Received transaction {transaction} from client ID {client_id}"
-                )
+            # Yield to other tasks on the ioloop if the server is under load, since receiving a
+            # message that is already available, or not waiting to receive one while messages
+            # remain queued, does not yield, which would otherwise starve the other tasks
+            if num_received or self._scheduler:
+                await asyncio.sleep(0)
+
+    def _queue_message(self, recvd_msg, resp_msgs):
+        """Queue a message received from a client for processing.
+
+        The routing envelope of each message, i.e. all frames but the last, is returned with the
+        response. The envelope starts with the router-dealer client ID, kept as raw bytes,
+        followed by any frames sent by the client before the message, such as a request ID. If
+        the message was forwarded by an intermediary such as an emulator farm, the envelope
+        starts with the ID of the intermediary and the ID of the originating client is at the
+        client frame index. If the queue of the client is full, a busy response is added to the
+        list of responses instead.
+
+        :param recvd_msg: list of message frames received on the socket
+        :param resp_msgs: list of response messages to add any busy response to
+        """
+        (envelope, data) = (recvd_msg[:-1], recvd_msg[-1])
+        client_id = envelope[self.client_frame]
+        if not self._scheduler.put(client_id, (envelope, client_id, data)):
+            logging.debug("Queue full for client ID %s, rejecting message", client_id)
+            self._client_stats.get(client_id).busy += 1
+            resp_msgs.append(envelope + [protocol.BUSY_RESPONSE])
+
+    def _process_message(self, client_id, client_stats, data):
+        """Process a message encoded with msgpack.
+
+        :param client_id: bytes ID of the client sending the message
+        :param client_stats: ClientStats instance of the client
+        :param data: bytes encoded message
+        :return: bytes encoded response
+        """
+        (transaction, asic) = ([], None)
+
+        try:
+
+            # Decode the message and handle hello and batch messages separately
+            message = protocol.decode_message(data)
+            if protocol.is_hello(message):
+                wire_format = protocol.negotiate_format(message)
+                logging.debug("Client ID %s negotiated %s wire format", client_id, wire_format)
+                return protocol.pack_hello_response(wire_format)
+
+            if protocol.is_batch(message):
+                return self._process_batch(client_id, client_stats, message)
+
+            if protocol.is_snapshot(message):
+                return self._process_snapshot(message)
+
+            # Extract the transaction and the index of the ASIC it is addressed to, if any
+            (transaction, asic) = protocol.parse_transaction(message)
+            logging.debug(
+                "Received transaction %s for ASIC %s from client ID %s",
+                transaction, asic, client_id
+            )
+
+            # Convert transaction to a bytearray in analogy to an SPI transactio and pass
+            # to the emulator register model for processing
+            transaction = bytearray(transaction)
+            response = self._process_transaction(client_id, client_stats, transaction, asic)
+
+        except (
+            msgpack.UnpackException,
+            msgpack.UnpackValueError,
+            ValueError,
+        ) as err:
+            # Handle transaction decoding errors - in the case of an error, return the
+            # transaction unprocessed.
+            logging.error("Failed to unpack client message: %s", err)
+            client_stats.errors += 1
+            response = transaction
+
+        # Encode the response to the client
+        return protocol.pack_transaction(response, asic)
+
+    def _process_raw_message(self, client_id, client_stats, data):
+        """Process a raw message.
+
+        The transaction in a raw message is processed in place in the received message, without
+        decoding, and the message returned as the response. Only read transactions, for which the
+        register values are returned in the transaction, are copied into a writable buffer.
+
+        :param client_id: bytes ID of the client sending the message
+        :param client_stats: ClientStats instance of the client
+        :param data: bytes raw message
+        :return: bytes-like response
+        """
+        try:
+            (asic, header_len) = protocol.parse_raw_header(data)
+        except protocol.ProtocolError as err:
+            # In the case of an error, return the message unprocessed
+            logging.error("Failed to unpack client raw message: %s", err)
+            client_stats.errors += 1
+            return data
+
+        logging.debug(
+            "Received raw transaction of length %d for ASIC %s from client ID %s",
+            len(data) - header_len, asic, client_id
+        )
+
+        if len(data) > header_len and data[header_len] & MercuryAsicRegisterModel.REGISTER_RW_MASK:
+            data = bytearray(data)
+        self._process_transaction(client_id, client_stats, memoryview(data)[header_len:], asic)
+
+        return data
+
+    def _process_transaction(self, client_id, client_stats, transaction, asic):
+        """Process a single transaction in the register model.
+
+        An error processing the transaction is counted in the client statistics and the
+        transaction returned unprocessed as the response.
+
+        :param client_id: bytes ID of the client sending the transaction
+        :param client_stats: ClientStats instance of the client
+        :param transaction: bytes-like transaction
+        :param asic: index of the ASIC the transaction is addressed to, or None for the default
+        :return: response to the transaction
+        """
+        try:
+            response = self.register_model.process_transaction(
+                transaction, *self._asic_args(asic), raise_errors=True
+            )
+            error = False
+        except protocol.ProtocolError as err:
+            logging.error("Failed to process transaction from client ID %s: %s", client_id, err)
+            response = transaction
+            error = True
+        except Exception:
+            response = transaction
+            error = True
+
+        client_stats.record_transaction(
+            bool(len(transaction) and transaction[0] & MercuryAsicRegisterModel.REGISTER_RW_MASK),
+            error
+        )
+
+        # Record the processed transaction if tracing is enabled
+        if response:
+            self._trace(client_id, response)
+
+        return response
+
+    def _asic_args(self, asic):
+        """Return the arguments addressing a transaction to an ASIC in the register model.
+
+        :param asic: index of the ASIC the transaction is addressed to, or None for the default
+        :return: tuple of arguments to pass to the register model with the transaction
+        :raises ProtocolError: if the transaction is addressed to an ASIC and the register model
+                               emulates a single ASIC, so does not support ASIC addressing
+        """
+        if asic is None:
+            return ()
+        if not self._asic_addressing:
+            raise protocol.ProtocolError(
+                f"ASIC addressing not supported by single ASIC register model (ASIC {asic})"
+            )
+        return (asic,)
+
+    def _trace(self, client_id, response):
+        """Record a processed transaction in the tracer, if tracing is enabled.
+
+        Errors recording the transaction are logged rather than raised, so that a failure of the
+        tracer only loses the trace record.
+
+        :param client_id: ID of the client issuing the transaction
+        :param response: response to the transaction
+        """
+        if self.tracer is None:
+            return
+        try:
+            self.tracer.record(client_id, response)
+        except Exception as err:
+            logging.error(f"Error recording transaction trace: {err}")
+
+    def _process_snapshot(self, message):
+        """Process a request for a snapshot of the registers of an ASIC.
+
+        :param message: decoded snapshot request message
+        :return: bytes encoded snapshot response
+        """
+        try:
+            asic = int(message[protocol.KEY_SNAPSHOT] or 0)
+        except TypeError as err:
+            raise ValueError(f"Malformed snapshot request: {err}")
+        if not 0 <= asic < len(self._asic_models):
+            raise ValueError(f"Snapshot requested for ASIC index {asic} out of range")
+
+        return protocol.pack_snapshot_response(
+            self._change_versions[asic], self._asic_models[asic].register_bytes()
+        )
+
+    def _publish_changes(self, asic, addrs):
+        """Publish a register change event for an ASIC.
+
+        This method is called by the register model of an ASIC with the addresses of the
+        registers changed by a transaction, which are published as runs of contiguous registers
+        with their new values. Changes to shift register contents are not published.
+
+        :param asic: index of the ASIC
+        :param addrs: tuple of changed register addresses in ascending order
+        """
+        registers = self._asic_models[asic].register_bytes()
+        runs = []
+        for addr in addrs:
+            if addr in (RegisterMap.SR_CAL, RegisterMap.SR_TEST):
+                continue
+            if runs and runs[-1][1] == addr:
+                runs[-1][1] = addr + 1
+            else:
+                runs.append([addr, addr + 1])
+
+        if not runs:
+            return
+
+        self._change_versions[asic] += 1
+        payload = protocol.pack_change_event(
+            self._change_versions[asic], ((start, registers[start:end]) for (start, end) in runs)
+        )
+
+        # Reading the socket events makes the publisher socket process any pending subscriptions,
+        # which sending alone may defer, so that the event reaches subscribers that have already
+        # received the welcome message
+        self.publish_socket.getsockopt(zmq.EVENTS)
+        self.publish_socket.send_multipart([protocol.change_topic(asic), payload])
 
-                # Convert transaction to a bytearray in analogy to an SPI transactio and pass
-                # to the emulator register model for processing
+    def _process_batch(self, client_id, client_stats, message):
+        """Process a batch message containing multiple transactions.
+
+        Each transaction in the batch is processed in turn by the register model. An error in
+        one transaction is reported in the status of that transaction and does not prevent the
+        remaining transactions in the batch being processed.
+
+        :param client_id: bytes ID of the client sending the message
+        :param client_stats: ClientStats instance of the client
+        :param message: decoded batch message
+        :return: bytes encoded batch response message
+        """
+        try:
+            (transactions, asic) = protocol.parse_batch(message)
+        except protocol.ProtocolError as err:
+            logging.error("Failed to unpack client batch message: %s", err)
+            client_stats.errors += 1
+            return protocol.pack_batch_error(err)
+
+        logging.debug(
+            "Received batch of %d transactions for ASIC %s from client ID %s",
+            len(transactions), asic, client_id
+        )
+        responses = []
+        status = []
+        for transaction in transactions:
+            try:
                 transaction = bytearray(transaction)
-                response = self.register_model.process_transaction(transaction)
-
-            except (
-                msgpack.UnpackException,
-                msgpack.UnpackValueError,
-                ValueError,
-            ) as err:
-                # Handle transaction decoding errors - in the case of an error, return the
-                # transaction unprocessed.
-                logging.error("Failed to unpack client message: %s", err)
+                response = self.register_model.process_transaction(
+                    transaction, *self._asic_args(asic), raise_errors=True
+                )
+                status.append(None)
+            except Exception as err:
                 response = transaction
+                status.append(f"{type(err).__name__}: {err}")
+
+            if status[-1] is None:
+                self._trace(client_id, response)
+
+            client_stats.record_transaction(
+                bool(transaction and transaction[0] & MercuryAsicRegisterModel.REGISTER_RW_MASK),
+                status[-1] is not None
+            )
 
-            # Encode the response to the client and transmit on the socket
-            resp_msg = [client_id.encode("utf-8"), msgpack.packb(response)]
-            await self.socket.send_multipart(resp_msg)
+            responses.append(response)
+
+        return protocol.pack_batch_response(responses, status)
+
+    async def _run_publisher(self):
+        """Run the publisher socket task loop.
+
+        This loop receives the subscription messages sent to the publisher socket by subscribers,
+        which also ensures that new subscribers are attached, and sent the welcome message, when
+        no register changes are being published.
+        """
+        while True:
+            recvd_msg = await self.publish_socket.recv()
+            logging.debug(
+                "Register change %s for topic %s",
+                "subscription" if recvd_msg[:1] == b"\x01" else "unsubscription", recvd_msg[1:]
+            )
 
     async def _run_monitor(self):
         """Run the server monitor socket task loop."""
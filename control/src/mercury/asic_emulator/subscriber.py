@@ -0,0 +1,130 @@
+"""RegisterChangeSubscriber - client-side cache of MERCURY ASIC emulator registers.
+
+This module implements a subscriber to the register change events published by the MERCURY ASIC
+emulator, maintaining a local copy of the registers of an emulated ASIC without polling the
+emulator with read transactions. The copy is initialised from a snapshot of the registers and
+then updated by applying each change event published after the snapshot.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import logging
+
+import zmq
+import zmq.asyncio
+
+from . import protocol
+from .client import MercuryAsicClient
+
+
+class RegisterChangeSubscriber:
+    """
+    MERCURY ASIC emulator register change subscriber class.
+
+    This class subscribes to the register change events published by the emulator for an ASIC
+    and applies them to a local copy of the registers. Events are versioned, so that events
+    already reflected in the snapshot can be ignored and missed events detected, in which case
+    the local copy is resynchronised from a new snapshot.
+    """
+
+    def __init__(self, endpoint, publish_endpoint, asic=None, callback=None):
+        """Initialise the subscriber.
+
+        :param endpoint: string endpoint URI of the emulator server, used to request snapshots
+        :param publish_endpoint: string endpoint URI the emulator publishes register changes on
+        :param asic: index of the emulated ASIC to follow, or None for the default ASIC
+        :param callback: optional callable notified with a tuple of changed register addresses
+        """
+        self.asic = asic
+        self.callback = callback
+        self.version = None
+        self.registers = bytearray()
+        self._welcomed = False
+
+        # Create the client used to request snapshots
+        self.client = MercuryAsicClient(endpoint)
+
+        # Create and connect the subscriber socket, subscribing to changes for the ASIC and to the
+        # welcome message sent once the subscription is active
+        self.ctx = zmq.asyncio.Context.instance()
+        self.socket = self.ctx.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.SUBSCRIBE, protocol.CHANGE_WELCOME)
+        self.socket.setsockopt(zmq.SUBSCRIBE, protocol.change_topic(asic))
+        self.socket.connect(publish_endpoint)
+
+    async def synchronise(self):
+        """Synchronise the local copy of the registers with a snapshot from the emulator.
+
+        The first synchronisation waits for the welcome message from the emulator, indicating
+        that the subscription is active, before requesting the snapshot.
+        """
+        while not self._welcomed:
+            await self._receive_event()
+
+        (self.version, registers) = await self.client.snapshot(self.asic)
+        self.registers = bytearray(registers)
+        logging.debug(f"Synchronised registers with emulator snapshot version {self.version}")
+
+        if self.callback:
+            self.callback(tuple(range(len(self.registers))))
+
+    def apply(self, version, runs):
+        """Apply a register change event to the local copy of the registers.
+
+        :param version: version of the change event
+        :param runs: list of tuples of the address and new values of each run of changed registers
+        :return: True if the event was applied or already reflected, False if events were missed
+        """
+        if self.version is None or version > self.version + 1:
+            return False
+        if version <= self.version:
+            return True
+
+        changed_addrs = []
+        for (addr, values) in runs:
+            self.registers[addr : addr + len(values)] = values
+            changed_addrs.extend(range(addr, addr + len(values)))
+        self.version = version
+
+        if self.callback:
+            self.callback(tuple(changed_addrs))
+
+        return True
+
+    async def _receive_event(self):
+        """Receive the next message from the emulator register change channel.
+
+        :return: tuple of the version and runs of the event, or None for the welcome message
+        """
+        recvd_msg = await self.socket.recv_multipart()
+        if recvd_msg == [protocol.CHANGE_WELCOME]:
+            self._welcomed = True
+            return None
+        return protocol.unpack_change_event(recvd_msg[-1])
+
+    async def receive(self):
+        """Receive and apply the next register change event.
+
+        If the event shows that one or more events have been missed, the local copy of the
+        registers is resynchronised from a new snapshot.
+        """
+        event = None
+        while event is None:
+            event = await self._receive_event()
+
+        (version, runs) = event
+        if not self.apply(version, runs):
+            logging.warning(
+                f"Missed register change events before version {version}, resynchronising"
+            )
+            await self.synchronise()
+
+    async def run(self):
+        """Synchronise with the emulator then apply register change events indefinitely."""
+        await self.synchronise()
+        while True:
+            await self.receive()
+
+    def close(self):
+        """Close the subscriber and snapshot client sockets."""
+        self.socket.close(linger=0)
+        self.client.close()
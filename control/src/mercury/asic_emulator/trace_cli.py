@@ -0,0 +1,51 @@
+"""Trace decoder - command-line rendering of MERCURY ASIC emulator transaction traces.
+
+This module implements a command-line tool rendering the transaction trace files saved by the
+emulator transaction tracer as text, one line per transaction. It is kept separate from the
+tracer so that the emulator does not depend on click at runtime.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+from datetime import datetime
+
+import click
+
+from .tracer import TransactionTracer, TransactionTracerError
+
+
+@click.command()
+@click.argument("trace_file", type=click.Path(exists=True, dir_okay=False))
+def main(trace_file):
+    """Render a MERCURY ASIC emulator transaction trace file.
+
+    This function implements the entry point of the trace decoder, printing each record in the
+    specified trace file, saved by the emulator tracer, as a line of text. Client IDs truncated
+    in the trace are marked with a trailing +.
+
+    :param trace_file: path of the trace file to render
+    """
+    with open(trace_file, "rb") as trace:
+        data = trace.read()
+
+    try:
+        for record in TransactionTracer.decode(data):
+            timestamp = datetime.fromtimestamp(record["timestamp"]).isoformat(
+                timespec="microseconds"
+            )
+            direction = "R" if record["direction"] == TransactionTracer.DIRECTION_READ else "W"
+            payload = " ".join(f"{val:02x}" for val in record["payload"])
+            if len(record["payload"]) < record["length"]:
+                payload += " ..."
+            client_id = record["client_id"].decode("utf-8", "replace")
+            if record["client_id_truncated"]:
+                client_id += "+"
+            click.echo(
+                f"{timestamp} {client_id:>16} {direction} "
+                f"{record['addr']:03d} {record['length']:4d} : {payload}"
+            )
+    except TransactionTracerError as err:
+        raise click.ClickException(str(err))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""TransactionTracer - binary ring-buffer tracing of MERCURY ASIC emulator transactions.
+
+This module implements a transaction tracer for the MERCURY ASIC emulator. Each transaction
+processed by the emulator is recorded as a fixed-size binary record in a preallocated ring
+buffer, avoiding the cost of formatting log messages for every transaction. The buffer can be
+saved to a file and rendered on demand with the decoder command-line tool in the trace_cli
+module.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import struct
+import time
+
+
+class TransactionTracerError(Exception):
+    """Simple exception class for the transaction tracer."""
+
+    pass
+
+
+class TransactionTracer:
+    """
+    MERCURY ASIC emulator transaction tracer class.
+
+    This class implements a fixed-size ring buffer of binary transaction records. Each record
+    contains a timestamp, the client ID, the transaction address byte, the direction and length
+    of the transaction and its payload, truncated to a fixed maximum size. Client IDs longer than
+    the field in the record are truncated and flagged as such. Once the buffer is full, the oldest
+    records are overwritten.
+    """
+
+    # Trace file header format: magic, format version, record count and payload size
+    FILE_MAGIC = b"MTRC"
+    FILE_VERSION = 2
+    FILE_HEADER = struct.Struct("<4sBIH")
+
+    # Record header format: timestamp, client ID, address byte, flags, length
+    CLIENT_ID_SIZE = 16
+    RECORD_HEADER = struct.Struct(f"<d{CLIENT_ID_SIZE}sBBI")
+
+    # The direction of the transaction is held in the lowest bit of the record flags
+    DIRECTION_WRITE = 0
+    DIRECTION_READ = 1
+    FLAG_DIRECTION = 0x1
+    FLAG_CLIENT_ID_TRUNCATED = 0x2
+
+    def __init__(self, num_records=4096, payload_size=32):
+        """Initialise the tracer.
+
+        :param num_records: number of records held in the ring buffer
+        :param payload_size: maximum number of payload bytes recorded for each transaction
+        """
+        self.num_records = num_records
+        self.payload_size = payload_size
+        self.record_size = self.RECORD_HEADER.size + payload_size
+
+        self._buffer = bytearray(num_records * self.record_size)
+        self._next_record = 0
+        self._count = 0
+
+    @property
+    def count(self):
+        """Return the number of records currently held in the buffer."""
+        return self._count
+
+    def clear(self):
+        """Clear all records from the buffer."""
+        self._next_record = 0
+        self._count = 0
+
+    def record(self, client_id, transaction):
+        """Record a transaction in the ring buffer.
+
+        :param client_id: bytes ID of the client issuing the transaction
+        :param transaction: bytes-like transaction, including the address byte
+        """
+        offset = self._next_record * self.record_size
+        payload_len = len(transaction) - 1
+        flags = (transaction[0] >> 7) & self.FLAG_DIRECTION
+        if len(client_id) > self.CLIENT_ID_SIZE:
+            flags |= self.FLAG_CLIENT_ID_TRUNCATED
+        self.RECORD_HEADER.pack_into(
+            self._buffer,
+            offset,
+            time.time(),
+            client_id,
+            transaction[0],
+            flags,
+            payload_len,
+        )
+        payload_start = offset + self.RECORD_HEADER.size
+        recorded_len = min(payload_len, self.payload_size)
+        self._buffer[payload_start : payload_start + recorded_len] = transaction[
+            1 : 1 + recorded_len
+        ]
+
+        self._next_record = (self._next_record + 1) % self.num_records
+        self._count = min(self._count + 1, self.num_records)
+
+    def dump(self):
+        """Dump the contents of the ring buffer.
+
+        This method returns the records currently held in the buffer, in chronological order,
+        as bytes with a file header describing the records.
+
+        :return: bytes containing the trace header and records
+        """
+        end = self._next_record * self.record_size
+        if self._count < self.num_records:
+            records = self._buffer[:end]
+        else:
+            records = self._buffer[end:] + self._buffer[:end]
+
+        header = self.FILE_HEADER.pack(
+            self.FILE_MAGIC, self.FILE_VERSION, self._count, self.payload_size
+        )
+        return header + records
+
+    def save(self, path):
+        """Save the contents of the ring buffer to a file.
+
+        :param path: path of the file to save the trace to
+        """
+        with open(path, "wb") as trace_file:
+            trace_file.write(self.dump())
+
+    @classmethod
+    def decode(cls, data):
+        """Decode the records in a dumped trace.
+
+        This generator method decodes the records in a trace produced by the dump() method,
+        yielding each as a dict.
+
+        :param data: bytes containing the trace header and records
+        :return: generator yielding a dict for each record
+        """
+        try:
+            (magic, version, count, payload_size) = cls.FILE_HEADER.unpack_from(data)
+        except struct.error as err:
+            raise TransactionTracerError(f"Failed to decode trace header: {err}")
+
+        if magic != cls.FILE_MAGIC or version != cls.FILE_VERSION:
+            raise TransactionTracerError("Data is not a supported transaction trace")
+
+        record_size = cls.RECORD_HEADER.size + payload_size
+        if len(data) != cls.FILE_HEADER.size + count * record_size:
+            raise TransactionTracerError("Transaction trace is truncated")
+
+        for offset in range(cls.FILE_HEADER.size, len(data), record_size):
+            (timestamp, client_id, addr, flags, length) = cls.RECORD_HEADER.unpack_from(
+                data, offset
+            )
+            payload_start = offset + cls.RECORD_HEADER.size
+            yield {
+                "timestamp": timestamp,
+                "client_id": client_id.rstrip(b"\0"),
+                "client_id_truncated": bool(flags & cls.FLAG_CLIENT_ID_TRUNCATED),
+                "addr": addr & 0x7F,
+                "direction": flags & cls.FLAG_DIRECTION,
+                "length": length,
+                "payload": bytes(data[payload_start : payload_start + min(length, payload_size)]),
+            }
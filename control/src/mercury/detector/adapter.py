@@ -45,6 +45,14 @@ class MercuryDetectorAdapter(AsyncApiAdapter):
         """
         self.detector.initialize(adapters)
 
+    def cleanup(self):
+        """Clean up the adapter.
+
+        This method is called by odin-control when the server shuts down, allowing the detector
+        to stop any background tasks.
+        """
+        self.detector.cleanup()
+
     @response_types("application/json", default="application/json")
     async def get(self, path, request):
         """Handle an HTTP GET request.
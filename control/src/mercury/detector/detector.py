@@ -9,6 +9,7 @@ import logging
 from odin.adapters.parameter_tree import ParameterTree, ParameterTreeError
 from mercury.asic.device import MercuryAsicDevice
 from .context import SyncContext
+from .flags import MercuryFlagPoller
 
 
 class MercuryDetectorError(Exception):
@@ -32,11 +33,37 @@ class MercuryDetector:
         # Extract the required configuration settings from the options dict
         emulate_hw = options.get("emulate_hw", False)
         asic_emulator_endpoint = options.get("asic_emulator_endpoint", "")
-
-        self.asic = MercuryAsicDevice(emulate_hw, asic_emulator_endpoint)
+        asic_emulator_wire_format = options.get("asic_emulator_wire_format", "msgpack")
+        asic_emulator_window = int(options.get("asic_emulator_window", 64))
+        asic_spi_device = options.get("asic_spi_device", "/dev/spidev0.0")
+        asic_spi_speed_hz = int(options.get("asic_spi_speed_hz", 1000000))
+        asic_spi_mode = int(options.get("asic_spi_mode", 0))
+        asic_register_cache = bool(options.get("asic_register_cache", False))
+        asic_coalesce_writes = bool(options.get("asic_coalesce_writes", False))
+        asic_coalesce_window = float(options.get("asic_coalesce_window", 0.001))
+        asic_flag_poll_interval = float(options.get("asic_flag_poll_interval", 0.0))
+        asic_flag_poll_max_interval = float(options.get("asic_flag_poll_max_interval", 10.0))
+
+        self.asic = MercuryAsicDevice(
+            emulate_hw, asic_emulator_endpoint, emulator_wire_format=asic_emulator_wire_format,
+            emulator_window=asic_emulator_window, cache_registers=asic_register_cache,
+            coalesce_writes=asic_coalesce_writes, coalesce_window=asic_coalesce_window,
+            spi_device=asic_spi_device, spi_speed_hz=asic_spi_speed_hz, spi_mode=asic_spi_mode
+        )
+
+        # Create the status flag poller, which is started once the detector is initialized if a
+        # polling interval is configured
+        self.flag_poller = MercuryFlagPoller(
+            self.asic, asic_flag_poll_interval, asic_flag_poll_max_interval
+        )
 
         # Define the parameter tree containing register state and client status
-        self.parameters = ParameterTree({"status": "hello"})
+        self.parameters = ParameterTree({
+            "status": "hello",
+            "register_cache": (self.asic.cache_stats, None),
+            "write_coalescing": (self.asic.coalesce_stats, None),
+            "status_flags": (self.flag_poller.status, None),
+        })
 
         # Create a list of other adapters that will be populated later in the initialisation that
         # this adapter needs to communicate with
@@ -76,6 +103,18 @@ class MercuryDetector:
             self.adapters["odin_sequencer"].add_context("asic", self.sync_context)
             self.asic.register_context(self.sync_context)
 
+        # Start polling the ASIC status flags if enabled
+        if self.flag_poller.interval > 0:
+            self.flag_poller.start()
+
+    def cleanup(self):
+        """Clean up the detector.
+
+        This method is called by the enclosing adapter when odin-control shuts down, stopping the
+        background polling of the ASIC status flags.
+        """
+        self.flag_poller.stop()
+
     async def get(self, path):
         """Get values from the detector paramter tree.
 
@@ -0,0 +1,133 @@
+"""MercuryFlagPoller - background polling of the MERCURY ASIC status flags.
+
+This module implements a background poller of the read-only status flag registers of the MERCURY
+ASIC, i.e. the FIFO full flags and the serialiser clock status flags. The flag registers are read
+in a single burst transaction on each poll. The polling interval backs off while the flags are
+stable, up to a maximum, and returns to the base interval as soon as any flag changes. The edges
+of each flag are counted and timestamped for publication in the detector parameter tree.
+
+Tim Nicholls, STFC Detector Systems Software Group
+"""
+import asyncio
+import logging
+import time
+
+from mercury.asic.fields import REGISTER_FIELDS
+from mercury.asic.registers import REGISTER_METADATA
+
+# The status flag registers, which are consecutive and so can be read in a single burst
+FLAG_REGISTERS = REGISTER_METADATA.READ_ONLY_REGISTERS
+
+# The individual flag fields within the status flag registers
+FLAG_FIELDS = tuple(
+    field for field in REGISTER_FIELDS.fields if field.addr in FLAG_REGISTERS and field.width == 1
+)
+
+
+class MercuryFlagPoller:
+    """
+    MERCURY ASIC status flag poller class.
+
+    This class polls the status flag registers of the ASIC device in a background task, tracking
+    the value of each flag and counting its rising and falling edges. Each poll is a single batch
+    transfer under the paging lock of the device, which serialises it with every other write to
+    CONFIG1. The flag registers are in page 1, so unless that page is already selected the batch
+    holds three SPI transactions, writing CONFIG1 to select the page, the burst read of the flag
+    registers and writing CONFIG1 to restore the page select, which paging makes unavoidable.
+    The value of CONFIG1 is taken from the register cache if enabled, otherwise it is read from
+    the device in a further transfer before the batch.
+    """
+
+    def __init__(self, asic, interval=1.0, max_interval=10.0, backoff=2.0):
+        """Initialise the flag poller.
+
+        :param asic: MercuryAsicDevice to poll
+        :param interval: base polling interval in seconds, used after a flag changes
+        :param max_interval: maximum polling interval in seconds while the flags are stable
+        :param backoff: factor by which the polling interval increases after each stable poll
+        """
+        self.asic = asic
+        self.interval = interval
+        self.max_interval = max(max_interval, interval)
+        self.backoff = backoff
+
+        self.current_interval = interval
+        self.polls = 0
+        self.errors = 0
+        self.last_poll = None
+        self.last_error = None
+
+        self._flags = {
+            field.name: {"value": None, "rising": 0, "falling": 0, "last_change": None}
+            for field in FLAG_FIELDS
+        }
+        self._task = None
+
+    def start(self):
+        """Start polling the status flags in a background task."""
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    def stop(self):
+        """Stop polling the status flags."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def running(self):
+        """Return true if the poller is running."""
+        return self._task is not None
+
+    async def poll(self):
+        """Poll the status flags once, updating the flag values and edge counts.
+
+        The first poll establishes the flag values without counting any edges.
+
+        :return: list of the names of the flags which changed
+        """
+        values = await self.asic.read_registers(FLAG_REGISTERS)
+        now = time.time()
+        self.polls += 1
+        self.last_poll = now
+
+        changed = []
+        for field in FLAG_FIELDS:
+            flag = self._flags[field.name]
+            value = field.decode(values[field.addr])
+            if flag["value"] is not None and value != flag["value"]:
+                flag["rising" if value else "falling"] += 1
+                flag["last_change"] = now
+                changed.append(field.name)
+            flag["value"] = value
+
+        return changed
+
+    def status(self):
+        """Return a dict of the poller status and the state of each flag."""
+        return {
+            "running": self.running,
+            "interval": self.current_interval,
+            "polls": self.polls,
+            "errors": self.errors,
+            "last_poll": self.last_poll,
+            "last_error": self.last_error,
+            "flags": {name: dict(flag) for (name, flag) in self._flags.items()},
+        }
+
+    async def _run(self):
+        """Poll the status flags repeatedly, adapting the interval to the rate of change."""
+        while True:
+            try:
+                if await self.poll():
+                    self.current_interval = self.interval
+                else:
+                    self.current_interval = min(
+                        self.current_interval * self.backoff, self.max_interval
+                    )
+            except Exception as err:
+                logging.error(f"Error polling ASIC status flags: {err}")
+                self.errors += 1
+                self.last_error = str(err)
+
+            await asyncio.sleep(self.current_interval)
@@ -0,0 +1,58 @@
+from mercury.asic.cache import RegisterCache
+from mercury.asic.registers import RegisterMap
+
+
+class TestRegisterCache():
+    """Test cases for the RegisterCache class."""
+
+    def test_read_misses_until_cached(self):
+
+        cache = RegisterCache()
+        assert cache.read(RegisterMap.GLOB1, 2) is None
+        cache.update_write(RegisterMap.GLOB1, [1, 2])
+        assert cache.read(RegisterMap.GLOB1, 2) == b"\x01\x02"
+        assert cache.read(RegisterMap.GLOB1, 3) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_paged_registers_need_page_select(self):
+
+        cache = RegisterCache()
+        cache.update_write(RegisterMap.FRM_LNGTH, [10])
+        assert cache.read(RegisterMap.FRM_LNGTH, 1) is None
+
+        cache.update_read(RegisterMap.CONFIG1, [0])
+        cache.update_write(RegisterMap.FRM_LNGTH, [10])
+        assert cache.read(RegisterMap.FRM_LNGTH, 1) == b"\x0a"
+
+    def test_registers_cached_by_page(self):
+
+        cache = RegisterCache()
+        cache.update_write(RegisterMap.CONFIG1, [0, 0, 0, 5])
+        cache.update_write(RegisterMap.CONFIG1, [1, 0, 0, 6])
+        assert cache.read(3, 1) == b"\x06"
+        assert cache.stats()["cached"] == 5
+
+        cache.update_write(RegisterMap.CONFIG1, [0])
+        assert cache.read(3, 1) == b"\x05"
+
+    def test_uncacheable_registers(self):
+
+        cache = RegisterCache()
+        cache.update_write(RegisterMap.CONFIG1, [0])
+        cache.update_read(RegisterMap.SER_CONTROL10F, [1, 2, 3])
+        assert cache.read(RegisterMap.SER_CONTROL10F, 1) == b"\x01"
+        assert cache.read(RegisterMap.SR_CAL, 1) is None
+
+        cache.update_write(RegisterMap.CONFIG1, [1])
+        cache.update_read(RegisterMap.SER_BIAS10 - 128, [4, 5])
+        assert cache.read(RegisterMap.SER_BIAS10 - 128, 1) == b"\x04"
+        assert cache.read(RegisterMap.FIFO_FULL1 - 128, 1) is None
+
+    def test_invalidate(self):
+
+        cache = RegisterCache()
+        cache.update_write(RegisterMap.CONFIG1, [0, 1, 2])
+        cache.invalidate()
+        assert cache.read(RegisterMap.CONFIG1, 1) is None
+        assert cache.page_select is None
+        assert cache.invalidations == 1
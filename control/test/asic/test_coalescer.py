@@ -0,0 +1,40 @@
+from mercury.asic.coalescer import WriteCoalescer
+from mercury.asic.registers import RegisterMap
+
+
+class TestWriteCoalescer():
+    """Test cases for the WriteCoalescer class."""
+
+    def test_adjacent_writes_merged(self):
+
+        coalescer = WriteCoalescer()
+        coalescer.add(RegisterMap.FRM_LNGTH, [1])
+        coalescer.add(RegisterMap.INT_TIME, [2, 3])
+        coalescer.add(RegisterMap.SER_BIAS, [4])
+        coalescer.add(RegisterMap.FRM_LNGTH, [5])
+        assert coalescer.take() == [bytearray([RegisterMap.FRM_LNGTH, 1, 2, 3, 4]), bytearray(
+            [RegisterMap.FRM_LNGTH, 5]
+        )]
+        assert coalescer.stats() == {"writes": 4, "transactions": 2, "pending": 0, "saved": 2}
+
+    def test_page_boundary_and_config1_not_merged(self):
+
+        coalescer = WriteCoalescer()
+        coalescer.add(RegisterMap.CONFIG1, [1])
+        coalescer.add(RegisterMap.GLOB1, [2])
+        coalescer.add(RegisterMap.GLOB2, [3])
+        coalescer.add(RegisterMap.GLOB_VAL1, [4])
+        assert coalescer.take() == [
+            bytearray([RegisterMap.CONFIG1, 1]),
+            bytearray([RegisterMap.GLOB1, 2, 3]),
+            bytearray([RegisterMap.GLOB_VAL1, 4]),
+        ]
+
+    def test_shift_registers_not_merged(self):
+
+        coalescer = WriteCoalescer()
+        coalescer.add(RegisterMap.SER_CONTROL10F, [1])
+        coalescer.add(RegisterMap.SR_CAL, [2])
+        coalescer.add(RegisterMap.SR_TEST, [3])
+        assert len(coalescer) == 3
+        assert coalescer.stats()["saved"] == 0
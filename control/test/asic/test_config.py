@@ -0,0 +1,59 @@
+import pytest
+
+from mercury.asic.config import config_dependencies, config_targets, register_spans
+from mercury.asic.registers import RegisterMap
+
+
+class TestRegisterConfig():
+    """Test cases for the register configuration planning functions."""
+
+    def test_image_targets_exclude_unconfigurable_registers(self):
+
+        image = list(range(RegisterMap.SER_CLK_CHECK2 + 1))
+        targets = config_targets(image, {})
+        assert targets[RegisterMap.SER_BIAS1] == RegisterMap.SER_BIAS1
+        assert RegisterMap.CHIP_BIAS not in targets
+        assert RegisterMap.SR_CAL not in targets
+        assert RegisterMap.FIFO_FULL1 not in targets
+        assert 128 not in targets
+
+    def test_field_targets_keep_other_bits(self):
+
+        config = {"SER_BIAS_HIGH": 3, "FRM_LNGTH": 10}
+        assert config_dependencies(config) == {RegisterMap.SER_BIAS}
+        targets = config_targets(config, {RegisterMap.SER_BIAS: 0x25})
+        assert targets == {RegisterMap.SER_BIAS: 0x35, RegisterMap.FRM_LNGTH: 10}
+
+    @pytest.mark.parametrize("field", ["NOT_A_FIELD", "FIFO_FULL_1", "SR_TEST", "CHIP_BIAS"])
+    def test_invalid_fields_rejected(self, field):
+
+        with pytest.raises(ValueError):
+            config_targets({field: 1}, {})
+
+    @pytest.mark.parametrize("value", [300, -1])
+    def test_image_value_out_of_range_rejected(self, value):
+
+        image = [0] * (RegisterMap.SER_CLK_CHECK2 + 1)
+        image[RegisterMap.GLOB1] = value
+        with pytest.raises(ValueError, match="GLOB1 out of range"):
+            config_targets(image, {})
+
+    @pytest.mark.parametrize("config", [{"GLOB1": 300}, {"GLOB1": -1}, {"PAGE_SELECT": 2}])
+    def test_field_value_out_of_range_rejected(self, config):
+
+        with pytest.raises(ValueError, match="out of range"):
+            config_targets(config, {})
+
+    def test_spans_grouped_by_page(self):
+
+        addrs = [RegisterMap.GLOB2, 5, 6, 9, RegisterMap.SER_BIAS1, RegisterMap.SER_BIAS2]
+        assert register_spans(addrs) == {
+            None: [[RegisterMap.GLOB2]],
+            0: [[5, 6], [9]],
+            1: [[RegisterMap.SER_BIAS1, RegisterMap.SER_BIAS2]],
+        }
+
+    def test_spans_joined_over_known_gaps(self):
+
+        assert register_spans([5, 7, 10], {6: 0, 8: 0}, max_gap=2) == {0: [[5, 6, 7], [10]]}
+        assert register_spans([125, 127], {126: 0}, max_gap=1) == {0: [[125], [127]]}
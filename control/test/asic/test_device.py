@@ -0,0 +1,264 @@
+import asyncio
+import itertools
+from unittest.mock import AsyncMock, Mock
+
+import numpy as np
+import pytest
+import pytest_asyncio
+
+from mercury.asic.coalescer import WriteCoalescer
+from mercury.asic.device import MercuryAsicDevice, MercuryAsicDeviceError
+from mercury.asic.registers import RegisterMap
+from mercury.asic_emulator.multi_register_model import MercuryMultiAsicRegisterModel
+from mercury.asic_emulator.server import EmulatorServer
+
+endpoint_ids = itertools.count()
+
+
+@pytest_asyncio.fixture
+async def device(request):
+    """Test fixture providing an emulator server and a device with the register cache enabled."""
+    endpoint = f"inproc://test_device_{next(endpoint_ids)}"
+    model = MercuryMultiAsicRegisterModel(Mock(), False)
+    server = EmulatorServer(endpoint, asyncio.get_running_loop(), model)
+    wire_format = getattr(request, "param", "msgpack")
+    device = MercuryAsicDevice(
+        True, endpoint, emulator_wire_format=wire_format, cache_registers=True
+    )
+
+    yield (server, device)
+
+    server.server_task.cancel()
+    server.monitor_task.cancel()
+    if device._flush_task is not None:
+        device._flush_task.cancel()
+    device.device.close()
+    server.socket.close(linger=0)
+
+
+class TestMercuryAsicDevice():
+    """Test cases for the MercuryAsicDevice class."""
+
+    def test_locks_created_in_running_loop(self):
+
+        device = MercuryAsicDevice(True, f"inproc://test_device_{next(endpoint_ids)}")
+        assert not device._locks
+
+        async def get_locks():
+            return (device._lock("paging"), device._lock("paging"), device._lock("flush"))
+
+        (paging_lock, same_lock, flush_lock) = asyncio.run(get_locks())
+        assert paging_lock is same_lock and paging_lock is not flush_lock
+        device.device.close()
+
+    @pytest.mark.asyncio
+    async def test_cached_read_without_transaction(self, device):
+
+        (server, device) = device
+        await device.register_write(RegisterMap.CONFIG1, 0, 1, 2, 3)
+        assert await device.register_read(RegisterMap.GLOB1, 3) == b"\x81\x01\x02\x03"
+        assert server.client_stats()
+        assert sum(stats["transactions"] for stats in server.client_stats().values()) == 1
+        assert (device.cache.hits, device.cache.misses) == (1, 0)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("device", ["msgpack", "raw"], indirect=True)
+    async def test_cached_read_matches_uncached(self, device):
+
+        (server, device) = device
+        server.register_model.process_transaction([RegisterMap.GLOB1, 7, 8])
+        uncached = await device.register_read(RegisterMap.GLOB1, 2)
+        cached = await device.register_read(RegisterMap.GLOB1, 2)
+        assert device.cache.hits == 1
+        assert (type(uncached), type(cached)) == (bytes, bytes)
+        assert cached == uncached == b"\x81\x07\x08"
+
+    @pytest.mark.asyncio
+    async def test_read_response_bytes_from_any_backend(self, device):
+
+        (server, device) = device
+        device.device.read = AsyncMock(return_value=[0x81, 9])
+        device.device.write = AsyncMock(return_value=[0x01, 9])
+        assert await device.register_read(RegisterMap.GLOB1, 1) == b"\x81\x09"
+        assert await device.register_write(RegisterMap.GLOB1, 9) == b"\x01\x09"
+
+    @pytest.mark.asyncio
+    async def test_uncached_read_fills_cache(self, device):
+
+        (server, device) = device
+        server.register_model.process_transaction([RegisterMap.GLOB1, 7])
+        assert await device.register_read(RegisterMap.GLOB1, 1) == b"\x81\x07"
+        assert await device.register_read(RegisterMap.GLOB1, 1) == b"\x81\x07"
+        assert (device.cache.hits, device.cache.misses) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_flag_registers_always_read(self, device):
+
+        (server, device) = device
+        await device.register_write(RegisterMap.CONFIG1, 1)
+        addr = RegisterMap.FIFO_FULL1 - 128
+        await device.register_read(addr, 1)
+        assert await device.register_read(addr, 1) == bytes([addr | 0x80, 0])
+        assert device.cache.hits == 0
+
+    @pytest.mark.asyncio
+    async def test_batch_updates_cache(self, device):
+
+        (server, device) = device
+        await device.register_batch(
+            device.write_transaction(RegisterMap.CONFIG1, 1),
+            device.write_transaction(RegisterMap.SER_BIAS1 - 128, 9),
+        )
+        assert await device.register_read(RegisterMap.SER_BIAS1 - 128, 1) == b"\x83\x09"
+        assert device.cache.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_reconnect_invalidates_cache(self, device):
+
+        (server, device) = device
+        await device.register_write(RegisterMap.GLOB1, 1)
+        device.device.connections += 1
+        await device.register_read(RegisterMap.GLOB1, 1)
+        assert (device.cache.hits, device.cache.misses) == (0, 1)
+        assert device.cache_stats()["invalidations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_coalesced_writes(self, device):
+
+        (server, device) = device
+        device.coalescer = WriteCoalescer()
+        device.coalesce_window = 60.0
+        for (idx, addr) in enumerate(range(RegisterMap.FRM_LNGTH, RegisterMap.SER_BIAS)):
+            assert await device.register_write(addr, idx + 1) is None
+        assert not server.client_stats()
+
+        await device.register_write(RegisterMap.CONFIG1, 0)
+        assert await device.register_read(RegisterMap.FRM_LNGTH, 3) == b"\x85\x01\x02\x03"
+        assert server.register_model.registers(0)[RegisterMap.INT_TIME] == 2
+        assert device.coalesce_stats() == {
+            "writes": 4, "transactions": 2, "pending": 0, "saved": 2
+        }
+
+    @pytest.mark.asyncio
+    async def test_coalesced_writes_flushed_after_window(self, device):
+
+        (server, device) = device
+        device.coalescer = WriteCoalescer()
+        await device.register_write(RegisterMap.GLOB1, 1)
+        await device.register_write(RegisterMap.GLOB2, 2)
+        await asyncio.sleep(0.1)
+        assert server.register_model.registers(0)[RegisterMap.GLOB1:RegisterMap.GLOB_VAL1] == [1, 2]
+        assert device.coalescer.transactions == 1
+
+    @pytest.mark.asyncio
+    async def test_apply_config_writes_changes(self, device):
+
+        (server, device) = device
+        image = server.register_model.registers(0)
+        assert len(await device.apply_config(image)) == len(device.cache.values()) - 1
+
+        image[RegisterMap.FRM_LNGTH] = 10
+        image[RegisterMap.INT_TIME] = 20
+        image[RegisterMap.SER_BIAS1] = 30
+        assert await device.apply_config(image, verify=True) == [
+            RegisterMap.FRM_LNGTH, RegisterMap.INT_TIME, RegisterMap.SER_BIAS1
+        ]
+        assert server.register_model.registers(0) == image
+        assert await device.apply_config(image) == []
+
+    @pytest.mark.asyncio
+    async def test_apply_config_fields(self, device):
+
+        (server, device) = device
+        server.register_model.process_transaction([RegisterMap.SER_BIAS, 0x25])
+        assert await device.apply_config({"SER_BIAS_HIGH": 3, "PAGE_SELECT": 1}) == [
+            RegisterMap.SER_BIAS, RegisterMap.CONFIG1
+        ]
+        assert server.register_model.registers(0)[RegisterMap.SER_BIAS] == 0x35
+        assert server.register_model.registers(0)[RegisterMap.CONFIG1] & 1
+
+    @pytest.mark.asyncio
+    async def test_apply_config_invalid(self, device):
+
+        (server, device) = device
+        with pytest.raises(MercuryAsicDeviceError, match="Invalid register configuration"):
+            await device.apply_config({"FIFO_FULL1": 1})
+        with pytest.raises(MercuryAsicDeviceError, match="out of range"):
+            await device.apply_config({"GLOB1": 300})
+        assert server.register_model.registers(0)[RegisterMap.GLOB1] == 0
+
+    @pytest.mark.asyncio
+    async def test_batch_context(self, device):
+
+        (server, device) = device
+        async with device.batch() as batch:
+            batch.register_write(RegisterMap.CONFIG1, 0)
+            batch.register_write(RegisterMap.FRM_LNGTH, 1)
+            batch.register_write(RegisterMap.INT_TIME, 2)
+            config1 = batch.register_read(RegisterMap.CONFIG1, 1)
+            frm_lngth = batch.register_read(RegisterMap.FRM_LNGTH, 2)
+            assert len(batch) == 4
+            assert not config1.done()
+            assert not server.client_stats()
+
+        assert await config1 == b"\x80\x00"
+        assert await frm_lngth == b"\x85\x01\x02"
+        assert sum(stats["transactions"] for stats in server.client_stats().values()) == 4
+        assert device.cache.read(RegisterMap.INT_TIME, 1) == b"\x02"
+
+    @pytest.mark.asyncio
+    async def test_batch_flushes_coalesced_writes(self, device):
+
+        (server, device) = device
+        device.coalescer = WriteCoalescer()
+        device.coalesce_window = 60.0
+        await device.register_write(RegisterMap.GLOB1, 5)
+        async with device.batch() as batch:
+            glob1 = batch.register_read(RegisterMap.GLOB1, 1)
+        assert glob1.result() == b"\x81\x05"
+
+    @pytest.mark.asyncio
+    async def test_batch_discarded_on_exception(self, device):
+
+        (server, device) = device
+        with pytest.raises(RuntimeError):
+            async with device.batch() as batch:
+                batch.register_write(RegisterMap.GLOB1, 1)
+                glob1 = batch.register_read(RegisterMap.GLOB1, 1)
+                raise RuntimeError("sequence failed")
+        assert glob1.cancelled()
+        assert not server.client_stats()
+
+    @pytest.mark.asyncio
+    async def test_batch_transfer_error(self, device):
+
+        (server, device) = device
+        device.device.transfer_batch = AsyncMock(return_value=([], ["failed"]))
+        with pytest.raises(MercuryAsicDeviceError):
+            async with device.batch() as batch:
+                glob1 = batch.register_read(RegisterMap.GLOB1, 1)
+        assert glob1.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_write_read_group(self, device):
+
+        (server, device) = device
+        values = np.arange(60, dtype=np.uint8).reshape(10, 6)
+        await device.write_group("SER_CONTROL", values)
+        await device.write_group("SER_BIAS", np.arange(10, 20))
+        assert np.array_equal(await device.read_group("SER_CONTROL"), values)
+        assert np.array_equal(await device.read_group("SER_BIAS"), np.arange(10, 20))
+
+        registers = server.register_model.registers(0)
+        assert registers[RegisterMap.SER_CONTROL10F] == 59
+        assert registers[RegisterMap.SER_BIAS1:RegisterMap.SER_BIAS10 + 1] == list(range(10, 20))
+        assert registers[RegisterMap.CONFIG1] & 1 == 0
+
+    @pytest.mark.asyncio
+    async def test_write_group_invalid(self, device):
+
+        (server, device) = device
+        with pytest.raises(MercuryAsicDeviceError):
+            await device.write_group("SER_BIAS", np.zeros(5))
+        with pytest.raises(MercuryAsicDeviceError):
+            await device.read_group("UNKNOWN")
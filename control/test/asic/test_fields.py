@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from mercury.asic.fields import REGISTER_FIELDS, RegisterField
+from mercury.asic.registers import RegisterMap
+
+
+class TestRegisterFields():
+    """Test cases for the register field schema."""
+
+    @pytest.mark.parametrize("field, value, result",
+        [
+            ("PAGE_SELECT", 0b01010001, 1),
+            ("TEST_SR_SECTOR", 0b01001101, 19),
+            ("SER_BIAS_HIGH", 0b10000111, 8),
+            ("FIFO_FULL_18", 0b00000010, 1),
+        ]
+    )
+    def test_field_decode(self, field, value, result):
+
+        assert REGISTER_FIELDS[field].decode(value) == result
+
+    def test_field_encode(self):
+
+        field = RegisterField("TEST", 0, 2, 5)
+        assert field.encode(0b10000011, 0b11111) == 0b11111111
+        assert field.encode(0b11111111, 0) == 0b10000011
+
+    def test_every_register_has_full_width_field(self):
+
+        for register in RegisterMap:
+            field = REGISTER_FIELDS[register.name]
+            assert (field.addr, field.index, field.width) == (register.value, 0, 8)
+
+    def test_decode_register_image(self):
+
+        registers = [0] * REGISTER_FIELDS.size
+        registers[RegisterMap.CONFIG1] = 0b01010001
+        registers[RegisterMap.TEST_SR] = 3 << 2
+        registers[RegisterMap.SER_CLK_CHECK2] = 0b10000000
+
+        fields = REGISTER_FIELDS.decode(registers)
+        assert fields["CONFIG1"] == 0b01010001
+        assert fields["PAGE_SELECT"] == 1
+        assert fields["TEST_SR_SECTOR"] == 3
+        assert fields["SER_CLK_CHECK_16"] == 1
+        assert fields["SER_CLK_CHECK_15"] == 0
+
+    def test_decode_short_register_image(self):
+
+        fields = REGISTER_FIELDS.decode([0x1])
+        assert fields["PAGE_SELECT"] == 1
+        assert fields["SER_CLK_CHECK2"] == 0
+
+    def test_decode_multiple_images(self):
+
+        registers = np.zeros((4, REGISTER_FIELDS.size), dtype=np.uint8)
+        registers[:, RegisterMap.TEST_SR] = np.arange(4) << 2
+
+        fields = REGISTER_FIELDS.decode(registers)
+        assert fields["TEST_SR_SECTOR"].tolist() == [0, 1, 2, 3]
+
+    def test_encode_register_image(self):
+
+        image = REGISTER_FIELDS.encode(
+            {"CONFIG1": 0b01010000, "PAGE_SELECT": 1, "TEST_SR_SECTOR": 7, "SER_BIAS_LOW": 0xF}
+        )
+        assert image[RegisterMap.CONFIG1] == 0b01010001
+        assert image[RegisterMap.TEST_SR] == 7 << 2
+        assert image[RegisterMap.SER_BIAS] == 0x0F
+
+    def test_encode_updates_existing_image(self):
+
+        registers = [0xFF] * REGISTER_FIELDS.size
+        image = REGISTER_FIELDS.encode({"PAGE_SELECT": 0}, registers)
+        assert image[RegisterMap.CONFIG1] == 0xFE
+        assert registers[RegisterMap.CONFIG1] == 0xFF
+
+    def test_encode_decode_round_trip(self):
+
+        rng = np.random.default_rng(0)
+        registers = rng.integers(0, 256, REGISTER_FIELDS.size, dtype=np.uint8)
+        registers[[addr for addr in range(REGISTER_FIELDS.size) if addr not in set(RegisterMap)]] = 0
+        fields = REGISTER_FIELDS.decode(registers)
+        assert np.array_equal(REGISTER_FIELDS.encode(fields), registers)
+
+    @pytest.mark.parametrize("name, value", [
+        ("GLOB1", 300),
+        ("GLOB1", -1),
+        ("PAGE_SELECT", 2),
+        ("SER_BIAS_HIGH", 0x10),
+    ])
+    def test_encode_value_out_of_range(self, name, value):
+
+        with pytest.raises(ValueError, match=f"register field {name} out of range"):
+            REGISTER_FIELDS.encode({name: value})
+
+    def test_encode_unknown_field(self):
+
+        with pytest.raises(KeyError):
+            REGISTER_FIELDS.encode({"NOT_A_FIELD": 1})
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from mercury.asic.groups import REGISTER_GROUPS, RegisterGroup
+from mercury.asic.registers import RegisterMap
+
+
+class TestRegisterGroups():
+    """Test cases for the register groups."""
+
+    @pytest.mark.parametrize("name, last, page, offset, shape",
+        [
+            ("SEG_CONTROL_SER", RegisterMap.SEG_CONTROL10_SER, 0, 26, (10,)),
+            ("SEG_CONTROL_EN", RegisterMap.SEG_CONTROL10_EN, 0, 36, (10,)),
+            ("RAMP_CONTROL", RegisterMap.RAMP_CONTROL20, 0, 46, (10, 2)),
+            ("SER_CONTROL", RegisterMap.SER_CONTROL10F, 0, 66, (10, 6)),
+            ("SER_BIAS", RegisterMap.SER_BIAS10, 1, 3, (10,)),
+        ]
+    )
+    def test_groups(self, name, last, page, offset, shape):
+
+        group = REGISTER_GROUPS[name]
+        assert group.addr + len(group) - 1 == last
+        assert (group.page, group.offset, group.shape) == (page, offset, shape)
+
+    def test_pack_unpack(self):
+
+        group = REGISTER_GROUPS["SER_CONTROL"]
+        values = np.arange(60, dtype=np.uint8).reshape(10, 6)
+        data = group.pack(values)
+        assert data == bytes(range(60))
+        assert np.array_equal(group.unpack(data), values)
+        assert group.unpack(data)[2, 1] == RegisterMap.SER_CONTROL3B - RegisterMap.SER_CONTROL1A
+
+    def test_pack_broadcast(self):
+
+        assert REGISTER_GROUPS["RAMP_CONTROL"].pack(7) == bytes([7] * 20)
+        assert REGISTER_GROUPS["RAMP_CONTROL"].pack([1, 2]) == bytes([1, 2] * 10)
+
+    @pytest.mark.parametrize("values", [np.zeros(9), [0] * 9 + [256], -1])
+    def test_pack_invalid(self, values):
+
+        with pytest.raises(ValueError):
+            REGISTER_GROUPS["SER_BIAS"].pack(values)
+
+    @pytest.mark.parametrize("addr, num_segments",
+        [
+            (RegisterMap.SER_CONTROL10A, 2),
+            (RegisterMap.GLOB1, 1),
+            (RegisterMap.CHIP_BIAS, 2),
+        ]
+    )
+    def test_group_not_burst_accessible(self, addr, num_segments):
+
+        with pytest.raises(ValueError):
+            RegisterGroup("TEST", addr, num_segments, 6)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from mercury.asic.patterns import (
+    SR_CAL_SIZE, SR_TEST_SIZE, cal_pattern_mask, pack_cal_pattern, pack_test_pattern,
+    unpack_cal_pattern, unpack_test_pattern
+)
+from mercury.asic_emulator.register_model import MercuryAsicRegisterModel
+
+
+class TestShiftRegisterPatterns():
+    """Test cases for the shift register pattern packing functions."""
+
+    def test_sizes_match_register_model(self):
+
+        assert SR_CAL_SIZE == MercuryAsicRegisterModel.REGISTER_SR_CAL_SIZE
+        assert SR_TEST_SIZE == MercuryAsicRegisterModel.REGISTER_SR_TEST_SIZE
+
+    def test_cal_pattern_layout(self):
+
+        columns = np.zeros(80, dtype=bool)
+        rows = np.zeros(80, dtype=bool)
+        columns[0] = rows[79] = True
+        data = pack_cal_pattern((columns, rows))
+        assert data == b"\x80" + bytes(18) + b"\x01"
+
+        (unpacked_columns, unpacked_rows) = unpack_cal_pattern(data)
+        assert np.array_equal(unpacked_columns, columns) and np.array_equal(unpacked_rows, rows)
+
+    def test_cal_pattern_mask(self):
+
+        mask = cal_pattern_mask(np.arange(80) % 2 == 0, np.arange(80) < 3)
+        assert mask.sum() == 120
+        assert pack_cal_pattern(mask) == bytes([0xAA] * 10) + b"\xe0" + bytes(9)
+
+        mask[0, 0] = False
+        with pytest.raises(ValueError, match="whole rows"):
+            pack_cal_pattern(mask)
+
+    def test_test_pattern_layout(self):
+
+        pattern = np.zeros((80, 80), dtype=np.uint16)
+        pattern[0, 0] = 0xABC
+        pattern[1, 0] = 0x123
+        pattern[0, 79] = 0xFFF
+        sectors = pack_test_pattern(pattern)
+
+        assert sectors.shape == (20, 480)
+        assert sectors[0, :3].tolist() == [0xAB, 0xC1, 0x23]
+        assert sectors[19, 360:362].tolist() == [0xFF, 0xF0]
+        assert np.array_equal(unpack_test_pattern(sectors), pattern)
+
+    def test_test_pattern_round_trip(self):
+
+        pattern = np.random.default_rng(0).integers(0, 4096, (80, 80), dtype=np.uint16)
+        bits = (pattern[..., np.newaxis] >> np.arange(11, -1, -1)) & 1
+        sectors = pack_test_pattern(pattern)
+        assert np.array_equal(pack_test_pattern(bits.astype(bool)), sectors)
+        assert np.array_equal(pack_test_pattern(sectors), sectors)
+        assert np.array_equal(unpack_test_pattern(sectors), pattern)
+
+    @pytest.mark.parametrize("pattern", [np.zeros((80, 81)), np.full((80, 80), 4096)])
+    def test_invalid_test_pattern(self, pattern):
+
+        with pytest.raises(ValueError):
+            pack_test_pattern(pattern)
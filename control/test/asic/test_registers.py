@@ -0,0 +1,53 @@
+import pytest
+
+from mercury.asic.registers import REGISTER_METADATA, RegisterMap
+
+
+class TestRegisterMetadata():
+    """Test cases for the register map metadata."""
+
+    def test_size(self):
+
+        assert REGISTER_METADATA.size == RegisterMap.SER_CLK_CHECK2 + 1
+        assert RegisterMap.size() == REGISTER_METADATA.size
+
+    def test_names_and_addresses(self):
+
+        for register in RegisterMap:
+            assert REGISTER_METADATA.names[register] == register.name
+            assert REGISTER_METADATA.addrs[register.name] == register
+        assert REGISTER_METADATA.names[128] is None
+        assert REGISTER_METADATA.name(RegisterMap.TEST_SR) == "TEST_SR"
+        assert REGISTER_METADATA.name(200) == "200"
+
+    @pytest.mark.parametrize("addr, page, offset",
+        [
+            (RegisterMap.CONFIG1, None, 0),
+            (RegisterMap.GLOB2, None, 2),
+            (RegisterMap.GLOB_VAL1, 0, 3),
+            (RegisterMap.SR_TEST, 0, 127),
+            (RegisterMap.CHIP_BIAS, 1, None),
+            (RegisterMap.SER_BIAS1, 1, 3),
+            (RegisterMap.SER_CLK_CHECK2, 1, 17),
+        ]
+    )
+    def test_pages_and_offsets(self, addr, page, offset):
+
+        assert (REGISTER_METADATA.pages[addr], REGISTER_METADATA.offsets[addr]) == (page, offset)
+
+    def test_page_addrs(self):
+
+        for (page, page_addrs) in enumerate(REGISTER_METADATA.page_addrs):
+            for (raw_addr, addr) in enumerate(page_addrs):
+                assert REGISTER_METADATA.offsets[addr] == raw_addr
+                assert REGISTER_METADATA.pages[addr] in (None, page)
+
+    def test_register_flags(self):
+
+        assert sum(REGISTER_METADATA.is_register) == len(RegisterMap)
+        assert [
+            addr for (addr, flag) in enumerate(REGISTER_METADATA.is_read_only) if flag
+        ] == list(range(RegisterMap.FIFO_FULL1, RegisterMap.SER_CLK_CHECK2 + 1))
+        assert [
+            addr for (addr, flag) in enumerate(REGISTER_METADATA.is_shift_register) if flag
+        ] == [RegisterMap.SR_CAL, RegisterMap.SR_TEST]
@@ -0,0 +1,118 @@
+import asyncio
+import ctypes
+import threading
+
+import numpy as np
+import pytest
+import pytest_asyncio
+
+from mercury.asic.device import MercuryAsicDevice
+from mercury.asic.registers import RegisterMap
+from mercury.asic.spi import (
+    LoopbackTransport, MercuryAsicSpiClient, MercuryAsicSpiError, SpiIocTransfer, spi_ioc_message
+)
+
+
+class GatedTransport(LoopbackTransport):
+    """Loopback transport holding each transfer until a gate is opened."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.gate = threading.Event()
+
+    def transfer(self, transactions):
+        self.gate.wait()
+        return super().transfer(transactions)
+
+
+@pytest_asyncio.fixture
+async def client():
+    """Test fixture providing an SPI client with a loopback transport."""
+    client = MercuryAsicSpiClient(LoopbackTransport())
+    yield client
+    client.close()
+
+
+class TestMercuryAsicSpiClient():
+    """Test cases for the MercuryAsicSpiClient class."""
+
+    def test_ioctl_request_codes(self):
+
+        assert ctypes.sizeof(SpiIocTransfer) == 32
+        assert spi_ioc_message(1) == 0x40206B00
+        assert spi_ioc_message(3) == 0x40606B00
+        with pytest.raises(ValueError):
+            spi_ioc_message(1000)
+
+    @pytest.mark.asyncio
+    async def test_read_write(self, client):
+
+        assert await client.write(bytearray([RegisterMap.GLOB1, 1, 2])) == b"\x01\x01\x02"
+        assert await client.read(bytearray([RegisterMap.GLOB1, 0, 0])) == b"\x81\x01\x02"
+        assert client.transport.register_model.registers()[RegisterMap.GLOB2] == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_transaction(self, client):
+
+        with pytest.raises(MercuryAsicSpiError, match="Transaction failed"):
+            await client.transfer(bytearray())
+        with pytest.raises(ValueError):
+            await client.read(bytearray([RegisterMap.GLOB1, 0]), asic=1)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_combined(self):
+
+        client = MercuryAsicSpiClient(GatedTransport())
+        requests = asyncio.gather(*(
+            client.write(bytearray([RegisterMap.GLOB1, idx])) for idx in range(10)
+        ))
+        await asyncio.sleep(0.05)
+        client.transport.gate.set()
+        await requests
+        client.close()
+
+        assert client.transactions == 10
+        assert client.transfers <= 2
+
+    @pytest.mark.asyncio
+    async def test_large_batch_split(self):
+
+        client = MercuryAsicSpiClient(LoopbackTransport(max_transfers=8))
+        transactions = [bytearray([RegisterMap.GLOB1, idx]) for idx in range(20)]
+        (responses, status) = await client.transfer_batch(transactions)
+        client.close()
+
+        assert responses == [bytes(transaction) for transaction in transactions]
+        assert status == [None] * 20
+        assert client.transfers == 3
+
+    @pytest.mark.asyncio
+    async def test_device_with_loopback(self):
+
+        transport = LoopbackTransport()
+        device = MercuryAsicDevice(spi_transport=transport, cache_registers=True)
+        await device.apply_config({"FRM_LNGTH": 10, "SER_BIAS1": 20}, verify=True)
+        device.device.close()
+
+        registers = transport.register_model.registers()
+        assert (registers[RegisterMap.FRM_LNGTH], registers[RegisterMap.SER_BIAS1]) == (10, 20)
+
+    @pytest.mark.asyncio
+    async def test_device_shift_register_patterns(self):
+
+        transport = LoopbackTransport()
+        device = MercuryAsicDevice(spi_transport=transport)
+        await device.register_write(RegisterMap.TEST_SR, 0b10000011)
+        await device.register_write(RegisterMap.CONFIG1, 1)
+
+        pattern = np.random.default_rng(0).integers(0, 4096, (80, 80), dtype=np.uint16)
+        await device.write_test_pattern(pattern)
+        assert np.array_equal(await device.read_test_pattern(), pattern)
+
+        columns = np.arange(80) < 10
+        await device.write_cal_pattern((columns, ~columns))
+        assert np.array_equal((await device.read_cal_pattern())[0], columns)
+        device.device.close()
+
+        registers = transport.register_model.registers()
+        assert (registers[RegisterMap.CONFIG1], registers[RegisterMap.TEST_SR]) == (1, 0b10000011)
@@ -0,0 +1,64 @@
+import pytest
+
+from mercury.asic_emulator.client_stats import ClientStatsTable, LatencyHistogram
+
+
+class TestLatencyHistogram():
+    """Test cases for the LatencyHistogram class."""
+
+    @pytest.mark.parametrize("value", [0, 1, 7, 8, 9, 100, 12345, 10**6, 2**31 + 1])
+    def test_bucket_bounds(self, value):
+
+        histogram = LatencyHistogram()
+        index = histogram._index(value)
+        assert histogram.bucket_value(index) <= value < histogram.bucket_value(index + 1)
+
+    def test_bucket_precision(self):
+
+        histogram = LatencyHistogram(sub_bucket_bits=3)
+        index = histogram._index(10**6)
+        width = histogram.bucket_value(index + 1) - histogram.bucket_value(index)
+        assert width / 10**6 <= 1 / 8
+
+    def test_percentiles(self):
+
+        histogram = LatencyHistogram()
+        for value in range(1000, 101000, 1000):
+            histogram.record(value)
+
+        stats = histogram.stats()
+        assert stats["count"] == 100
+        assert (stats["min_us"], stats["max_us"]) == (1.0, 100.0)
+        assert stats["mean_us"] == pytest.approx(50.5)
+        assert stats["p50_us"] == pytest.approx(50, rel=1 / 8)
+        assert stats["p99_us"] == pytest.approx(99, rel=1 / 8)
+        assert sum(count for (_, count) in stats["buckets"]) == 100
+
+    def test_overflow_and_empty(self):
+
+        histogram = LatencyHistogram(max_value=1000)
+        assert histogram.stats()["p50_us"] is None
+        histogram.record(10**9)
+        assert histogram.counts[-1] == 1
+        assert histogram.percentile(100) == 10**9
+
+
+class TestClientStatsTable():
+    """Test cases for the ClientStatsTable class."""
+
+    def test_least_recent_client_evicted(self):
+
+        table = ClientStatsTable(max_clients=2)
+        table.get(b"a").record_transaction(True)
+        table.get(b"b").record_transaction(False, error=True)
+        table.get(b"a")
+        table.get(b"c")
+
+        stats = table.stats()
+        assert list(stats) == ["a", "c"]
+        assert (stats["a"]["reads"], stats["a"]["transactions"]) == (1, 1)
+
+    def test_client_names(self):
+
+        assert ClientStatsTable.client_name(b"1234-abcd") == "1234-abcd"
+        assert ClientStatsTable.client_name(b"\x00\x80\x00\x41\xa7") == "0x00800041a7"
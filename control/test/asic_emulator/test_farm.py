@@ -0,0 +1,190 @@
+import asyncio
+import itertools
+import os
+import tempfile
+
+import pytest
+import pytest_asyncio
+
+from mercury.asic.registers import RegisterMap
+from mercury.asic_emulator import protocol
+from mercury.asic_emulator.client import MercuryAsicClient
+from mercury.asic_emulator.client_stats import ClientStats
+from mercury.asic_emulator.farm import EmulatorFarm, EmulatorFarmRequest
+
+endpoint_ids = itertools.count()
+
+
+@pytest_asyncio.fixture(params=["msgpack", "raw"])
+async def farm(request):
+    """Test fixture providing an emulator farm of five ASICs in two workers, and a client."""
+    endpoint_id = f"{os.getpid()}_{next(endpoint_ids)}"
+    endpoint = f"inproc://test_farm_{endpoint_id}"
+    worker_endpoint = "ipc://" + os.path.join(
+        tempfile.gettempdir(), f"test_farm_{endpoint_id}_{{}}"
+    )
+    farm = EmulatorFarm(
+        endpoint, asyncio.get_running_loop(), 2, 5, worker_endpoint=worker_endpoint
+    )
+    client = MercuryAsicClient(endpoint, request.param)
+
+    yield (farm, client)
+
+    client.close()
+    farm.shutdown()
+
+
+async def read_register(client, addr, asic):
+    """Read a single register from an ASIC in the farm."""
+    response = await asyncio.wait_for(client.read([addr, 0], asic), 10.0)
+    return response[1]
+
+
+class TestEmulatorFarm():
+    """Test cases for the EmulatorFarm class."""
+
+    def test_invalid_num_workers(self):
+
+        with pytest.raises(ValueError):
+            EmulatorFarm("inproc://test_farm_invalid", None, 3, 2)
+
+    @pytest.mark.asyncio
+    async def test_shards(self, farm):
+
+        (farm, _) = farm
+        assert [stats["asics"] for stats in farm.worker_stats()] == [[0, 2], [3, 4]]
+        assert all(stats["alive"] for stats in farm.worker_stats())
+
+    @pytest.mark.asyncio
+    async def test_addressed_transactions(self, farm):
+
+        (farm, client) = farm
+        for asic in range(5):
+            await asyncio.wait_for(client.write([RegisterMap.GLOB1, asic + 1], asic), 10.0)
+        for asic in range(5):
+            assert await read_register(client, RegisterMap.GLOB1, asic) == asic + 1
+
+        stats = farm.worker_stats()
+        assert stats[0]["requests"] >= 6
+        assert stats[1]["requests"] == 4
+        assert [worker["pending"] for worker in stats] == [0, 0]
+
+    @pytest.mark.asyncio
+    async def test_default_asic(self, farm):
+
+        (_, client) = farm
+        await asyncio.wait_for(client.write([RegisterMap.GLOB2, 7]), 10.0)
+        assert await read_register(client, RegisterMap.GLOB2, 0) == 7
+        assert await read_register(client, RegisterMap.GLOB2, 3) == 0
+
+    @pytest.mark.asyncio
+    async def test_broadcast(self, farm):
+
+        (farm, client) = farm
+        await asyncio.wait_for(client.write([RegisterMap.GLOB2, 9], protocol.ASIC_BROADCAST), 10.0)
+        for asic in range(5):
+            assert await read_register(client, RegisterMap.GLOB2, asic) == 9
+        assert not farm._requests
+
+    @pytest.mark.asyncio
+    async def test_out_of_range_asic(self, farm):
+
+        (_, client) = farm
+        response = await asyncio.wait_for(client.write([RegisterMap.GLOB2, 9], 5), 10.0)
+        assert response[-1] == 9
+        assert await read_register(client, RegisterMap.GLOB2, 0) == 0
+
+    @pytest.mark.asyncio
+    async def test_batch(self, farm):
+
+        (_, client) = farm
+        transactions = [
+            client.write_transaction(RegisterMap.GLOB1, 4),
+            client.read_transaction(RegisterMap.GLOB1, 1),
+        ]
+        (responses, status) = await asyncio.wait_for(client.transfer_batch(transactions, 4), 10.0)
+        assert status == [None, None]
+        assert responses[1][1] == 4
+        assert await read_register(client, RegisterMap.GLOB1, 3) == 0
+
+    @pytest.mark.asyncio
+    async def test_broadcast_batch_error(self, farm):
+
+        (farm, client) = farm
+        transactions = [client.write_transaction(RegisterMap.GLOB1, 6), bytearray()]
+        (_, status) = await asyncio.wait_for(
+            client.transfer_batch(transactions, protocol.ASIC_BROADCAST), 10.0
+        )
+        assert status[0] is None
+        assert status[1] is not None
+        assert not farm._requests
+
+    @pytest.mark.asyncio
+    async def test_unknown_route_token_discarded(self, farm):
+
+        (farm, client) = farm
+        worker = farm.workers[1]
+        recv_multipart = worker.socket.recv_multipart
+        unknown = [[client.identity, b"unknown", b"", b"\x00"]]
+
+        async def recv_unknown_first():
+            return unknown.pop() if unknown else await recv_multipart()
+
+        worker.socket.recv_multipart = recv_unknown_first
+        farm.worker_tasks[1].cancel()
+        farm.worker_tasks[1] = asyncio.ensure_future(farm._run_worker_responses(worker))
+
+        await asyncio.wait_for(client.write([RegisterMap.GLOB1, 5], 4), 10.0)
+        assert await read_register(client, RegisterMap.GLOB1, 4) == 5
+        assert not unknown
+
+    def test_combine_batch_responses(self):
+
+        request = EmulatorFarmRequest(ClientStats(), 0, [False, True], True, 2)
+        request.responses = {
+            1: protocol.pack_batch_response([b"\x01", b"\x02"], [None, "ValueError: bad"]),
+            0: protocol.pack_batch_response([b"\x01", b"\x03"], ["IndexError: bad", None]),
+        }
+        (responses, status) = protocol.unpack_batch_response(
+            EmulatorFarm._combine_responses(request)
+        )
+        assert responses == [b"\x01", b"\x02"]
+        assert status == ["IndexError: bad", "ValueError: bad"]
+
+        request.responses[0] = protocol.pack_batch_error("Unsupported batch message version")
+        assert EmulatorFarm._combine_responses(request) == request.responses[0]
+
+        request.responses[1] = protocol.BUSY_RESPONSE
+        assert protocol.is_busy(EmulatorFarm._combine_responses(request))
+
+    @pytest.mark.asyncio
+    async def test_client_stats(self, farm):
+
+        (farm, client) = farm
+        await asyncio.wait_for(client.write([RegisterMap.GLOB1, 1], 4), 10.0)
+        await asyncio.wait_for(client.write([RegisterMap.GLOB2, 2], protocol.ASIC_BROADCAST), 10.0)
+        await read_register(client, RegisterMap.GLOB1, 4)
+        await asyncio.wait_for(
+            client.transfer_batch([client.read_transaction(0, 1), bytearray()], 1), 10.0
+        )
+
+        stats = farm.client_stats()[client.identity.decode()]
+        assert (stats["transactions"], stats["reads"], stats["writes"]) == (5, 2, 3)
+        assert stats["errors"] == 1
+        assert stats["bytes_received"] > 0 and stats["bytes_sent"] > 0
+        assert stats["latency"]["count"] == stats["messages"]
+
+    @pytest.mark.asyncio
+    async def test_pipelined_transactions(self, farm):
+
+        (farm, client) = farm
+        await asyncio.wait_for(
+            asyncio.gather(
+                *(client.write([RegisterMap.GLOB1, 10 + asic], asic) for asic in range(5))
+            ),
+            10.0,
+        )
+        values = await asyncio.gather(
+            *(read_register(client, RegisterMap.GLOB1, asic) for asic in (4, 0, 3, 1, 2))
+        )
+        assert values == [14, 10, 13, 11, 12]
@@ -0,0 +1,140 @@
+import logging
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+
+from mercury.asic_emulator.multi_register_model import MercuryMultiAsicRegisterModel
+from mercury.asic_emulator.register_model import MercuryAsicRegisterModel, RegisterMap
+
+READ = MercuryAsicRegisterModel.REGISTER_READ_TRANSACTION
+BROADCAST = MercuryMultiAsicRegisterModel.ASIC_BROADCAST
+
+
+@pytest.fixture
+def multi_model():
+    """Test fixture for MercuryMultiAsicRegisterModel tests."""
+    return MercuryMultiAsicRegisterModel(Mock(), False, num_asics=8)
+
+
+class TestMultiAsicRegisterModel():
+    """Test cases for the MercuryMultiAsicRegisterModel class."""
+
+    def test_default_values(self, multi_model):
+
+        single_model = MercuryAsicRegisterModel(Mock(), False)
+        assert multi_model.register_array.shape == (8, RegisterMap.size())
+        for asic in range(8):
+            assert multi_model.registers(asic) == single_model.registers()
+
+    @pytest.mark.parametrize("num_asics", [0, BROADCAST])
+    def test_invalid_num_asics(self, num_asics):
+
+        with pytest.raises(ValueError):
+            MercuryMultiAsicRegisterModel(Mock(), False, num_asics)
+
+    def test_addressed_transactions(self, multi_model):
+
+        multi_model.process_transaction([RegisterMap.GLOB1, 0x1, 0x2], asic=3)
+
+        glob = slice(RegisterMap.GLOB1, RegisterMap.GLOB2 + 1)
+        assert multi_model.register_array[3, glob].tolist() == [1, 2]
+        assert not multi_model.register_array[:3, RegisterMap.GLOB1].any()
+        response = multi_model.process_transaction([RegisterMap.GLOB1 | READ, 0, 0], asic=3)
+        assert response == [RegisterMap.GLOB1 | READ, 1, 2]
+
+    def test_register_bytes(self, multi_model):
+
+        multi_model.process_transaction([RegisterMap.GLOB1, 0x7], asic=2)
+        assert multi_model.register_bytes(2) == bytes(multi_model.registers(2))
+        assert multi_model.register_bytes(2)[RegisterMap.GLOB1] == 0x7
+        assert multi_model.register_bytes()[RegisterMap.GLOB1] == 0
+
+    def test_per_asic_page_select(self, multi_model):
+
+        multi_model.process_transaction([RegisterMap.CONFIG1, 0x51], asic=2)
+        assert multi_model.page_selects().tolist() == [0, 0, 1, 0, 0, 0, 0, 0]
+
+        multi_model.process_transaction([RegisterMap.TEST_SR, 0x1], asic=2)
+        assert multi_model.register_array[2, RegisterMap.TEST_SR + 128] == 0x1
+
+    def test_invalid_asic_index(self, multi_model, caplog):
+
+        multi_model.process_transaction([RegisterMap.GLOB1, 0x1], asic=8)
+        assert "ASIC index 8 out of range" in caplog.text
+
+    def test_broadcast_write(self, multi_model):
+
+        vals = list(range(1, 21))
+        multi_model.process_transaction([RegisterMap.RAMP_CONTROL1] + vals, asic=BROADCAST)
+
+        ramp = slice(RegisterMap.RAMP_CONTROL1, RegisterMap.RAMP_CONTROL20 + 1)
+        span = multi_model.register_array[:, ramp]
+        assert np.array_equal(span, np.tile(vals, (8, 1)))
+
+    def test_broadcast_page_and_sector_select(self, multi_model):
+
+        multi_model.process_transaction([RegisterMap.TEST_SR, 5 << 2], asic=BROADCAST)
+        multi_model.process_transaction([RegisterMap.CONFIG1, 0x51, 0, 0, 0xAA], asic=BROADCAST)
+
+        assert multi_model.page_selects().tolist() == [1] * 8
+        assert multi_model.test_sr_sectors().tolist() == [5] * 8
+        assert multi_model.register_array[:, RegisterMap.CHIP_BIAS + 1].tolist() == [0xAA] * 8
+
+    def test_broadcast_with_mixed_page_select(self, multi_model):
+
+        multi_model.process_transaction([RegisterMap.CONFIG1, 0x51], asic=0)
+        multi_model.process_transaction([RegisterMap.SER_BIAS, 0x12], asic=BROADCAST)
+
+        assert multi_model.register_array[0, RegisterMap.SER_BIAS + 128] == 0x12
+        assert multi_model.register_array[1:, RegisterMap.SER_BIAS].tolist() == [0x12] * 7
+
+    def test_broadcast_shift_register_write(self, multi_model):
+
+        multi_model.process_transaction([RegisterMap.SR_CAL, 1, 2, 3], asic=BROADCAST)
+        for asic in range(8):
+            response = multi_model.process_transaction([RegisterMap.SR_CAL | READ, 0, 0, 0], asic)
+            assert response[1:] == [1, 2, 3]
+
+    def test_broadcast_read_rejected(self, multi_model, caplog):
+
+        transaction = [RegisterMap.GLOB1 | READ, 0]
+        assert multi_model.process_transaction(transaction, asic=BROADCAST) == transaction
+        assert "cannot be broadcast" in caplog.text
+
+    def test_broadcast_notifies_subscribers(self, multi_model):
+
+        subscriber = Mock()
+        multi_model.asics[4].subscribe(subscriber, RegisterMap.GLOB1, 2)
+        multi_model.process_transaction([RegisterMap.GLOB1, 0x0, 0x1], asic=BROADCAST)
+        subscriber.assert_called_once_with((RegisterMap.GLOB2,))
+
+    def test_broadcast_with_mixed_page_select_error(self, multi_model):
+
+        multi_model.process_transaction([RegisterMap.CONFIG1, 0x51], asic=0)
+        multi_model.asics[2].process_transaction = Mock(side_effect=IndexError("bad"))
+
+        with pytest.raises(ValueError, match=r"ASICs \[2\]: IndexError: bad"):
+            multi_model.process_transaction(
+                [RegisterMap.GLOB1, 0x3], asic=BROADCAST, raise_errors=True
+            )
+        assert multi_model.register_array[:, RegisterMap.GLOB1].tolist() == [3, 3, 0, 3, 3, 3, 3, 3]
+
+    def test_broadcast_logs_register_writes(self, caplog):
+
+        multi_model = MercuryMultiAsicRegisterModel(Mock(), True, num_asics=3)
+        with caplog.at_level(logging.DEBUG):
+            multi_model.process_transaction([RegisterMap.GLOB1, 0x1, 0x2], asic=BROADCAST)
+
+        assert caplog.text.count("GLOB1 register: 0x01") == 3
+        assert caplog.text.count("GLOB2 register: 0x02") == 3
+
+    def test_broadcast_callback_only_on_change(self, multi_model):
+
+        multi_model.process_transaction([RegisterMap.CONFIG1, 0x40], asic=3)
+        callbacks = [Mock() for _ in multi_model.asics]
+        for (model, callback) in zip(multi_model.asics, callbacks):
+            model._callbacks[RegisterMap.CONFIG1] = callback
+
+        multi_model.process_transaction([RegisterMap.CONFIG1, 0x40], asic=BROADCAST)
+        assert [callback.call_count for callback in callbacks] == [1, 1, 1, 0, 1, 1, 1, 1]
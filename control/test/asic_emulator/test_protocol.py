@@ -0,0 +1,110 @@
+import msgpack
+import pytest
+
+from mercury.asic_emulator import protocol
+
+
+class TestProtocol():
+    """Test cases for the emulator message protocol."""
+
+    @pytest.mark.parametrize("asic", [None, 0, 3, protocol.ASIC_BROADCAST])
+    def test_transaction_round_trip(self, asic):
+
+        data = protocol.pack_transaction([1, 2, 3], asic)
+        assert protocol.unpack_transaction(data) == ([1, 2, 3], asic)
+
+    def test_malformed_addressed_transaction(self):
+
+        with pytest.raises(protocol.ProtocolError):
+            protocol.unpack_transaction(msgpack.packb({protocol.KEY_ASIC: 1}))
+
+    def test_batch_round_trip(self):
+
+        transactions = [bytearray([1, 2]), bytearray([0x81, 0])]
+        message = protocol.decode_message(protocol.pack_batch(transactions, 2))
+
+        assert protocol.is_batch(message)
+        assert protocol.parse_batch(message) == ([b"\x01\x02", b"\x81\x00"], 2)
+
+    def test_plain_message_is_not_batch(self):
+
+        assert not protocol.is_batch(protocol.decode_message(protocol.pack_transaction([1, 2])))
+        assert not protocol.is_batch(protocol.decode_message(protocol.pack_transaction([1], 1)))
+
+    @pytest.mark.parametrize("message", [
+        {protocol.KEY_VERSION: protocol.BATCH_VERSION + 1, protocol.KEY_BATCH: []},
+        {protocol.KEY_BATCH: []},
+        {protocol.KEY_VERSION: protocol.BATCH_VERSION, protocol.KEY_BATCH: 1},
+        {protocol.KEY_VERSION: protocol.BATCH_VERSION, protocol.KEY_BATCH: [], "asic": "x"},
+    ])
+    def test_invalid_batch(self, message):
+
+        with pytest.raises(protocol.ProtocolError):
+            protocol.parse_batch(message)
+
+    def test_batch_response_round_trip(self):
+
+        data = protocol.pack_batch_response([b"\x01\x02", b"\x02"], [None, "IndexError: bad"])
+        assert protocol.unpack_batch_response(data) == (
+            [b"\x01\x02", b"\x02"], [None, "IndexError: bad"]
+        )
+
+    def test_batch_error_response(self):
+
+        with pytest.raises(protocol.ProtocolError, match="unsupported"):
+            protocol.unpack_batch_response(protocol.pack_batch_error("unsupported"))
+
+    @pytest.mark.parametrize("formats, expected", [
+        ([protocol.FORMAT_RAW], protocol.FORMAT_RAW),
+        (["json", protocol.FORMAT_MSGPACK], protocol.FORMAT_MSGPACK),
+        (["json"], protocol.FORMAT_MSGPACK),
+    ])
+    def test_hello_negotiation(self, formats, expected):
+
+        message = protocol.decode_message(protocol.pack_hello(formats))
+        assert protocol.is_hello(message)
+        wire_format = protocol.negotiate_format(message)
+        assert protocol.unpack_hello_response(protocol.pack_hello_response(wire_format)) == expected
+
+    def test_hello_response_from_legacy_server(self):
+
+        assert protocol.unpack_hello_response(protocol.pack_transaction([])) == "msgpack"
+
+    @pytest.mark.parametrize("asic", [None, 0, 7])
+    def test_raw_header_round_trip(self, asic):
+
+        data = protocol.pack_raw_header(asic) + b"\x01\x02"
+        assert protocol.is_raw(data)
+        (parsed_asic, header_len) = protocol.parse_raw_header(data)
+        assert parsed_asic == asic
+        assert data[header_len:] == b"\x01\x02"
+
+    @pytest.mark.parametrize("asic", [None, 0])
+    def test_msgpack_messages_are_not_raw(self, asic):
+
+        assert not protocol.is_raw(protocol.pack_transaction([1, 2], asic))
+        assert not protocol.is_raw(protocol.pack_transaction(b"\x01\x02", asic))
+        assert not protocol.is_raw(protocol.pack_batch([b"\x01"], asic))
+        assert not protocol.is_raw(protocol.pack_hello([protocol.FORMAT_RAW]))
+
+    @pytest.mark.parametrize("data", [b"", b"\x02", b"\x90"])
+    def test_invalid_raw_header(self, data):
+
+        with pytest.raises(protocol.ProtocolError):
+            protocol.parse_raw_header(data)
+
+    def test_change_event_round_trip(self):
+
+        runs = [(3, b"\x01\x02"), (130, b"\xff")]
+        assert protocol.unpack_change_event(protocol.pack_change_event(42, runs)) == (42, runs)
+
+    @pytest.mark.parametrize("data", [b"\x01", protocol.CHANGE_HEADER.pack(1) + b"\x03\x02\x00"])
+    def test_invalid_change_event(self, data):
+
+        with pytest.raises(protocol.ProtocolError):
+            protocol.unpack_change_event(data)
+
+    def test_change_topics_filter_by_asic(self):
+
+        assert protocol.change_topic() == protocol.change_topic(0)
+        assert not protocol.change_topic(2).startswith(protocol.change_topic(1))
@@ -1,10 +1,13 @@
 import logging
+import random
 
 import pytest
 from unittest.mock import Mock
 
 from mercury.asic_emulator.register_model import MercuryAsicRegisterModel, RegisterMap
 
+RegisterModel = MercuryAsicRegisterModel
+
 @pytest.fixture(scope="class")
 def test_register_model():
     """Test fixture for MercuryAsicRegisterModel tests"""
@@ -68,6 +71,22 @@ class TestRegisterModel():
         monkeypatch.setattr(test_register_model, "page_select", page_select)
         assert test_register_model.calc_register_addr(addr) == result
 
+    @pytest.mark.parametrize("page_select", [0, 1])
+    def test_page_table_matches_calc_register_addr(self, test_register_model, monkeypatch,
+                                                   page_select):
+
+        monkeypatch.setattr(test_register_model, "page_select", page_select)
+        page_table = test_register_model._page_table
+        for raw_addr in range(RegisterModel.REGISTER_PAGE_SIZE):
+            addr = test_register_model.calc_register_addr(raw_addr)
+            assert page_table.addrs[raw_addr] == addr
+            assert page_table.is_shift_register[raw_addr] == (
+                addr in (RegisterMap.SR_CAL, RegisterMap.SR_TEST)
+            )
+            assert page_table.is_callback[raw_addr] == (
+                addr in (RegisterMap.CONFIG1, RegisterMap.TEST_SR)
+            )
+
     def test_write_transaction(self, test_register_model):
 
         transaction = [0x0, 0x1, 0x2, 0x3]
@@ -111,3 +130,275 @@ class TestRegisterModel():
             test_register_model.process_transaction(transaction)
             assert test_register_model.page_select == 1
             assert f"Register page select is now {page_select}" in caplog.text
+
+    def test_callback_only_on_change(self):
+
+        register_model = MercuryAsicRegisterModel(Mock(), False)
+        callback = register_model._callbacks[RegisterMap.CONFIG1] = Mock()
+        config1 = register_model.registers()[RegisterMap.CONFIG1]
+
+        register_model.process_transaction([RegisterMap.CONFIG1, config1])
+        callback.assert_not_called()
+        register_model.process_transaction([RegisterMap.CONFIG1, config1 ^ 0x10, 0x1])
+        callback.assert_called_once_with()
+
+    def test_page_select_updates_config1(self, test_register_model):
+
+        test_register_model.page_select = 1
+        assert test_register_model.registers()[RegisterMap.CONFIG1] & 1
+        test_register_model.page_select = 0
+        assert not test_register_model.registers()[RegisterMap.CONFIG1] & 1
+
+    def test_config1_callback_in_burst(self, test_register_model):
+
+        test_register_model.process_transaction([0x0, 0x0])
+        vals = list(range(1, 10))
+        transaction = [0x0, 0x1] + vals
+        test_register_model.process_transaction(transaction)
+
+        registers = test_register_model.registers()
+        assert test_register_model.page_select == 1
+        assert registers[1:3] == vals[:2]
+        assert registers[RegisterModel.REGISTER_PAGE_SIZE + 3:][:len(vals) - 2] == vals[2:]
+
+        test_register_model.process_transaction([0x0, 0x0])
+        assert test_register_model.page_select == 0
+
+
+class BytewiseRegisterModel(RegisterModel):
+    """Reference register model processing transactions one byte at a time."""
+
+    def process_transaction(self, transaction):
+        """Process a register transaction with a loop over each byte in the payload."""
+        try:
+            register_addr = int(transaction[0]) & self.REGISTER_ADDR_MASK
+            is_write = self.is_write_transaction(transaction)
+            for idx in range(len(transaction[1:])):
+                addr = self.calc_register_addr(register_addr + idx)
+                if addr in self._shift_registers:
+                    self.process_sr_transaction(transaction, idx, addr)
+                    break
+                if is_write:
+                    self._registers[addr] = transaction[1 + idx]
+                    if addr in self._callbacks:
+                        self._callbacks[addr]()
+                else:
+                    transaction[1 + idx] = self._registers[addr]
+        except Exception as err:
+            logging.error(f"Error processing transaction: {type(err)} {err}")
+
+        return transaction
+
+
+class TestBurstTransactions():
+    """Test cases comparing burst transactions against bytewise processing."""
+
+    @pytest.mark.parametrize("seed", range(4))
+    def test_bursts_match_bytewise_model(self, seed):
+
+        rng = random.Random(seed)
+        model = RegisterModel(Mock(), False)
+        reference = BytewiseRegisterModel(Mock(), False)
+
+        for _ in range(500):
+            addr = rng.choice([0, 0, 1, 3, 7, 13, 100, 120, 125, 126, 127, rng.randrange(128)])
+            length = rng.choice([1, 2, 16, 128, rng.randrange(1, 160)])
+            if rng.random() < 0.5:
+                addr |= RegisterModel.REGISTER_READ_TRANSACTION
+                payload = [0] * length
+            else:
+                payload = [rng.randrange(256) for _ in range(length)]
+                if addr == 0:
+                    payload[0] = rng.choice([0x0, 0x1, 0x51])
+
+            response = model.process_transaction([addr] + payload)
+            expected = reference.process_transaction([addr] + payload)
+
+            assert response == expected
+            assert model.registers() == reference.registers()
+            assert model.page_select == reference.page_select
+            assert model.test_sr_sector == reference.test_sr_sector
+
+
+class TestShiftRegisters():
+    """Test cases for the shift register bank in the MercuryAsicRegisterModel class."""
+
+    @staticmethod
+    def select_sector(model, sector):
+        """Select a test shift register sector with a write to TEST_SR."""
+        model.process_transaction([RegisterMap.TEST_SR, sector << 2])
+
+    def test_sr_cal_write_read(self):
+
+        model = RegisterModel(Mock(), False)
+        vals = list(range(1, RegisterModel.REGISTER_SR_CAL_SIZE + 1))
+        model.process_transaction([RegisterMap.SR_CAL] + vals + [0xff, 0xff])
+
+        response = model.process_transaction(
+            [RegisterMap.SR_CAL | RegisterModel.REGISTER_READ_TRANSACTION] + [0] * len(vals)
+        )
+        assert list(response[1:]) == vals
+
+    def test_sr_test_sectors_are_independent(self):
+
+        model = RegisterModel(Mock(), False)
+        for sector in range(RegisterModel.REGISTER_SR_TEST_NUM_SECTORS):
+            self.select_sector(model, sector)
+            transaction = bytearray(
+                [RegisterMap.SR_TEST] + [sector] * RegisterModel.REGISTER_SR_TEST_SIZE
+            )
+            model.process_transaction(transaction)
+
+        for sector in range(RegisterModel.REGISTER_SR_TEST_NUM_SECTORS):
+            self.select_sector(model, sector)
+            transaction = bytearray(
+                [RegisterMap.SR_TEST | RegisterModel.REGISTER_READ_TRANSACTION]
+                + [0xff] * RegisterModel.REGISTER_SR_TEST_SIZE
+            )
+            response = model.process_transaction(transaction)
+            assert model.test_sr_sector == sector
+            assert set(response[1:]) == {sector}
+
+    def test_sr_test_invalid_sector(self, caplog):
+
+        model = RegisterModel(Mock(), False)
+        self.select_sector(model, RegisterModel.REGISTER_SR_TEST_NUM_SECTORS)
+        assert "not valid" in caplog.text
+
+        transaction = [RegisterMap.SR_TEST | RegisterModel.REGISTER_READ_TRANSACTION, 1, 2]
+        response = model.process_transaction(transaction)
+        assert response[1:] == [1, 2]
+        assert "Error processing transaction" not in caplog.text
+
+
+class TestSnapshots():
+    """Test cases for register model snapshot, restore and fork."""
+
+    @staticmethod
+    def modify(model):
+        """Modify the state of a register model, selecting page 1 and test sector 3."""
+        model.process_transaction([RegisterMap.TEST_SR, 3 << 2])
+        model.process_transaction([RegisterMap.SR_TEST] + [0xa5] * 10)
+        model.process_transaction([RegisterMap.SR_CAL] + [0x5a] * 10)
+        model.process_transaction([RegisterMap.CONFIG1, 0x51, 0x1, 0x2, 0x3])
+
+    def test_snapshot_is_immutable(self):
+
+        model = RegisterModel(Mock(), False)
+        snapshot = model.snapshot()
+        assert type(snapshot) is bytes
+
+        self.modify(model)
+        assert model.snapshot() != snapshot
+
+    def test_restore(self):
+
+        model = RegisterModel(Mock(), False)
+        self.modify(model)
+        snapshot = model.snapshot()
+
+        restored = RegisterModel(Mock(), False)
+        callbacks = {addr: Mock() for addr in restored._callbacks}
+        restored._callbacks = callbacks
+        restored.restore(snapshot)
+
+        assert restored.snapshot() == snapshot
+        assert restored.page_select == 1
+        assert restored.test_sr_sector == 3
+        assert restored._page_table is restored._page_tables[1]
+        assert all(not callback.called for callback in callbacks.values())
+
+    @pytest.mark.parametrize("snapshot", [b"", bytes(10)])
+    def test_restore_invalid_snapshot(self, snapshot):
+
+        model = RegisterModel(Mock(), False)
+        with pytest.raises(ValueError):
+            model.restore(snapshot)
+
+    def test_fork_is_independent(self):
+
+        model = RegisterModel(Mock(), False)
+        snapshot = model.snapshot()
+
+        forked = model.fork()
+        assert forked.snapshot() == snapshot
+
+        self.modify(forked)
+        assert model.snapshot() == snapshot
+        assert model.page_select == 0
+        assert forked.page_select == 1
+
+        forked.process_transaction([RegisterMap.CONFIG1, 0x50])
+        read = [RegisterMap.SR_TEST | RegisterModel.REGISTER_READ_TRANSACTION] + [0] * 10
+        assert forked.process_transaction(list(read))[1:] == [0xa5] * 10
+        model.process_transaction([RegisterMap.TEST_SR, 3 << 2])
+        assert model.process_transaction(list(read))[1:] == [0] * 10
+
+
+class TestSubscriptions():
+    """Test cases for register change subscriptions in the register model."""
+
+    def test_subscriber_notified_once_per_transaction(self):
+
+        model = RegisterModel(Mock(), False)
+        subscriber = Mock()
+        model.subscribe(subscriber, RegisterMap.SEG_CONTROL1_SER, 20)
+
+        vals = [0, 1, 0, 2]
+        model.process_transaction([RegisterMap.SEG_CONTROL1_SER] + vals)
+        subscriber.assert_called_once_with(
+            (RegisterMap.SEG_CONTROL2_SER, RegisterMap.SEG_CONTROL4_SER)
+        )
+
+        subscriber.reset_mock()
+        model.process_transaction([RegisterMap.SEG_CONTROL1_SER] + vals)
+        subscriber.assert_not_called()
+
+    def test_subscriber_range_filters_changes(self):
+
+        model = RegisterModel(Mock(), False)
+        ramp_subscriber = Mock()
+        bias_subscriber = Mock()
+        model.subscribe(ramp_subscriber, RegisterMap.RAMP_CONTROL1, 20)
+        model.subscribe(bias_subscriber, RegisterMap.CHIP_BIAS, 11)
+
+        model.process_transaction([RegisterMap.RAMP_CONTROL20] + [0x1] * 5)
+        ramp_subscriber.assert_called_once_with((RegisterMap.RAMP_CONTROL20,))
+        bias_subscriber.assert_not_called()
+
+    def test_unsubscribe(self):
+
+        model = RegisterModel(Mock(), False)
+        subscriber = Mock()
+        subscription_id = model.subscribe(subscriber, RegisterMap.GLOB1)
+        model.unsubscribe(subscription_id)
+
+        model.process_transaction([RegisterMap.GLOB1, 0x1])
+        subscriber.assert_not_called()
+
+    def test_shift_register_changes(self):
+
+        model = RegisterModel(Mock(), False)
+        subscriber = Mock()
+        model.subscribe(subscriber, RegisterMap.SR_CAL, 2)
+
+        model.process_transaction([RegisterMap.SR_CAL, 0x1, 0x2])
+        subscriber.assert_called_once_with((RegisterMap.SR_CAL,))
+
+    def test_restore_notifies_changes(self):
+
+        model = RegisterModel(Mock(), False)
+        snapshot = model.snapshot()
+        model.process_transaction([RegisterMap.GLOB1, 0x1, 0x2])
+
+        subscriber = Mock()
+        model.subscribe(subscriber, 0, RegisterMap.size())
+        model.restore(snapshot)
+        subscriber.assert_called_once_with((RegisterMap.GLOB1, RegisterMap.GLOB2))
+
+    def test_subscriber_error_is_logged(self, caplog):
+
+        model = RegisterModel(Mock(), False)
+        model.subscribe(Mock(side_effect=RuntimeError("oops")), RegisterMap.GLOB1)
+        model.process_transaction([RegisterMap.GLOB1, 0x1])
+        assert "Error notifying register change subscriber" in caplog.text
@@ -0,0 +1,55 @@
+import pytest
+
+from mercury.asic_emulator.scheduler import FairScheduler
+
+
+class TestFairScheduler():
+    """Test cases for the FairScheduler class."""
+
+    def test_round_robin_preserves_client_order(self):
+
+        scheduler = FairScheduler()
+        for idx in range(4):
+            scheduler.put(b"a", f"a{idx}")
+        scheduler.put(b"b", "b0")
+        scheduler.put(b"b", "b1")
+
+        assert len(scheduler) == 6
+        assert scheduler.get_batch(10) == ["a0", "b0", "a1", "b1", "a2", "a3"]
+        assert len(scheduler) == 0 and scheduler.queued(b"a") == 0
+
+    def test_weighted_clients(self):
+
+        scheduler = FairScheduler(weights={b"priority": 3})
+        for idx in range(6):
+            scheduler.put(b"flood", f"f{idx}")
+            scheduler.put(b"priority", f"p{idx}")
+
+        assert scheduler.get_batch(8) == ["f0", "p0", "p1", "p2", "f1", "p3", "p4", "p5"]
+
+    def test_credit_carried_between_batches(self):
+
+        scheduler = FairScheduler(weights={b"a": 2})
+        for idx in range(3):
+            scheduler.put(b"a", f"a{idx}")
+            scheduler.put(b"b", f"b{idx}")
+
+        assert scheduler.get_batch(1) == ["a0"]
+        assert scheduler.get_batch(2) == ["a1", "b0"]
+        assert scheduler.get_batch(10) == ["a2", "b1", "b2"]
+
+    def test_high_water_mark(self):
+
+        scheduler = FairScheduler(high_water_mark=2)
+        assert scheduler.put(b"a", 1) and scheduler.put(b"a", 2)
+        assert not scheduler.put(b"a", 3)
+        assert scheduler.put(b"b", 1)
+        assert scheduler.queued(b"a") == 2
+        scheduler.get_batch(1)
+        assert scheduler.put(b"a", 3)
+
+    @pytest.mark.parametrize("kwargs", [{"high_water_mark": 0}, {"weights": {b"a": 0}}])
+    def test_invalid_configuration(self, kwargs):
+
+        with pytest.raises(ValueError):
+            FairScheduler(**kwargs)
@@ -0,0 +1,275 @@
+import asyncio
+import itertools
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+import pytest_asyncio
+import zmq
+
+from mercury.asic.registers import RegisterMap
+from mercury.asic_emulator import protocol
+from mercury.asic_emulator.client import MercuryAsicClient
+from mercury.asic_emulator.multi_register_model import MercuryMultiAsicRegisterModel
+from mercury.asic_emulator.register_model import MercuryAsicRegisterModel
+from mercury.asic_emulator.server import EmulatorServer
+from mercury.asic_emulator.tracer import TransactionTracer
+
+endpoint_ids = itertools.count()
+
+
+@pytest_asyncio.fixture(params=["msgpack", "raw"])
+async def emulator(request):
+    """Test fixture providing a connected emulator server and client in each wire format."""
+    endpoint = f"inproc://test_server_{next(endpoint_ids)}"
+    model = MercuryMultiAsicRegisterModel(Mock(), False, num_asics=2)
+    server = EmulatorServer(endpoint, asyncio.get_running_loop(), model, TransactionTracer())
+    client = MercuryAsicClient(endpoint, request.param)
+
+    yield (server, client)
+
+    server.server_task.cancel()
+    server.monitor_task.cancel()
+    client.close()
+    server.socket.close(linger=0)
+
+
+class TestEmulatorServer():
+    """Test cases for the EmulatorServer class."""
+
+    def test_client_primitives_created_in_running_loop(self):
+
+        client = MercuryAsicClient(f"inproc://test_server_{next(endpoint_ids)}", "raw")
+        assert client._window is None and client._negotiate_lock is None
+        client.close()
+
+    @pytest.mark.asyncio
+    async def test_single_transactions(self, emulator):
+
+        (server, client) = emulator
+        await client.write([RegisterMap.GLOB1, 1, 2])
+        assert await client.read([RegisterMap.GLOB1, 0, 0]) == b"\x81\x01\x02"
+        assert server.register_model.registers(1)[RegisterMap.GLOB1] == 0
+        assert client.wire_format == client._requested_wire_format
+
+    @pytest.mark.asyncio
+    async def test_addressed_transactions(self, emulator):
+
+        (server, client) = emulator
+        await client.write([RegisterMap.GLOB2, 5], asic=1)
+        assert await client.read([RegisterMap.GLOB2, 0], asic=1) == b"\x82\x05"
+        assert server.register_model.registers(0)[RegisterMap.GLOB2] == 0
+        assert server.tracer.count == 2
+
+    @pytest.mark.asyncio
+    async def test_oversized_burst_traced(self, emulator):
+
+        (server, client) = emulator
+        await client.write([RegisterMap.SR_TEST] + [1] * 70000)
+        records = list(TransactionTracer.decode(server.tracer.dump()))
+        assert records[-1]["length"] == 70000
+
+    @pytest.mark.asyncio
+    async def test_tracer_error_not_raised(self, emulator):
+
+        (server, client) = emulator
+        server.tracer.record = Mock(side_effect=RuntimeError("trace failed"))
+        await client.write([RegisterMap.GLOB1, 3])
+        assert await client.read([RegisterMap.GLOB1, 0]) == b"\x81\x03"
+        (responses, status) = await client.transfer_batch([bytearray([RegisterMap.GLOB2, 4])])
+        assert status == [None]
+        assert server.tracer.record.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_queued_messages_keep_client_order(self, emulator):
+
+        (server, client) = emulator
+        server.max_batch_size = 4
+        other_client = MercuryAsicClient(client.endpoint)
+
+        # Queue interleaved writes and reads from two clients before awaiting any responses
+        for val in range(10):
+            await client.socket.send(protocol.pack_transaction([RegisterMap.GLOB1, val]))
+            await other_client.socket.send(protocol.pack_transaction([RegisterMap.GLOB1 | 0x80, 0]))
+            await client.socket.send(protocol.pack_transaction([RegisterMap.GLOB1 | 0x80, 0]))
+
+        for val in range(10):
+            (write_resp, _) = protocol.unpack_transaction(await client.socket.recv())
+            (read_resp, _) = protocol.unpack_transaction(await client.socket.recv())
+            assert write_resp == bytes([RegisterMap.GLOB1, val])
+            assert read_resp == bytes([RegisterMap.GLOB1 | 0x80, val])
+            await other_client.socket.recv()
+
+        other_client.close()
+
+    @pytest.mark.asyncio
+    async def test_invalid_raw_message(self, emulator):
+
+        (server, client) = emulator
+        await client.socket.send(b"\x02")
+        assert await client.socket.recv() == b"\x02"
+        assert server.register_model.registers()[RegisterMap.GLOB1] == 0
+
+    @pytest.mark.asyncio
+    async def test_batch_transactions(self, emulator):
+
+        (server, client) = emulator
+        transactions = [
+            client.write_transaction(RegisterMap.GLOB1, 1, 2),
+            client.write_transaction(RegisterMap.GLOB2, 3),
+            client.read_transaction(RegisterMap.GLOB1, 2),
+        ]
+        (responses, status) = await client.transfer_batch(transactions, asic=1)
+
+        assert status == [None, None, None]
+        assert responses[2] == bytes([RegisterMap.GLOB1 | 0x80, 1, 3])
+        assert server.register_model.registers(1)[RegisterMap.GLOB1:RegisterMap.GLOB2 + 1] == [1, 3]
+        assert server.tracer.count == 3
+
+    @pytest.mark.asyncio
+    async def test_batch_transaction_errors(self, emulator):
+
+        (server, client) = emulator
+        transactions = [
+            client.write_transaction(RegisterMap.GLOB1, 1),
+            bytearray(),
+            [RegisterMap.GLOB1, 0x100],
+            client.write_transaction(RegisterMap.GLOB2, 2),
+        ]
+        (responses, status) = await client.transfer_batch(transactions)
+
+        assert status[0] is None and status[3] is None
+        assert status[1].startswith("IndexError")
+        assert status[2].startswith("ValueError")
+        assert server.register_model.registers()[RegisterMap.GLOB1:RegisterMap.GLOB2 + 1] == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_batch_invalid_asic(self, emulator):
+
+        (_, client) = emulator
+        (_, status) = await client.transfer_batch([client.read_transaction(0, 1)], asic=5)
+        assert status[0].startswith("ValueError")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("wire_format", ["msgpack", "raw"])
+    async def test_single_asic_model_rejects_addressing(self, wire_format):
+
+        endpoint = f"inproc://test_server_{next(endpoint_ids)}"
+        model = MercuryAsicRegisterModel(Mock(), False)
+        server = EmulatorServer(endpoint, asyncio.get_running_loop(), model)
+        client = MercuryAsicClient(endpoint, wire_format)
+
+        await client.write([RegisterMap.GLOB1, 1], asic=1)
+        (_, status) = await client.transfer_batch([client.write_transaction(0, 1)], asic=1)
+        assert status[0] == (
+            "ProtocolError: ASIC addressing not supported by single ASIC register model (ASIC 1)"
+        )
+        assert model.registers()[RegisterMap.GLOB1] == 0
+        await client.write([RegisterMap.GLOB1, 2])
+        assert model.registers()[RegisterMap.GLOB1] == 2
+        assert server.client_stats()[client.identity.decode()]["errors"] == 2
+
+        server.server_task.cancel()
+        server.monitor_task.cancel()
+        client.close()
+        server.socket.close(linger=0)
+
+    @pytest.mark.asyncio
+    async def test_client_stats(self, emulator):
+
+        (server, client) = emulator
+        await client.write([RegisterMap.GLOB1, 1])
+        await client.read([RegisterMap.GLOB1, 0])
+        await client.read([RegisterMap.GLOB1, 0], asic=5)
+        await client.transfer_batch([client.read_transaction(0, 1), bytearray()])
+
+        stats = server.client_stats()[client.identity.decode()]
+        assert (stats["transactions"], stats["reads"], stats["writes"]) == (5, 3, 2)
+        assert stats["errors"] == 2
+        assert stats["bytes_received"] > 0 and stats["bytes_sent"] > 0
+        assert stats["latency"]["count"] == stats["messages"]
+        assert stats["latency"]["p50_us"] <= stats["latency"]["max_us"]
+
+    @pytest.mark.asyncio
+    async def test_flooding_client_rejected_when_busy(self, emulator):
+
+        (server, client) = emulator
+        server._scheduler.high_water_mark = 4
+        flood_client = MercuryAsicClient(client.endpoint, identity="flood")
+
+        # Queue a flood of requests before the server runs, then send a single request from
+        # another client, which must be served ahead of most of the flood
+        num_flood = server.max_batch_size * server.RECEIVE_BATCHES
+        for _ in range(num_flood):
+            await flood_client.socket.send(protocol.pack_transaction([RegisterMap.GLOB1 | 0x80, 0]))
+        await asyncio.sleep(0.1)
+        assert await client.read([RegisterMap.GLOB1, 0]) == b"\x81\x00"
+
+        responses = [await flood_client.socket.recv() for _ in range(num_flood)]
+        num_busy = sum(protocol.is_busy(response) for response in responses)
+        assert 0 < num_busy <= num_flood - 4
+        assert server.client_stats()["flood"]["busy"] == num_busy
+
+        # A transaction sent by the client while its queue is full raises an error
+        for _ in range(8):
+            await flood_client.socket.send(protocol.pack_transaction([RegisterMap.GLOB1, 0]))
+        with pytest.raises(protocol.ServerBusyError):
+            await flood_client.write([RegisterMap.GLOB1, 0])
+
+        flood_client.close()
+
+    @pytest.mark.asyncio
+    async def test_pipelined_transactions(self, emulator):
+
+        (server, client) = emulator
+        client._window = asyncio.Semaphore(4)
+
+        # Record the number of requests in flight as each is sent
+        in_flight = []
+        send_multipart = client.socket.send_multipart
+
+        async def record_send(msg_parts):
+            in_flight.append(len(client._pending))
+            return await send_multipart(msg_parts)
+
+        client.socket.send_multipart = record_send
+
+        addrs = range(RegisterMap.GLOB1, RegisterMap.GLOB1 + 8)
+        await asyncio.gather(*(client.write([addr, addr]) for addr in addrs))
+        responses = await asyncio.gather(*(client.read([addr, 0]) for addr in reversed(addrs)))
+
+        assert [response[1] for response in responses] == list(reversed(addrs))
+        assert max(in_flight) == 4
+        assert not client._pending
+
+    @pytest.mark.asyncio
+    async def test_cancelled_request_response_discarded(self, emulator):
+
+        (_, client) = emulator
+        await client.write([RegisterMap.GLOB1, 3])
+        task = asyncio.ensure_future(client.read([RegisterMap.GLOB1, 0]))
+        await asyncio.sleep(0)
+        task.cancel()
+
+        assert await client.read([RegisterMap.GLOB2, 0]) == b"\x82\x00"
+        assert not client._pending
+
+    @pytest.mark.asyncio
+    async def test_receiver_error_fails_requests(self, emulator):
+
+        (_, client) = emulator
+        failing_client = MercuryAsicClient(client.endpoint)
+        failing_client.socket.recv_multipart = AsyncMock(side_effect=zmq.ZMQError(zmq.ETERM))
+
+        with pytest.raises(zmq.ZMQError):
+            await asyncio.wait_for(failing_client.read([RegisterMap.GLOB1, 0]), 1.0)
+        with pytest.raises(zmq.ZMQError):
+            await asyncio.wait_for(failing_client.write([RegisterMap.GLOB1, 1]), 1.0)
+        assert not failing_client._pending
+        failing_client.close()
+
+
+def test_read_transaction():
+
+    transaction = MercuryAsicClient.read_transaction(RegisterMap.GLOB1, 2)
+    rw_mask = MercuryAsicRegisterModel.REGISTER_RW_MASK
+    assert transaction == bytearray([RegisterMap.GLOB1 | rw_mask, 0, 0])
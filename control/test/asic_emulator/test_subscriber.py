@@ -0,0 +1,107 @@
+import asyncio
+import itertools
+from unittest.mock import Mock
+
+import pytest
+import pytest_asyncio
+
+from mercury.asic.registers import RegisterMap
+from mercury.asic_emulator.client import MercuryAsicClient
+from mercury.asic_emulator.multi_register_model import MercuryMultiAsicRegisterModel
+from mercury.asic_emulator.server import EmulatorServer
+from mercury.asic_emulator.subscriber import RegisterChangeSubscriber
+
+endpoint_ids = itertools.count()
+
+
+@pytest_asyncio.fixture
+async def publisher():
+    """Test fixture providing an emulator server publishing register changes and a client."""
+    endpoint_id = next(endpoint_ids)
+    endpoint = f"inproc://test_subscriber_{endpoint_id}"
+    publish_endpoint = f"inproc://test_subscriber_pub_{endpoint_id}"
+    model = MercuryMultiAsicRegisterModel(Mock(), False, num_asics=2)
+    server = EmulatorServer(
+        endpoint, asyncio.get_running_loop(), model, publish_endpoint=publish_endpoint
+    )
+    client = MercuryAsicClient(endpoint)
+
+    yield (server, client)
+
+    server.server_task.cancel()
+    server.monitor_task.cancel()
+    server.publish_task.cancel()
+    client.close()
+    server.socket.close(linger=0)
+    server.publish_socket.close(linger=0)
+
+
+async def receive(subscriber):
+    """Receive the next change event on a subscriber with a timeout."""
+    await asyncio.wait_for(subscriber.receive(), 1.0)
+
+
+class TestRegisterChangeSubscriber():
+    """Test cases for register change publishing and the RegisterChangeSubscriber class."""
+
+    @pytest.mark.asyncio
+    async def test_snapshot_and_changes(self, publisher):
+
+        (server, client) = publisher
+        await client.write([RegisterMap.GLOB1, 1])
+        subscriber = RegisterChangeSubscriber(
+            client.endpoint, server.publish_endpoint, callback=Mock()
+        )
+        await asyncio.wait_for(subscriber.synchronise(), 1.0)
+        assert subscriber.version == 1
+        assert subscriber.registers == bytes(server.register_model.registers())
+
+        await client.write([RegisterMap.GLOB1, 1, 2, 0, 4])
+        await receive(subscriber)
+        assert subscriber.version == 2
+        assert subscriber.registers == bytes(server.register_model.registers())
+        subscriber.callback.assert_called_with((RegisterMap.GLOB2, RegisterMap.GLOB_VAL2))
+        subscriber.close()
+
+    @pytest.mark.asyncio
+    async def test_changes_filtered_by_asic(self, publisher):
+
+        (server, client) = publisher
+        subscriber = RegisterChangeSubscriber(client.endpoint, server.publish_endpoint, asic=1)
+        await subscriber.synchronise()
+
+        await client.write([RegisterMap.GLOB1, 1], asic=0)
+        await client.write([RegisterMap.GLOB1, 2], asic=1)
+        await receive(subscriber)
+        assert subscriber.version == 1
+        assert subscriber.registers[RegisterMap.GLOB1] == 2
+        subscriber.close()
+
+    @pytest.mark.asyncio
+    async def test_shift_register_writes_not_published(self, publisher):
+
+        (server, client) = publisher
+        await client.write([RegisterMap.SR_CAL, 1, 2, 3])
+        assert server._change_versions == [0, 0]
+
+    @pytest.mark.asyncio
+    async def test_missed_events_resynchronise(self, publisher):
+
+        (server, client) = publisher
+        subscriber = RegisterChangeSubscriber(client.endpoint, server.publish_endpoint)
+        await subscriber.synchronise()
+
+        assert subscriber.apply(1, [(RegisterMap.GLOB1, b"\x05")])
+        assert subscriber.apply(1, [(RegisterMap.GLOB1, b"\x06")])
+        assert subscriber.registers[RegisterMap.GLOB1] == 5
+        assert not subscriber.apply(3, [])
+
+        # Publish events the subscriber has not seen, then check it resynchronises
+        subscriber.version = 0
+        await client.write([RegisterMap.GLOB1, 7])
+        await client.write([RegisterMap.GLOB2, 8])
+        await receive(subscriber)
+        await receive(subscriber)
+        assert subscriber.version == 2
+        assert subscriber.registers == bytes(server.register_model.registers())
+        subscriber.close()
@@ -0,0 +1,85 @@
+import pytest
+
+from click.testing import CliRunner
+
+from mercury.asic_emulator.trace_cli import main
+from mercury.asic_emulator.tracer import TransactionTracer, TransactionTracerError
+
+
+class TestTransactionTracer():
+    """Test cases for the TransactionTracer class."""
+
+    def test_record_and_decode(self):
+
+        tracer = TransactionTracer(num_records=4, payload_size=4)
+        tracer.record(b"0001-0002", bytearray([0x05, 1, 2]))
+        tracer.record(b"0001-0002", bytearray([0x85, 1, 2, 3, 4, 5, 6]))
+
+        records = list(TransactionTracer.decode(tracer.dump()))
+        assert tracer.count == 2
+        assert records[0]["client_id"] == b"0001-0002"
+        assert not records[0]["client_id_truncated"]
+        assert records[0]["addr"] == 0x5
+        assert records[0]["direction"] == TransactionTracer.DIRECTION_WRITE
+        assert records[0]["payload"] == bytes([1, 2])
+        assert records[1]["direction"] == TransactionTracer.DIRECTION_READ
+        assert records[1]["length"] == 6
+        assert records[1]["payload"] == bytes([1, 2, 3, 4])
+
+    def test_ring_buffer_wraps(self):
+
+        tracer = TransactionTracer(num_records=3, payload_size=1)
+        for addr in range(5):
+            tracer.record(b"client", [addr, addr])
+
+        records = list(TransactionTracer.decode(tracer.dump()))
+        assert tracer.count == 3
+        assert [record["addr"] for record in records] == [2, 3, 4]
+
+    def test_clear(self):
+
+        tracer = TransactionTracer(num_records=3)
+        tracer.record(b"client", [0, 0])
+        tracer.clear()
+        assert list(TransactionTracer.decode(tracer.dump())) == []
+
+    @pytest.mark.parametrize("data", [b"", b"XXXX" + bytes(7)])
+    def test_decode_invalid_trace(self, data):
+
+        with pytest.raises(TransactionTracerError):
+            list(TransactionTracer.decode(data))
+
+    def test_decoder_cli(self, tmp_path):
+
+        tracer = TransactionTracer()
+        tracer.record(b"abcd-ef01", [0x81, 0xde, 0xad])
+        trace_file = tmp_path / "trace.bin"
+        tracer.save(trace_file)
+
+        result = CliRunner().invoke(main, [str(trace_file)])
+        assert result.exit_code == 0
+        assert "abcd-ef01 R 001    2 : de ad" in result.output
+
+    def test_long_client_id_flagged(self, tmp_path):
+
+        tracer = TransactionTracer()
+        tracer.record(b"0123456789abcdef-long", [0x01, 0x02])
+
+        (record,) = TransactionTracer.decode(tracer.dump())
+        assert record["client_id"] == b"0123456789abcdef"
+        assert record["client_id_truncated"]
+        assert record["direction"] == TransactionTracer.DIRECTION_WRITE
+
+        trace_file = tmp_path / "trace.bin"
+        tracer.save(trace_file)
+        result = CliRunner().invoke(main, [str(trace_file)])
+        assert "0123456789abcdef+ W 001" in result.output
+
+    def test_record_oversized_transaction(self):
+
+        tracer = TransactionTracer(payload_size=4)
+        tracer.record(b"client", bytearray([0x7F]) + bytearray(range(256)) * 300)
+
+        (record,) = TransactionTracer.decode(tracer.dump())
+        assert record["length"] == 76800
+        assert record["payload"] == bytes([0, 1, 2, 3])
@@ -0,0 +1,111 @@
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+
+from mercury.asic.device import MercuryAsicDevice
+from mercury.asic.registers import RegisterMap
+from mercury.asic.spi import LoopbackTransport
+from mercury.detector.flags import FLAG_FIELDS, MercuryFlagPoller
+
+
+def set_flags(transport, *values):
+    """Set the values of the status flag registers in the loopback register model."""
+    model = transport.register_model
+    config1 = model.registers()[RegisterMap.CONFIG1]
+    model.process_transaction([RegisterMap.CONFIG1, config1 | 1])
+    model.process_transaction([RegisterMap.FIFO_FULL1 - 128, *values])
+    model.process_transaction([RegisterMap.CONFIG1, config1])
+
+
+class TestMercuryFlagPoller():
+    """Test cases for the MercuryFlagPoller class."""
+
+    def test_flag_fields(self):
+
+        assert len(FLAG_FIELDS) == 36
+        assert FLAG_FIELDS[0].name == "FIFO_FULL_1"
+        assert FLAG_FIELDS[-1].name == "SER_CLK_CHECK_16"
+
+    @pytest.mark.asyncio
+    async def test_poll_counts_edges(self):
+
+        transport = LoopbackTransport()
+        device = MercuryAsicDevice(spi_transport=transport, cache_registers=True)
+        poller = MercuryFlagPoller(device)
+        config1 = transport.register_model.registers()[RegisterMap.CONFIG1]
+
+        assert await poller.poll() == []
+        set_flags(transport, 0b101, 0, 0, 0, 0x80)
+        assert await poller.poll() == ["FIFO_FULL_1", "FIFO_FULL_3", "SER_CLK_CHECK_16"]
+        set_flags(transport, 0b100, 0, 0, 0, 0x80)
+        assert await poller.poll() == ["FIFO_FULL_1"]
+        device.device.close()
+
+        flags = poller.status()["flags"]
+        assert (flags["FIFO_FULL_1"]["value"], flags["FIFO_FULL_3"]["value"]) == (0, 1)
+        assert (flags["FIFO_FULL_1"]["rising"], flags["FIFO_FULL_1"]["falling"]) == (1, 1)
+        assert flags["SER_CLK_CHECK_16"]["last_change"] is not None
+        assert flags["FIFO_FULL_2"]["last_change"] is None
+        assert poller.status()["polls"] == 3
+        assert transport.register_model.registers()[RegisterMap.CONFIG1] == config1
+
+    @pytest.mark.asyncio
+    async def test_poll_single_transfer(self):
+
+        transport = LoopbackTransport()
+        device = MercuryAsicDevice(spi_transport=transport, cache_registers=True)
+        await device.register_read(RegisterMap.CONFIG1, 1)
+        transfers = device.device.transfers
+        await MercuryFlagPoller(device).poll()
+        device.device.close()
+
+        assert device.device.transfers == transfers + 1
+
+    @pytest.mark.asyncio
+    async def test_poll_page_selected_single_transaction(self):
+
+        transport = LoopbackTransport()
+        device = MercuryAsicDevice(spi_transport=transport, cache_registers=True)
+        await device.register_write(RegisterMap.CONFIG1, 0x51)
+        transport.register_model.process_transaction = Mock(
+            wraps=transport.register_model.process_transaction
+        )
+        await MercuryFlagPoller(device).poll()
+        device.device.close()
+
+        assert transport.register_model.process_transaction.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_adaptive_interval(self):
+
+        transport = LoopbackTransport()
+        device = MercuryAsicDevice(spi_transport=transport, cache_registers=True)
+        poller = MercuryFlagPoller(device, interval=0.01, max_interval=0.04)
+        poller.start()
+        await asyncio.sleep(0.1)
+        assert poller.current_interval == 0.04
+
+        set_flags(transport, 1)
+        while not poller.status()["flags"]["FIFO_FULL_1"]["rising"]:
+            await asyncio.sleep(0.001)
+        assert poller.current_interval == 0.01
+        poller.stop()
+        device.device.close()
+
+        assert not poller.running
+        assert poller.status()["errors"] == 0
+
+    @pytest.mark.asyncio
+    async def test_poll_overlapping_page_select(self):
+
+        transport = LoopbackTransport()
+        device = MercuryAsicDevice(spi_transport=transport)
+        poller = MercuryFlagPoller(device)
+        await asyncio.gather(poller.poll(), device.register_write(RegisterMap.CONFIG1, 0x51))
+        await device.register_write(RegisterMap.SER_BIAS1 - 128, 7)
+        device.device.close()
+
+        registers = transport.register_model.registers()
+        assert registers[RegisterMap.CONFIG1] == 0x51
+        assert registers[RegisterMap.SER_BIAS1] == 7